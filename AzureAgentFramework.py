@@ -12,6 +12,8 @@ from agent_framework.azure import AzureAIAgentClient
 from azure.identity.aio import AzureCliCredential
 from pydantic import Field
 from typing import Annotated
+from streamingOutput import streaming_enabled, astream_agent
+from scriptProfiler import profile_if_requested
 
 
 async def main():
@@ -58,14 +60,21 @@ async def process_expenses_data(prompt, expenses_data):
         try:
             # Add the input prompt to a list of messages to be submitted
             prompt_messages = [f"{prompt}: {expenses_data}"]
-            # Invoke the agent for the specified thread with the messages
-            response = await agent.run(prompt_messages)
-            # Display the response
-            print(f"\n# Agent:\n{response}")
+            if streaming_enabled():
+                # Display tokens as they arrive
+                print(f"\n# Agent:")
+                _, metrics = await astream_agent(agent, prompt_messages)
+                print(f"\n{metrics.report()}")
+            else:
+                # Invoke the agent for the specified thread with the messages
+                response = await agent.run(prompt_messages)
+                # Display the response
+                print(f"\n# Agent:\n{response}")
         except Exception as e:
             # Something went wrong
             print(e)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    with profile_if_requested("AzureAgentFramework"):
+        asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,353 @@
+"""
+Capacity and Cost Planner
+Sizes an Azure OpenAI deployment for a prompt format: from measured token
+distributions (JSON vs TOON runs), the deployment's TPM/RPM limits, a
+latency profile and a pricing table it simulates sustained requests/sec,
+queueing delay and cost at target load, instead of multiplying one token
+delta by a request count
+
+Azure counts prompt tokens plus max_tokens against TPM when it admits a
+request, so a format that shrinks prompts raises the achievable request
+rate of a TPM-bound deployment, not just the bill. The simulation admits
+Poisson arrivals in order through per-minute token buckets, the way
+requestScheduler.py does, so queueing delay is time spent waiting for
+budget rather than 429s.
+
+Settings (environment):
+    LLM_RPM, LLM_TPM     deployment limits (shared with requestScheduler.py)
+    PLANNER_MODEL        pricing table row (default AZURE_OPENAI_DEPLOYMENT_NAME)
+    PRICING_FILE         JSON {"model": {"input": 2.5, "cached_input": 1.25, "output": 10}}
+                         (USD per 1M tokens) overriding or extending PRICING
+    PLANNER_TARGET_RPS   comma-separated loads to simulate (default: 50-120% of
+                         what the JSON prompts can sustain)
+    PLANNER_DURATION_S   simulated seconds per load (default 3600)
+    PLANNER_MAX_TOKENS   completion budget per request (default 50, as the A/B runs)
+    PLANNER_HEADROOM     target TPM utilization when sizing (default 0.8)
+    PLANNER_CACHED_FRACTION  share of prompt tokens billed at the cached rate (default 0,
+                         see CacheStats in promptCache.py)
+
+    python capacityPlanner.py                   # token counts of generated payloads
+    python capacityPlanner.py measurements.jsonl  # a TOON_AB_OUTPUT file from toonAbBenchmark.py
+"""
+
+import os
+import sys
+import json
+import math
+import random
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from requestScheduler import TokenBucket
+from toonAbBenchmark import percentile
+
+# Load environment variables
+load_dotenv()
+
+
+# USD per 1M tokens: (input, cached input, output); list prices at the time
+# of writing, override with PRICING_FILE
+PRICING = {
+    "gpt-4": (30.00, 30.00, 60.00),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-35-turbo": (0.50, 0.50, 1.50)
+}
+
+# Below this many samples the p95 is just the largest sample
+MIN_PERCENTILE_SAMPLES = 20
+
+
+@dataclass
+class ModelPricing:
+    model: str
+    input_per_m: float
+    cached_input_per_m: float
+    output_per_m: float
+
+    def request_cost(self, prompt_tokens: float, completion_tokens: float, cached_fraction: float = 0.0) -> float:
+        cached = prompt_tokens * cached_fraction
+        return ((prompt_tokens - cached) * self.input_per_m + cached * self.cached_input_per_m
+                + completion_tokens * self.output_per_m) / 1_000_000
+
+
+def load_pricing(model: str = None) -> ModelPricing:
+    """Pricing row for a model; deployment names match on the longest known model name they contain"""
+    model = (model or os.getenv("PLANNER_MODEL") or os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME") or "gpt-4").lower()
+    table = dict(PRICING)
+    path = os.getenv("PRICING_FILE")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for name, row in json.load(f).items():
+                table[name.lower()] = (row["input"], row.get("cached_input", row["input"]), row["output"])
+    matches = [name for name in table if name in model]
+    name = max(matches, key=len) if model not in table and matches else model
+    if name not in table:
+        print(f"⚠️  No pricing for {model!r}, using gpt-4 (set PLANNER_MODEL or PRICING_FILE)")
+        name = "gpt-4"
+    return ModelPricing(name, *table[name])
+
+
+class TokenDistribution:
+    """Measured (prompt, completion) token pairs of one prompt format, resampled during simulation"""
+
+    def __init__(self, name: str, prompt_tokens: list, completion_tokens: list, latencies: list = None):
+        if not prompt_tokens:
+            raise ValueError(f"No token samples for {name}")
+        self.name = name
+        self.prompt_tokens = list(prompt_tokens)
+        self.completion_tokens = list(completion_tokens)
+        self.latencies = list(latencies or [])
+
+    def sample(self, rng: random.Random) -> tuple:
+        i = rng.randrange(len(self.prompt_tokens))
+        return self.prompt_tokens[i], self.completion_tokens[i]
+
+    @property
+    def mean_prompt(self) -> float:
+        return sum(self.prompt_tokens) / len(self.prompt_tokens)
+
+    @property
+    def mean_completion(self) -> float:
+        return sum(self.completion_tokens) / len(self.completion_tokens)
+
+    def latency_samples(self) -> list:
+        """(prompt, completion, latency) triples for LatencyProfile.fit"""
+        return list(zip(self.prompt_tokens, self.completion_tokens, self.latencies))
+
+
+def distributions_from_measurements(path: str) -> dict:
+    """JSON and TOON distributions from a toonAbBenchmark measurements file (failed calls skipped)"""
+    samples = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            m = json.loads(line)
+            if m.get("error") is None and m.get("prompt_tokens"):
+                samples.setdefault(m["fmt"], []).append(m)
+    return {fmt: TokenDistribution(fmt, [m["prompt_tokens"] for m in rows], [m["completion_tokens"] for m in rows],
+                                   [m["latency_s"] for m in rows])
+            for fmt, rows in samples.items()}
+
+
+def distributions_from_payloads(n: int = 200, completion_tokens: int = 20, model: str = "gpt-4") -> dict:
+    """JSON and TOON distributions estimated offline (calibrated token counts of generated payloads)"""
+    from toonAbBenchmark import build_payloads, build_prompts
+    from tokenCalibration import estimate_prompt_tokens
+
+    counts = {"json": [], "toon": []}
+    for data in build_payloads(n):
+        for fmt, prompt in build_prompts(data).items():
+            counts[fmt].append(estimate_prompt_tokens([{"role": "user", "content": prompt}], model))
+    return {fmt: TokenDistribution(fmt, tokens, [completion_tokens] * len(tokens)) for fmt, tokens in counts.items()}
+
+
+@dataclass
+class LatencyProfile:
+    """Service time: fixed overhead plus prefill and generation time, with log-normal jitter"""
+    base_s: float = 0.35
+    per_prompt_token_s: float = 0.00005
+    per_completion_token_s: float = 0.02
+    jitter: float = 0.25
+
+    def sample(self, rng: random.Random, prompt_tokens: float, completion_tokens: float) -> float:
+        mean = (self.base_s + prompt_tokens * self.per_prompt_token_s
+                + completion_tokens * self.per_completion_token_s)
+        return mean * rng.lognormvariate(0, self.jitter)
+
+    @classmethod
+    def fit(cls, samples: list) -> "LatencyProfile":
+        """
+        Fit base and per-prompt-token time to measured (prompt, completion,
+        latency) triples; generation speed keeps its default since the A/B
+        runs cap completions at a fixed max_tokens
+        """
+        profile = cls()
+        if not samples:
+            return profile
+        xs = [p for p, _, _ in samples]
+        ys = [lat - c * profile.per_completion_token_s for _, c, lat in samples]
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if len(samples) >= 3 and var_x > 0:
+            slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+            profile.per_prompt_token_s = max(0.0, slope)
+        profile.base_s = max(0.0, mean_y - profile.per_prompt_token_s * mean_x)
+        return profile
+
+
+@dataclass
+class DeploymentLimits:
+    tpm: float
+    rpm: float
+    max_tokens: int
+    concurrency: int = 0   # client-side cap on calls in flight (0 = none)
+
+    @classmethod
+    def from_env(cls) -> "DeploymentLimits":
+        return cls(tpm=float(os.getenv("LLM_TPM", "30000")), rpm=float(os.getenv("LLM_RPM", "180")),
+                   max_tokens=int(os.getenv("PLANNER_MAX_TOKENS", "50")))
+
+    def charged_tokens(self, prompt_tokens: float) -> float:
+        """Tokens a request counts against TPM at admission"""
+        return prompt_tokens + self.max_tokens
+
+    def max_rps(self, dist: TokenDistribution, latency: LatencyProfile) -> tuple:
+        """(sustainable requests/sec, binding limit) for a format's mean request"""
+        bounds = {"RPM": self.rpm / 60, "TPM": self.tpm / 60 / self.charged_tokens(dist.mean_prompt)}
+        if self.concurrency:
+            mean_latency = (latency.base_s + dist.mean_prompt * latency.per_prompt_token_s
+                            + dist.mean_completion * latency.per_completion_token_s)
+            bounds["concurrency"] = self.concurrency / mean_latency
+        bound = min(bounds, key=bounds.get)
+        return bounds[bound], bound
+
+    def tpm_needed(self, dist: TokenDistribution, rps: float, headroom: float) -> float:
+        """TPM quota that serves `rps` at `headroom` utilization"""
+        return rps * 60 * self.charged_tokens(dist.mean_prompt) / headroom
+
+
+@dataclass
+class SimulationResult:
+    fmt: str
+    offered_rps: float
+    achieved_rps: float
+    queue_p50_s: float
+    queue_p99_s: float
+    latency_p50_s: float
+    latency_p99_s: float
+    tpm_utilization: float
+    cost_per_request: float
+    cost_per_day: float
+
+
+def simulate(dist: TokenDistribution, limits: DeploymentLimits, latency: LatencyProfile, pricing: ModelPricing,
+             rps: float, duration_s: float = 3600, seed: int = 7, cached_fraction: float = 0.0) -> SimulationResult:
+    """Poisson arrivals at `rps` for `duration_s`, admitted in order within RPM/TPM (and concurrency)"""
+    import heapq
+
+    rng = random.Random(seed)
+    requests_bucket, tokens_bucket = TokenBucket(limits.rpm), TokenBucket(limits.tpm)
+    # Virtual clock: the buckets start full at t=0
+    requests_bucket.updated = tokens_bucket.updated = 0.0
+    in_flight = []
+    now = arrival = 0.0
+    queue_delays, latencies, charged, cost = [], [], 0.0, 0.0
+    while True:
+        arrival += rng.expovariate(rps)
+        if arrival > duration_s:
+            break
+        prompt, completion = dist.sample(rng)
+        tokens = limits.charged_tokens(prompt)
+        now = max(now, arrival)
+        if limits.concurrency:
+            while in_flight and in_flight[0] <= now:
+                heapq.heappop(in_flight)
+            if len(in_flight) >= limits.concurrency:
+                now = heapq.heappop(in_flight)
+        # Both buckets only fill up over time, so waiting for the slower one satisfies both
+        now += max(requests_bucket.wait_time(1, now), tokens_bucket.wait_time(tokens, now))
+        for bucket, amount in ((requests_bucket, 1), (tokens_bucket, tokens)):
+            bucket.wait_time(amount, now)  # refills up to `now`
+            bucket.take(min(amount, bucket.capacity))
+        service = latency.sample(rng, prompt, completion)
+        if limits.concurrency:
+            heapq.heappush(in_flight, now + service)
+        queue_delays.append(now - arrival)
+        latencies.append(now - arrival + service)
+        charged += tokens
+        cost += pricing.request_cost(prompt, completion, cached_fraction)
+
+    count = len(latencies)
+    span = max(duration_s, now)
+    achieved = count / span
+    per_request = cost / count if count else 0.0
+    return SimulationResult(
+        fmt=dist.name, offered_rps=rps, achieved_rps=achieved,
+        queue_p50_s=percentile(queue_delays, 50), queue_p99_s=percentile(queue_delays, 99),
+        latency_p50_s=percentile(latencies, 50), latency_p99_s=percentile(latencies, 99),
+        tpm_utilization=charged / span * 60 / limits.tpm,
+        cost_per_request=per_request, cost_per_day=per_request * achieved * 86400
+    )
+
+
+def target_loads(distributions: dict, limits: DeploymentLimits, latency: dict) -> list:
+    """PLANNER_TARGET_RPS, or 50/80/100/120% of what the JSON (else first) format sustains"""
+    configured = os.getenv("PLANNER_TARGET_RPS", "")
+    if configured.strip():
+        return [float(x) for x in configured.split(",") if x.strip()]
+    reference = distributions.get("json") or next(iter(distributions.values()))
+    base, _ = limits.max_rps(reference, latency[reference.name])
+    return [round(base * f, 2) for f in (0.5, 0.8, 1.0, 1.2)]
+
+
+def plan(distributions: dict, limits: DeploymentLimits = None, pricing: ModelPricing = None,
+         latency: LatencyProfile = None, loads: list = None, duration_s: float = None):
+    """Print the capacity table, the simulated loads and the TPM needed per format"""
+    limits = limits or DeploymentLimits.from_env()
+    pricing = pricing or load_pricing()
+    duration_s = float(os.getenv("PLANNER_DURATION_S", "3600")) if duration_s is None else duration_s
+    headroom = float(os.getenv("PLANNER_HEADROOM", "0.8"))
+    cached_fraction = float(os.getenv("PLANNER_CACHED_FRACTION", "0"))
+    # Measured latencies win over the default profile
+    profiles = {name: latency or LatencyProfile.fit(dist.latency_samples())
+                for name, dist in distributions.items()}
+    loads = loads or target_loads(distributions, limits, profiles)
+
+    print(f"\n📐 Deployment: {limits.tpm:,.0f} TPM / {limits.rpm:,.0f} RPM, max_tokens {limits.max_tokens}; "
+          f"{pricing.model} at ${pricing.input_per_m:.2f} in / ${pricing.output_per_m:.2f} out per 1M tokens")
+    print(f"\n{'Format':7} {'prompt mean':>11} {'p95':>6} {'charged/req':>11} {'max req/s':>10} {'bound':>6} "
+          f"{'$/1k req':>9} {'base+ms/1k tok':>15}")
+    capacity = {}
+    for name, dist in distributions.items():
+        rps, bound = limits.max_rps(dist, profiles[name])
+        capacity[name] = rps
+        cost = pricing.request_cost(dist.mean_prompt, dist.mean_completion, cached_fraction) * 1000
+        profile = profiles[name]
+        print(f"{name.upper():7} {dist.mean_prompt:>11.0f} {percentile(dist.prompt_tokens, 95):>6.0f} "
+              f"{limits.charged_tokens(dist.mean_prompt):>11.0f} {rps:>10.2f} {bound:>6} {cost:>9.3f} "
+              f"{profile.base_s:>7.2f}s+{profile.per_prompt_token_s * 1e6:>4.0f}ms")
+    sparse = [f"{name.upper()} ({len(dist.prompt_tokens)})" for name, dist in distributions.items()
+              if len(dist.prompt_tokens) < MIN_PERCENTILE_SAMPLES]
+    if sparse:
+        print(f"⚠️  Too few samples for percentiles: {', '.join(sparse)}; p95 is the largest sample "
+              f"and the latency fit is a point estimate")
+    if "json" in capacity and "toon" in capacity:
+        print(f"\n⚡ TOON sustains {capacity['toon'] / capacity['json']:.2f}x the requests/sec of JSON "
+              f"on this deployment")
+
+    print(f"\n⏱️  Simulated {duration_s:.0f}s per load (Poisson arrivals, in-order admission within RPM/TPM):")
+    print(f"{'offered':>8} {'format':>7} {'achieved':>9} {'queue p50':>10} {'queue p99':>10} "
+          f"{'latency p99':>12} {'TPM used':>9} {'$/day':>10}")
+    for rps in loads:
+        for name, dist in distributions.items():
+            r = simulate(dist, limits, profiles[name], pricing, rps, duration_s, cached_fraction=cached_fraction)
+            print(f"{rps:>8.2f} {name.upper():>7} {r.achieved_rps:>9.2f} {r.queue_p50_s:>9.2f}s "
+                  f"{r.queue_p99_s:>9.2f}s {r.latency_p99_s:>11.2f}s {r.tpm_utilization:>9.0%} "
+                  f"{r.cost_per_day:>10,.2f}")
+
+    print(f"\n🧮 TPM quota for each load at {headroom:.0%} utilization:")
+    for rps in loads:
+        needed = ", ".join(f"{name.upper()} {limits.tpm_needed(dist, rps, headroom):,.0f}"
+                           for name, dist in distributions.items())
+        print(f"   {rps:.2f} req/s: {needed} (RPM needed {math.ceil(rps * 60 / headroom):,})")
+
+
+def main():
+    print("\n" + "=" * 70)
+    print("  Capacity and Cost Planner")
+    print("=" * 70)
+    if len(sys.argv) > 1:
+        distributions = distributions_from_measurements(sys.argv[1])
+        print(f"\n📊 Token distributions from {sys.argv[1]}: "
+              + ", ".join(f"{d.name.upper()} {len(d.prompt_tokens)} calls" for d in distributions.values()))
+    else:
+        distributions = distributions_from_payloads()
+        print("\n📊 Token distributions estimated offline from 200 generated payloads "
+              "(pass a TOON_AB_OUTPUT file for measured ones)")
+    plan(distributions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Bounded Conversation Memory
+Keeps multi-turn sessions within a token budget by re-encoding large tool
+results as TOON, trimming what is still too long, and folding older turns
+into a running summary
+"""
+
+import json
+import tiktoken
+from toon_format import encode
+from toonVsJson import count_tokens
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = "gpt-4") -> str:
+    """First `max_tokens` tokens of text"""
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+
+def compact_tool_result(text: str, max_tokens: int = 800, model: str = "gpt-4") -> str:
+    """
+    Shrink one tool result for the prompt
+
+    JSON payloads (e.g. work items) are re-encoded as TOON. Anything still
+    over `max_tokens` keeps its head (whole lines, then the first line that
+    does not fit cut by tokens) and notes how much was dropped.
+    """
+    text = str(text)
+    try:
+        text = encode(json.loads(text))
+    except (ValueError, TypeError):
+        pass
+
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    kept, used = [], 0
+    for line in lines:
+        line_tokens = count_tokens(line, model) + 1
+        if used + line_tokens > max_tokens:
+            if max_tokens - used > 1:
+                kept.append(truncate_tokens(line, max_tokens - used - 1, model))
+            break
+        kept.append(line)
+        used += line_tokens
+    omitted = len(lines) - len(kept)
+    note = f"truncated, {omitted} more lines omitted" if omitted else "truncated"
+    return "\n".join(kept) + f"\n... ({note})"
+
+
+def summarize_turn(turn: dict, max_chars: int = 200) -> str:
+    """Local one-line summary of a turn (no LLM call)"""
+    answer = " ".join(turn["assistant"].split())
+    if len(answer) > max_chars:
+        answer = answer[:max_chars].rstrip() + "..."
+    tools = f" [{len(turn['tool_results'])} tool result(s)]" if turn["tool_results"] else ""
+    return f"- User: {turn['user']}{tools} -> Assistant: {answer}"
+
+
+class ConversationMemory:
+    """Recent turns verbatim, older turns as a summary, within max_tokens"""
+
+    def __init__(self, max_tokens: int = 4000, keep_recent_turns: int = 2,
+                 tool_result_tokens: int = 800, model: str = "gpt-4", summarizer=None):
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.tool_result_tokens = tool_result_tokens
+        self.model = model
+        # Optional async callable(text) -> str for LLM summaries of old turns
+        self.summarizer = summarizer
+        self.summary = ""
+        self.turns = []
+
+    def compact_tool_result(self, text: str) -> str:
+        """Apply this memory's tool result budget"""
+        return compact_tool_result(text, self.tool_result_tokens, self.model)
+
+    def add_turn(self, user: str, assistant: str, tool_results: list = None):
+        """
+        Store a finished turn
+
+        Tool results are stored as given; pass them through
+        compact_tool_result when they are collected, so they are compacted
+        once for both the current prompt and the history.
+        """
+        self.turns.append({
+            "user": user,
+            "assistant": assistant,
+            "tool_results": list(tool_results or [])
+        })
+
+    def _turn_messages(self, turn: dict) -> list:
+        user = turn["user"]
+        if turn["tool_results"]:
+            user += "\n\nTool results:\n" + "\n".join(turn["tool_results"])
+        return [{"role": "user", "content": user}, {"role": "assistant", "content": turn["assistant"]}]
+
+    def history(self) -> list:
+        """Prior conversation as chat messages (summary first, then recent turns)"""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of earlier conversation:\n{self.summary}"})
+        for turn in self.turns:
+            messages.extend(self._turn_messages(turn))
+        return messages
+
+    def token_count(self) -> int:
+        """Tokens the history adds to each prompt"""
+        return sum(count_tokens(m["content"], self.model) for m in self.history())
+
+    async def compact(self):
+        """Fold the oldest turns into the summary until the budget is met"""
+        while self.token_count() > self.max_tokens and len(self.turns) > self.keep_recent_turns:
+            oldest = self.turns.pop(0)
+            entry = summarize_turn(oldest)
+            if self.summarizer:
+                entry = "- " + " ".join((await self.summarizer(entry)).split())
+            self.summary = f"{self.summary}\n{entry}".strip()
+
+        # Summary itself too long: keep only its most recent entries
+        while self.summary and self.token_count() > self.max_tokens:
+            lines = self.summary.splitlines()
+            if len(lines) <= 1:
+                self.summary = ""
+                break
+            self.summary = "\n".join(lines[len(lines) // 2:])
+        return self.token_count()
+
+    def as_langchain_messages(self) -> list:
+        """History converted to LangChain message objects"""
+        from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+        types = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+        return [types[m["role"]](content=m["content"]) for m in self.history()]
@@ -0,0 +1,330 @@
+"""
+Map-Reduce Test Case Generation for Epics
+Test cases for every user story under an epic, generated with one small LLM
+call per story or acceptance criterion (run concurrently) instead of one
+prompt whose single long completion is slow and gets truncated for epics
+with many stories
+
+Stages, each reporting items, calls, time and items/s:
+    fetch    epic -> features -> stories (+ their existing test cases):
+             one WIQL query and one batch lookup per level of the tree
+    map      one chat call per acceptance criterion (per story when it has
+             none), through the shared scheduler at batch priority
+    reduce   near-identical titles dropped by normalized-title hashing, per
+             story, including test cases the story already has
+    submit   each story's cases created as its children in grouped calls
+
+Stories run as independent pipelines, so one story's cases are submitted
+while others are still being generated (stages overlap: "wall s" is first
+start to last finish of a stage, "busy s" adds up its concurrent calls).
+
+    python epicTestCases.py 1             # epic #1 (Azure OpenAI + ADO_MCP_SERVER)
+    python epicTestCases.py 1 --mock      # fake MCP server and local mock LLM
+    python epicTestCases.py 1 --dry-run   # generate and deduplicate, submit nothing
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from mcpTools import McpToolClient, connect_ado_plugin
+from workItemBatcher import WorkItemBatcher, create_test_cases
+from requestScheduler import get_scheduler, estimate_request_tokens, llm_client_options, BATCH
+from scriptProfiler import profile_if_requested
+
+# Load environment variables
+load_dotenv()
+
+
+CONTAINER_TYPES = ("Epic", "Feature")
+STORY_TYPES = ("User Story", "Product Backlog Item", "Requirement")
+TEST_CASE_TYPE = "Test Case"
+# WIQL "IN" lists are kept short enough for the query length limit
+WIQL_CHUNK = 200
+# Test cases per `add child work items` call
+SUBMIT_BATCH = 50
+
+TEST_CASE_INSTRUCTIONS = """
+You write manual test cases for Azure DevOps user stories.
+
+For the story and acceptance criterion in the user's message, write distinct
+test cases that together cover the positive path, edge cases and negative
+scenarios. Each title is one short sentence saying what is verified; steps
+are numbered, each with its expected result. Do not repeat test cases that
+only differ in wording.
+"""
+
+TEST_CASES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "test_cases": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "steps": {"type": "string"}
+                },
+                "required": ["title", "steps"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["test_cases"],
+    "additionalProperties": False
+}
+
+# Words that don't change what a test case checks
+TITLE_STOPWORDS = {
+    "a", "an", "the", "that", "this", "is", "are", "be", "to", "of", "for", "with", "on", "in", "when",
+    "verify", "verifies", "check", "checks", "ensure", "ensures", "test", "tests", "validate", "validates",
+    "should", "can", "user", "users"
+}
+
+
+@dataclass
+class StageMetrics:
+    """Work done by one pipeline stage; `busy_s` sums concurrent calls, `span_s` is wall time"""
+    name: str
+    items: int = 0
+    calls: int = 0
+    busy_s: float = 0.0
+    first: float = None
+    last: float = None
+
+    def record(self, started: float, items: int = 0, calls: int = 1):
+        finished = time.perf_counter()
+        self.items += items
+        self.calls += calls
+        self.busy_s += finished - started
+        self.first = started if self.first is None else min(self.first, started)
+        self.last = finished if self.last is None else max(self.last, finished)
+
+    @property
+    def span_s(self) -> float:
+        return self.last - self.first if self.first is not None else 0.0
+
+    @property
+    def items_per_s(self) -> float:
+        return self.items / self.span_s if self.span_s else 0.0
+
+
+def title_key(title: str) -> str:
+    """Hash of a title's significant words in order, ignoring case, punctuation and filler words"""
+    words = [word for word in re.findall(r"[a-z0-9]+", title.lower()) if word not in TITLE_STOPWORDS]
+    return hashlib.blake2b(" ".join(words).encode(), digest_size=8).hexdigest()
+
+
+def deduplicate(test_cases: list, existing_titles=()) -> tuple:
+    """(unique test cases, duplicates dropped); first occurrence wins"""
+    seen = {title_key(title) for title in existing_titles}
+    unique = []
+    for test_case in test_cases:
+        key = title_key(test_case["title"])
+        if key not in seen:
+            seen.add(key)
+            unique.append(test_case)
+    return unique, len(test_cases) - len(unique)
+
+
+def acceptance_criteria(story: dict) -> list:
+    """Acceptance criteria of a story, one per line or bullet (HTML tags stripped)"""
+    text = (story.get("fields") or {}).get("Microsoft.VSTS.Common.AcceptanceCriteria") or ""
+    text = re.sub(r"<(br|/p|/li|/div)\s*/?>", "\n", text, flags=re.IGNORECASE)
+    text = re.sub(r"<[^>]+>", "", text)
+    lines = (re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip() for line in text.splitlines())
+    return [line for line in lines if line]
+
+
+def unit_prompt(story: dict, criterion: str = None, cases: int = 3) -> str:
+    """User message for one map unit: the story plus (optionally) one criterion"""
+    fields = story.get("fields") or {}
+    parts = [f"User story #{story['id']}: {fields.get('System.Title', '')}"]
+    description = re.sub(r"<[^>]+>", "", fields.get("System.Description") or "").strip()
+    if description:
+        parts.append(f"Description: {description}")
+    parts.append(f"Acceptance criterion: {criterion}" if criterion else "Acceptance criteria: none given")
+    parts.append(f"Write {cases} test cases.")
+    return "\n".join(parts)
+
+
+class EpicTestCasePipeline:
+    """Fetch -> map -> reduce -> submit for every story under an epic"""
+
+    def __init__(self, client: McpToolClient, llm, deployment: str, project: str = "demo",
+                 cases_per_unit: int = None, concurrency: int = None, scheduler=None, dry_run: bool = False):
+        self.client = client
+        self.llm = llm
+        self.deployment = deployment
+        self.project = project
+        self.cases_per_unit = (int(os.getenv("EPIC_CASES_PER_UNIT", "3")) if cases_per_unit is None
+                               else cases_per_unit)
+        self.llm_calls = asyncio.Semaphore(int(os.getenv("EPIC_MAP_CONCURRENCY", "8")) if concurrency is None
+                                           else concurrency)
+        self.scheduler = scheduler or get_scheduler()
+        self.dry_run = dry_run
+        self.batcher = WorkItemBatcher(client)
+        self.wiql_tool = client.find("wiql")
+        self.stages = {name: StageMetrics(name) for name in ("fetch", "map", "reduce", "submit")}
+        self.duplicates = 0
+        self.failed_units = 0
+
+    async def _children(self, parent_ids: list, work_item_type: str = None) -> list:
+        """Direct children of several work items: one WIQL query per chunk, then batched lookups"""
+        ids = []
+        for i in range(0, len(parent_ids), WIQL_CHUNK):
+            chunk = ", ".join(str(p) for p in parent_ids[i:i + WIQL_CHUNK])
+            wiql = f"SELECT [System.Id] FROM WorkItems WHERE [System.Parent] IN ({chunk})"
+            if work_item_type:
+                wiql += f" AND [System.WorkItemType] = '{work_item_type}'"
+            result = await self.client.call_json(self.wiql_tool, project=self.project, wiql=wiql)
+            ids += [ref["id"] for ref in (result or {}).get("workItems", [])]
+        return await self.batcher.get_many(ids, self.project) if ids else []
+
+    async def fetch(self, epic_id: int) -> tuple:
+        """(stories under the epic, {story id: titles of its existing test cases})"""
+        if not self.wiql_tool:
+            raise RuntimeError("The MCP server has no WIQL tool to list child work items")
+        stage = self.stages["fetch"]
+        started, calls_before = time.perf_counter(), self.client.total_calls
+        stories, frontier = [], [int(epic_id)]
+        while frontier:
+            children = await self._children(frontier)
+            stories += [c for c in children if c["fields"].get("System.WorkItemType") in STORY_TYPES]
+            frontier = [c["id"] for c in children if c["fields"].get("System.WorkItemType") in CONTAINER_TYPES]
+        existing = {story["id"]: [] for story in stories}
+        if stories:
+            for test_case in await self._children(list(existing), TEST_CASE_TYPE):
+                existing[int(test_case["fields"]["System.Parent"])].append(test_case["fields"]["System.Title"])
+        stage.record(started, items=len(stories), calls=self.client.total_calls - calls_before)
+        return stories, existing
+
+    async def generate(self, story: dict, criterion: str = None) -> list:
+        """Map: test cases for one story/criterion ([] if the call or its JSON fails)"""
+        messages = [
+            {"role": "system", "content": TEST_CASE_INSTRUCTIONS},
+            {"role": "user", "content": unit_prompt(story, criterion, self.cases_per_unit)}
+        ]
+        max_tokens = 300 * self.cases_per_unit
+        stage = self.stages["map"]
+        async with self.llm_calls:
+            started = time.perf_counter()
+            try:
+                response = await self.scheduler.asubmit(
+                    lambda: self.llm.chat.completions.create(
+                        model=self.deployment,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        response_format={"type": "json_schema", "json_schema": {
+                            "name": "test_cases", "strict": True, "schema": TEST_CASES_SCHEMA
+                        }}
+                    ),
+                    estimate_request_tokens(messages, max_tokens, self.deployment),
+                    BATCH
+                )
+                cases = json.loads(response.choices[0].message.content)["test_cases"]
+            except Exception as e:
+                self.failed_units += 1
+                print(f"   ⚠️  Story #{story['id']}{' (' + criterion + ')' if criterion else ''}: {e}")
+                cases = []
+            stage.record(started, items=len(cases))
+        return [{"title": str(c["title"]).strip(), "steps": str(c.get("steps", ""))} for c in cases if c.get("title")]
+
+    async def process_story(self, story: dict, existing_titles: list) -> list:
+        """Map every unit of one story, reduce its cases, then submit them"""
+        criteria = acceptance_criteria(story) or [None]
+        generated = await asyncio.gather(*(self.generate(story, c) for c in criteria))
+
+        started = time.perf_counter()
+        unique, dropped = deduplicate([case for cases in generated for case in cases], existing_titles)
+        self.duplicates += dropped
+        self.stages["reduce"].record(started, items=len(unique), calls=0)
+
+        if not unique or self.dry_run:
+            return unique
+        # Stories submit concurrently: a client of its own counts only this story's calls
+        started, submitter = time.perf_counter(), McpToolClient(self.client.functions)
+        try:
+            created = await create_test_cases(submitter, unique, self.project, parent_id=story["id"],
+                                              batch_size=SUBMIT_BATCH)
+        finally:
+            for name, count in submitter.call_counts.items():
+                self.client.call_counts[name] = self.client.call_counts.get(name, 0) + count
+        self.stages["submit"].record(started, items=len(created), calls=submitter.total_calls)
+        return created
+
+    async def run(self, epic_id: int) -> list:
+        """Generate and submit test cases for every story under `epic_id`"""
+        stories, existing = await self.fetch(epic_id)
+        results = await asyncio.gather(*(self.process_story(s, existing[s["id"]]) for s in stories))
+        return [test_case for created in results for test_case in created]
+
+    def report(self) -> str:
+        """Per-stage table for console output"""
+        lines = [f"{'Stage':8} {'items':>7} {'calls':>6} {'busy s':>8} {'wall s':>8} {'items/s':>9}"]
+        for stage in self.stages.values():
+            lines.append(f"{stage.name:8} {stage.items:>7} {stage.calls:>6} {stage.busy_s:>8.2f} "
+                         f"{stage.span_s:>8.2f} {stage.items_per_s:>9.1f}")
+        lines.append(f"{self.duplicates} duplicate(s) dropped, {self.failed_units} failed map call(s); "
+                     f"{self.batcher.report()}")
+        return "\n".join(lines)
+
+
+async def main():
+    print("\n" + "=" * 70)
+    print("  Map-Reduce Test Case Generation for an Epic")
+    print("=" * 70)
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    epic_id = int(args[0]) if args else 1
+    mock = "--mock" in sys.argv
+    server = None
+    scheduler = None
+    if mock:
+        from mockOpenAIServer import start_mock_server
+        from requestScheduler import RequestScheduler
+        os.environ["ADO_MCP_SERVER"] = "fake"
+        server, endpoint = start_mock_server()
+        api_key, deployment = "mock", "mock"
+        # The mock has no quota
+        scheduler = RequestScheduler(rpm=100_000, tpm=100_000_000)
+    else:
+        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        api_key = os.getenv("AZURE_OPENAI_API_KEY")
+        deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
+        if not endpoint or not api_key:
+            print("❌ Set AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY in .env (or use --mock)")
+            return
+
+    from openai import AsyncAzureOpenAI
+    llm = AsyncAzureOpenAI(azure_endpoint=endpoint, api_key=api_key,
+                           api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-08-01-preview"),
+                           **llm_client_options(async_client=True))
+    project = os.getenv("AZURE_DEVOPS_PROJECT", "demo")
+    plugin, kernel = await connect_ado_plugin()
+    try:
+        pipeline = EpicTestCasePipeline(McpToolClient.from_kernel(kernel), llm, deployment, project,
+                                        scheduler=scheduler, dry_run="--dry-run" in sys.argv)
+        start = time.perf_counter()
+        created = await pipeline.run(epic_id)
+        elapsed = time.perf_counter() - start
+        stories = pipeline.stages["fetch"].items
+        verb = "Generated" if pipeline.dry_run else "Created"
+        print(f"\n🧪 {verb} {len(created)} test case(s) for {stories} stories under epic #{epic_id} "
+              f"in {elapsed:.2f}s\n")
+        print(pipeline.report())
+    finally:
+        await plugin.close()
+        await llm.close()
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    with profile_if_requested("epicTestCases"):
+        asyncio.run(main())
@@ -0,0 +1,307 @@
+"""
+Fake Azure DevOps MCP Server
+A local stdio MCP server with the same tool names and arguments as
+@azure-devops/mcp, backed by generated work items, for offline testing
+
+Run it through MCPStdioPlugin (or set ADO_MCP_SERVER=fake, see mcpTools.py):
+    command = sys.executable, args = ["fakeMcpServer.py"]
+
+Settings (environment):
+    FAKE_MCP_WORK_ITEMS   number of generated work items (default 500)
+    FAKE_MCP_LATENCY_MS   simulated latency per tool call (default 50)
+
+Speaks newline-delimited JSON-RPC 2.0 directly, so it has no dependency
+on a particular version of the mcp SDK.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+from datetime import datetime, timedelta, timezone
+
+
+PROTOCOL_VERSION = "2024-11-05"
+STATES = ["New", "Active", "Resolved", "Closed"]
+AREAS = ["demo", "demo\\Web", "demo\\Mobile", "demo\\Platform"]
+
+
+def generate_work_items(count: int, seed: int = 7) -> dict:
+    """Epic -> Features -> User Stories -> Tasks/Bugs, deterministic"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    items = {}
+
+    def add(item_id, item_type, parent_id):
+        changed = start + timedelta(minutes=item_id * 37)
+        topic = rng.choice(["Login", "Checkout", "Search", "Navigation", "Profile", "Reports"])
+        noun = rng.choice(["flow", "page", "API", "menu", "export"])
+        criteria = ""
+        if item_type == "User Story":
+            criteria = "\n".join(f"- Criterion {n} for story {item_id}" for n in range(1, rng.randint(2, 4) + 1))
+        items[item_id] = {
+            "id": item_id,
+            "rev": rng.randint(1, 9),
+            "fields": {
+                "System.WorkItemType": item_type,
+                "System.Title": f"{item_type} {item_id}: {topic} {noun}",
+                "System.State": rng.choice(STATES),
+                "System.AreaPath": rng.choice(AREAS),
+                "System.IterationPath": f"demo\\Sprint {rng.randint(1, 12)}",
+                "System.Parent": parent_id,
+                "System.ChangedDate": changed.isoformat().replace("+00:00", "Z"),
+                "System.Description": f"Description of {item_type.lower()} {item_id}.",
+                "Microsoft.VSTS.Common.AcceptanceCriteria": criteria,
+                "Microsoft.VSTS.Common.Priority": rng.randint(1, 4)
+            },
+            "url": f"https://dev.azure.com/fake/demo/_apis/wit/workItems/{item_id}",
+            "_links": {"self": {"href": f"https://dev.azure.com/fake/demo/_apis/wit/workItems/{item_id}"}}
+        }
+
+    add(1, "Epic", None)
+    next_id = 2
+    features = []
+    for _ in range(3):
+        add(next_id, "Feature", 1)
+        features.append(next_id)
+        next_id += 1
+    parents = list(features)
+    while next_id <= count:
+        parent = rng.choice(parents)
+        parent_type = items[parent]["fields"]["System.WorkItemType"]
+        item_type = "User Story" if parent_type in ("Epic", "Feature") else rng.choice(["Task", "Bug"])
+        add(next_id, item_type, parent)
+        if item_type == "User Story":
+            parents.append(next_id)
+        next_id += 1
+    # The example prompts refer to "US #13"
+    if 13 in items:
+        items[13]["fields"]["System.WorkItemType"] = "User Story"
+    return items
+
+
+class FakeAdoServer:
+    """Tool implementations plus per-tool call counters"""
+
+    def __init__(self, count: int, latency_ms: float):
+        self.items = generate_work_items(count)
+        self.latency = latency_ms / 1000
+        self.call_counts = {}
+        self.next_id = max(self.items) + 1
+
+    # Tool schemas mirror @azure-devops/mcp
+    TOOLS = [
+        {
+            "name": "wit_get_work_item",
+            "description": "Get a single work item by ID.",
+            "inputSchema": {"type": "object", "properties": {
+                "id": {"type": "number"}, "project": {"type": "string"}, "expand": {"type": "string"}
+            }, "required": ["id", "project"]}
+        },
+        {
+            "name": "wit_get_work_items_batch_by_ids",
+            "description": "Retrieve list of work items by IDs in batch.",
+            "inputSchema": {"type": "object", "properties": {
+                "project": {"type": "string"}, "ids": {"type": "array", "items": {"type": "number"}},
+                "fields": {"type": "array", "items": {"type": "string"}}
+            }, "required": ["project", "ids"]}
+        },
+        {
+            "name": "wit_add_child_work_items",
+            "description": "Create one or many child work items of a parent work item.",
+            "inputSchema": {"type": "object", "properties": {
+                "parentId": {"type": "number"}, "project": {"type": "string"},
+                "workItemType": {"type": "string"},
+                "items": {"type": "array", "items": {"type": "object", "properties": {
+                    "title": {"type": "string"}, "description": {"type": "string"}
+                }}}
+            }, "required": ["parentId", "project", "workItemType", "items"]}
+        },
+        {
+            "name": "testplan_create_test_case",
+            "description": "Creates a new test case work item.",
+            "inputSchema": {"type": "object", "properties": {
+                "project": {"type": "string"}, "title": {"type": "string"},
+                "steps": {"type": "string"}, "priority": {"type": "number"}
+            }, "required": ["project", "title"]}
+        },
+        {
+            "name": "search_workitem",
+            "description": "Get work item search results for a given search text.",
+            "inputSchema": {"type": "object", "properties": {
+                "searchText": {"type": "string"},
+                "project": {"type": "array", "items": {"type": "string"}},
+                "areaPath": {"type": "array", "items": {"type": "string"}},
+                "workItemType": {"type": "array", "items": {"type": "string"}},
+                "state": {"type": "array", "items": {"type": "string"}},
+                "top": {"type": "number"}, "skip": {"type": "number"}
+            }, "required": ["searchText"]}
+        },
+        {
+            "name": "wit_query_by_wiql",
+            "description": "Run a WIQL query and return the matching work item IDs.",
+            "inputSchema": {"type": "object", "properties": {
+                "project": {"type": "string"}, "wiql": {"type": "string"}, "top": {"type": "number"}
+            }, "required": ["project", "wiql"]}
+        },
+        {
+            "name": "fake_touch_work_items",
+            "description": "Test helper: bump revision and changed date of some work items.",
+            "inputSchema": {"type": "object", "properties": {
+                "ids": {"type": "array", "items": {"type": "number"}}
+            }, "required": ["ids"]}
+        },
+        {
+            "name": "fake_get_call_counts",
+            "description": "Test helper: number of calls made to each tool.",
+            "inputSchema": {"type": "object", "properties": {}}
+        }
+    ]
+
+    def call(self, name: str, args: dict):
+        self.call_counts[name] = self.call_counts.get(name, 0) + 1
+        handler = getattr(self, f"tool_{name}", None)
+        if handler is None:
+            raise ValueError(f"Unknown tool: {name}")
+        if not name.startswith("fake_"):
+            time.sleep(self.latency)
+        return handler(**args)
+
+    def tool_wit_get_work_item(self, id, project=None, expand=None):
+        item = self.items.get(int(id))
+        if item is None:
+            raise ValueError(f"Work item {id} does not exist")
+        return item
+
+    def tool_wit_get_work_items_batch_by_ids(self, ids, project=None, fields=None):
+        found = [self.items[int(i)] for i in ids if int(i) in self.items]
+        if fields:
+            found = [{**item, "fields": {k: v for k, v in item["fields"].items() if k in fields}} for item in found]
+        return found
+
+    def tool_search_workitem(self, searchText="*", project=None, areaPath=None, workItemType=None,
+                             state=None, top=10, skip=0, **_):
+        def matches(item):
+            fields = item["fields"]
+            if searchText not in ("", "*") and searchText.lower() not in fields["System.Title"].lower():
+                return False
+            if workItemType and fields["System.WorkItemType"] not in workItemType:
+                return False
+            if state and fields["System.State"] not in state:
+                return False
+            if areaPath and not any(fields["System.AreaPath"].startswith(a) for a in areaPath):
+                return False
+            return True
+
+        found = [item for _, item in sorted(self.items.items()) if matches(item)]
+        return {"count": len(found), "results": found[int(skip):int(skip) + int(top)]}
+
+    def tool_wit_query_by_wiql(self, project, wiql, top=20000):
+        # Understands the clauses the snapshot sync and the epic walk use:
+        # [System.ChangedDate] > 'timestamp', [System.Parent] IN (ids) / = id,
+        # [System.WorkItemType] = 'type'
+        match = re.search(r"\[System\.ChangedDate\]\s*>=?\s*'([^']+)'", wiql)
+        since = match.group(1) if match else ""
+        match = re.search(r"\[System\.Parent\]\s*(?:IN\s*\(([^)]*)\)|=\s*(\d+))", wiql, re.IGNORECASE)
+        parents = {int(i) for i in re.findall(r"\d+", match.group(1) or match.group(2))} if match else None
+        match = re.search(r"\[System\.WorkItemType\]\s*=\s*'([^']+)'", wiql)
+        item_type = match.group(1) if match else None
+
+        def matches(fields):
+            return (fields["System.ChangedDate"] > since
+                    and (parents is None or fields["System.Parent"] in parents)
+                    and (item_type is None or fields["System.WorkItemType"] == item_type))
+
+        found = sorted(
+            (item for item in self.items.values() if matches(item["fields"])),
+            key=lambda item: item["fields"]["System.ChangedDate"]
+        )
+        return {"workItems": [{"id": item["id"]} for item in found[:int(top)]]}
+
+    def tool_fake_touch_work_items(self, ids):
+        now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        for i in ids:
+            item = self.items[int(i)]
+            item["rev"] += 1
+            item["fields"]["System.ChangedDate"] = now
+        return {"touched": len(ids)}
+
+    def _create(self, item_type, title, description, parent_id):
+        item_id = self.next_id
+        self.next_id += 1
+        self.items[item_id] = {
+            "id": item_id,
+            "rev": 1,
+            "fields": {
+                "System.WorkItemType": item_type,
+                "System.Title": title,
+                "System.State": "Design" if item_type == "Test Case" else "New",
+                "System.AreaPath": "demo",
+                "System.Parent": parent_id,
+                "System.ChangedDate": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                "System.Description": description
+            }
+        }
+        return self.items[item_id]
+
+    def tool_wit_add_child_work_items(self, parentId, project, workItemType, items):
+        return [self._create(workItemType, i.get("title", ""), i.get("description", ""), int(parentId)) for i in items]
+
+    def tool_testplan_create_test_case(self, project, title, steps="", priority=2, **_):
+        return self._create("Test Case", title, steps, None)
+
+    def tool_fake_get_call_counts(self):
+        return self.call_counts
+
+
+def handle(server: FakeAdoServer, request: dict):
+    """Dispatch one JSON-RPC request; returns the response dict or None"""
+    method = request.get("method")
+    params = request.get("params") or {}
+    if "id" not in request:
+        return None  # notification (e.g. notifications/initialized)
+
+    try:
+        if method == "initialize":
+            result = {
+                "protocolVersion": params.get("protocolVersion", PROTOCOL_VERSION),
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": {"name": "fake-azure-devops", "version": "0.1.0"}
+            }
+        elif method == "ping":
+            result = {}
+        elif method == "tools/list":
+            result = {"tools": server.TOOLS}
+        elif method == "tools/call":
+            try:
+                value = server.call(params["name"], params.get("arguments") or {})
+                result = {"content": [{"type": "text", "text": json.dumps(value)}], "isError": False}
+            except Exception as e:
+                result = {"content": [{"type": "text", "text": f"Error: {e}"}], "isError": True}
+        else:
+            return {"jsonrpc": "2.0", "id": request["id"],
+                    "error": {"code": -32601, "message": f"Method not found: {method}"}}
+    except Exception as e:
+        return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32603, "message": str(e)}}
+    return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+
+def main():
+    server = FakeAdoServer(
+        count=int(os.getenv("FAKE_MCP_WORK_ITEMS", "500")),
+        latency_ms=float(os.getenv("FAKE_MCP_LATENCY_MS", "50"))
+    )
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        response = handle(server, json.loads(line))
+        if response is not None:
+            sys.stdout.write(json.dumps(response) + "\n")
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Hedged LLM Requests
+Cuts tail latency by sending a second copy of a slow request once it has
+run longer than the observed p95, keeping whichever answers first and
+cancelling the other
+
+A budget caps hedges at a fraction of all requests (HEDGE_MAX_RATIO), so the
+extra load stays small while the stalled few percent stop defining p99.
+
+Enable with HEDGE_REQUESTS=true in .env. Compare p99 with and without
+hedging against the local mock server:
+    python hedgedRequests.py
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from toonAbBenchmark import percentile
+
+# Load environment variables
+load_dotenv()
+
+
+def hedging_enabled() -> bool:
+    """Whether HEDGE_REQUESTS is switched on"""
+    return os.getenv("HEDGE_REQUESTS", "false").lower() == "true"
+
+
+class Hedger:
+    """Issues a backup request after a percentile-derived delay, within a budget"""
+
+    def __init__(self, hedge_percentile: float = None, max_hedge_ratio: float = None,
+                 initial_delay_s: float = None, min_samples: int = 20, window: int = 500,
+                 min_delay_s: float = 0.05):
+        self.hedge_percentile = float(os.getenv("HEDGE_PERCENTILE", "95")) if hedge_percentile is None else hedge_percentile
+        self.max_hedge_ratio = float(os.getenv("HEDGE_MAX_RATIO", "0.1")) if max_hedge_ratio is None else max_hedge_ratio
+        # Used until min_samples latencies have been observed
+        self.initial_delay_s = (float(os.getenv("HEDGE_INITIAL_DELAY_S", "2.0"))
+                                if initial_delay_s is None else initial_delay_s)
+        self.min_samples = min_samples
+        self.min_delay_s = min_delay_s
+        # Primary attempt latencies (cancelled ones count with their elapsed time)
+        self.latencies = deque(maxlen=window)
+        # End-to-end latency seen by callers
+        self.effective = []
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.lock = threading.Lock()
+        self._executor = None
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary before hedging"""
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return self.initial_delay_s
+            return max(self.min_delay_s, percentile(list(self.latencies), self.hedge_percentile))
+
+    def _start_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def _take_hedge(self) -> bool:
+        """Reserve a hedge if the budget allows one"""
+        with self.lock:
+            if self.hedges + 1 > self.max_hedge_ratio * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def _finish(self, elapsed: float, hedge_won: bool):
+        # When the hedge wins the primary's latency is censored at `elapsed`
+        with self.lock:
+            self.latencies.append(elapsed)
+            self.effective.append(elapsed)
+            if hedge_won:
+                self.hedge_wins += 1
+
+    async def call(self, make_call):
+        """
+        Await `make_call()`, hedged
+
+        `make_call` is invoked once more (for the hedge) if the first
+        attempt is still running after hedge_delay(). The loser is
+        cancelled. If an attempt fails while another is still running,
+        the other one is awaited instead.
+        """
+        self._start_request()
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(make_call())
+        attempts = [primary]
+        winner = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+            if not done and self._take_hedge():
+                attempts.append(asyncio.ensure_future(make_call()))
+
+            pending = set(attempts)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if not task.cancelled() and task.exception() is None), None)
+        finally:
+            # Also reached when the caller itself is cancelled
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+        self._finish(time.perf_counter() - started, winner is not None and winner is not primary)
+        if winner is None:
+            return primary.result()  # raises the primary's error
+        return winner.result()
+
+    def call_sync(self, make_call):
+        """
+        Thread-based version of call for blocking clients
+
+        `make_call(cancelled)` receives a threading.Event that is set when
+        the other attempt has won; long-running calls should check it and
+        clean up (e.g. cancel an Assistants run).
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+        self._start_request()
+        started = time.perf_counter()
+        events = [threading.Event()]
+        primary = self._executor.submit(make_call, events[0])
+        attempts = [primary]
+
+        done, _ = wait([primary], timeout=self.hedge_delay())
+        if not done and self._take_hedge():
+            events.append(threading.Event())
+            attempts.append(self._executor.submit(make_call, events[1]))
+
+        winner = None
+        pending = set(attempts)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if f.exception() is None), None)
+        for future, event in zip(attempts, events):
+            if future is not winner:
+                event.set()
+
+        self._finish(time.perf_counter() - started, winner is not None and winner is not primary)
+        if winner is None:
+            return primary.result()
+        return winner.result()
+
+    def latency_summary(self) -> dict:
+        """p50/p95/p99 of end-to-end latency"""
+        with self.lock:
+            values = list(self.effective)
+        return {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+
+    def report(self) -> str:
+        """One-line summary for console output"""
+        summary = self.latency_summary()
+        return (f"{self.requests} request(s), {self.hedges} hedged ({self.hedge_wins} won by the hedge), "
+                f"p50 {summary['p50']:.2f}s / p95 {summary['p95']:.2f}s / p99 {summary['p99']:.2f}s, "
+                f"hedge after {self.hedge_delay():.2f}s")
+
+
+_default_hedger = None
+
+
+def get_hedger():
+    """Shared Hedger when HEDGE_REQUESTS=true, else None"""
+    global _default_hedger
+    if _default_hedger is None and hedging_enabled():
+        _default_hedger = Hedger()
+    return _default_hedger
+
+
+async def run_load(client, deployment: str, requests: int, concurrency: int, hedger: Hedger = None) -> list:
+    """Send `requests` chat calls (bounded concurrency); returns per-request latencies"""
+    semaphore = asyncio.Semaphore(concurrency)
+    messages = [{"role": "user", "content": "Classify: checkout page times out for EU users."}]
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            make_call = lambda: client.chat.completions.create(model=deployment, messages=messages, max_tokens=20)
+            if hedger:
+                await hedger.call(make_call)
+            else:
+                await make_call()
+            return time.perf_counter() - start
+
+    return await asyncio.gather(*(one() for _ in range(requests)))
+
+
+async def main():
+    """p99 with and without hedging against the mock server (injected stalls)"""
+    from openai import AsyncAzureOpenAI
+    from mockOpenAIServer import MockSettings, start_mock_server
+
+    print("\n" + "=" * 70)
+    print("  Hedged Requests Demo (local mock server)")
+    print("=" * 70)
+
+    requests = int(os.getenv("HEDGE_DEMO_REQUESTS", "300"))
+    settings = MockSettings(latency_ms=200, stall_rate=0.05, stall_ms=3000, seed=7)
+    server, url = start_mock_server(settings=settings)
+    client = AsyncAzureOpenAI(azure_endpoint=url, api_key="mock", api_version="2024-08-01-preview", max_retries=0)
+    try:
+        baseline = await run_load(client, "mock", requests, concurrency=16)
+        hedger = Hedger(initial_delay_s=1.0)
+        sent_before = settings.requests
+        hedged = await run_load(client, "mock", requests, concurrency=16, hedger=hedger)
+        extra = settings.requests - sent_before - requests
+
+        print(f"\n{'':12} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for label, values in (("No hedging", baseline), ("Hedged", hedged)):
+            print(f"{label:12} {percentile(values, 50):>7.2f}s {percentile(values, 95):>7.2f}s "
+                  f"{percentile(values, 99):>7.2f}s")
+        print(f"\n🏁 {hedger.report()}")
+        print(f"📈 Extra requests sent: {extra} ({extra / requests:.1%}, budget {hedger.max_hedge_ratio:.0%})")
+    finally:
+        await client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -11,6 +11,7 @@ own patterns for tool integration and agent workflows.
 # pip install langchain langchain-openai mcp
 
 import os
+import json
 import asyncio
 from dotenv import load_dotenv
 from langchain_openai import AzureChatOpenAI
@@ -18,17 +19,75 @@ from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage, SystemMessage
 from semantic_kernel.connectors.mcp import MCPStdioPlugin
 from semantic_kernel import Kernel
+from promptCache import PromptLayout, CacheStats
+from streamingOutput import streaming_enabled, astream_langchain, ToolCallSniffer
+from conversationMemory import ConversationMemory
+from toonToolResults import ToolResultTransformer, register_toon_result_filter
+from mcpTools import McpToolClient, ado_mcp_server, ado_mcp_env, find_tool, resolve_tool, normalize_tool_name
+from workItemBatcher import WorkItemBatcher, register_batching_filter
+from workItemPaging import collect_work_items, filters_from_prompt
+from workItemStore import open_work_item_store, sync_report
+from requestScheduler import get_scheduler, estimate_request_tokens, llm_client_options
+from replayCassette import cassette_async_http_client
+from scriptProfiler import profile_if_requested
 
 # Load environment variables
 load_dotenv()
 
 
+# Stable instructions: kept identical across every request so the
+# server-side prompt cache can reuse them (variable content goes last)
+ADO_ASSISTANT_INSTRUCTIONS = """You are an Azure DevOps assistant with access to real tools.
+
+CRITICAL: When you need information, say "TOOL_CALL: function_name(parameters)" on a new line.
+Then I will execute the tool and give you results.
+
+Available tools pattern:
+- TOOL_CALL: get-workitem(id=13) - Get work item details
+- TOOL_CALL: list-workitems(project=demo) - List all work items
+- TOOL_CALL: create-testcase(title=X, description=Y, project=demo) - Create test case
+
+DO NOT make assumptions. Request tools when you need data.
+
+When I send you real data from Azure DevOps tools, respond to the original request using that REAL data.
+If asked to create test cases, list them with titles and steps.
+If asked to create bugs, describe what would be created."""
+
+# Cached-token tracking across all prompts in this session
+cache_stats = CacheStats()
+
+# Re-encodes JSON tool results as TOON before they reach the model
+tool_result_transformer = ToolResultTransformer()
+
+# Coalesces work item lookups into batch tool calls (set on first connect)
+work_item_batcher = None
+
+# Local work item snapshot (None unless WORK_ITEM_STORE_PATH is set)
+work_item_store = open_work_item_store()
+
+# Shared RPM/TPM budget; prompts here are interactive and go ahead of batch jobs
+scheduler = get_scheduler()
+
+
+def build_prompt_layout(kernel):
+    """Stable prompt prefix: instructions followed by the MCP tool catalogue"""
+    layout = PromptLayout(ADO_ASSISTANT_INSTRUCTIONS)
+    if kernel and "azure_devops" in kernel.plugins:
+        functions = kernel.plugins["azure_devops"].functions
+        layout.add_tool_schemas([
+            {"name": fn_name, "description": getattr(fn, "description", "") or ""}
+            for fn_name, fn in functions.items()
+        ])
+    return layout
+
+
 async def create_langchain_agent_with_mcp(ado_plugin=None):
     """
     Create a LangChain LLM with Azure OpenAI and MCP tools
     
     Returns: (llm_with_tools, ado_plugin, kernel)
     """
+    global work_item_batcher
     
     # 1. Initialize Azure OpenAI with LangChain
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
@@ -44,7 +103,12 @@ async def create_langchain_agent_with_mcp(ado_plugin=None):
         azure_endpoint=endpoint,
         api_key=api_key,
         api_version=api_version,
-        temperature=0
+        temperature=0,
+        # Report token usage on the final streamed chunk (prompt cache tracking)
+        stream_usage=streaming_enabled(),
+        **llm_client_options(),
+        # The async path (astream) records/replays through the same cassette
+        http_async_client=cassette_async_http_client()
     )
     
     # 2. Connect to MCP server (reuse existing connection if provided)
@@ -54,17 +118,27 @@ async def create_langchain_agent_with_mcp(ado_plugin=None):
         
         # Use Semantic Kernel's MCPStdioPlugin for MCP connection
         kernel = Kernel()
+        register_toon_result_filter(kernel, tool_result_transformer)
+        command, args = ado_mcp_server()
         ado_plugin = MCPStdioPlugin(
             name="azure_devops",
-            command="npx",
-            args=["-y", "@azure-devops/mcp@next", os.getenv("AZURE_DEVOPS_ORG", "GauravKhurana0262")],
+            command=command,
+            args=args,
+            env=ado_mcp_env(),
             description="Azure DevOps work item management",
             kernel=kernel
         )
         await ado_plugin.connect()
+        kernel.add_plugin(ado_plugin)
         
         # Check loaded functions
         if "azure_devops" in kernel.plugins:
+            client = McpToolClient.from_kernel(kernel)
+            if work_item_store is not None:
+                stats = await work_item_store.sync(client, "demo")
+                print(f"   🗄️  Work item snapshot synced: {sync_report(stats)}")
+            work_item_batcher = WorkItemBatcher(client, store=work_item_store)
+            register_batching_filter(kernel, work_item_batcher)
             ado_plugin_obj = kernel.plugins["azure_devops"]
             functions = list(ado_plugin_obj.functions.keys())
             print(f"   ✅ Connected! Available Azure DevOps tools: {len(functions)}")
@@ -81,38 +155,83 @@ async def create_langchain_agent_with_mcp(ado_plugin=None):
     return llm, ado_plugin, kernel
 
 
-async def execute_prompt_with_langchain(prompt: str, llm, ado_plugin, kernel):
+# Tools the model may trigger from streamed TOOL_CALL lines; writes stay
+# with the prompt-driven patterns below
+READ_ONLY_TOOL_WORDS = ("get", "list", "search", "query")
+
+
+def dispatch_tool_call(kernel, name: str, args: dict):
+    """Coroutine running a model-requested read-only MCP tool (None if there is no such tool)"""
+    from semantic_kernel.functions import KernelArguments
+    
+    if not kernel or "azure_devops" not in kernel.plugins:
+        return None
+    functions = kernel.plugins["azure_devops"].functions
+    fn_name = resolve_tool(functions, name)
+    if fn_name is None or not any(word in normalize_tool_name(fn_name) for word in READ_ONLY_TOOL_WORDS):
+        return None
+    return functions[fn_name].invoke(kernel, KernelArguments(**{"project": "demo", **args}))
+
+
+async def execute_prompt_with_langchain(prompt: str, llm, ado_plugin, kernel, layout=None, memory=None):
     """
     Execute a prompt using LangChain LLM with MCP tools (multi-turn pattern)
+    
+    When a ConversationMemory is passed, earlier turns are sent between the
+    system prefix and the new request, and this turn is stored (compacted)
+    once answered.
     """
     try:
         from semantic_kernel.functions import KernelArguments
         
-        # Build system prompt
-        system_message = SystemMessage(content="""You are an Azure DevOps assistant with access to real tools.
-
-CRITICAL: When you need information, say "TOOL_CALL: function_name(parameters)" on a new line.
-Then I will execute the tool and give you results.
-
-Available tools pattern:
-- TOOL_CALL: get-workitem(id=13) - Get work item details
-- TOOL_CALL: list-workitems(project=demo) - List all work items
-- TOOL_CALL: create-testcase(title=X, description=Y, project=demo) - Create test case
-
-DO NOT make assumptions. Request tools when you need data.""")
+        # Stable prefix first (instructions + tool catalogue), request last
+        if layout is None:
+            layout = build_prompt_layout(kernel)
+        system_message = SystemMessage(content=layout.prefix)
         
-        # Create user message
+        # Create user message (after any remembered turns)
+        history = memory.as_langchain_messages() if memory else []
         user_message = HumanMessage(content=prompt)
         
         # Get initial response
         print(f"   🤖 AI analyzing request...")
-        response = await llm.ainvoke([system_message, user_message])
-        
-        print(f"   💭 AI Response: {response.content[:200]}...")
+        messages = [system_message, *history, user_message]
+        sniffer = None
+        if streaming_enabled():
+            # Read-only tool requests start running as soon as their line completes
+            sniffer = ToolCallSniffer(
+                on_tool_call=lambda name, args: print(f"\n   🔧 Model requested {name}({args})\n   ", end=""),
+                dispatch=lambda name, args: dispatch_tool_call(kernel, name, args)
+            )
+            print(f"   💭 AI Response: ", end="")
+            response, metrics = await scheduler.asubmit(
+                lambda: astream_langchain(llm, messages, sniffer=sniffer), estimate_request_tokens(messages)
+            )
+            print(f"\n   {metrics.report()}")
+        else:
+            response = await scheduler.asubmit(lambda: llm.ainvoke(messages), estimate_request_tokens(messages))
+            print(f"   💭 AI Response: {response.content[:200]}...")
+        cache_stats.record_response(response)
         
         # Parse for tool calls (simple pattern matching)
         tool_calls_made = False
         tool_results = []
+        fetched_ids = set()
+        
+        # Tools the model requested while streaming (already running or done)
+        for (name, args), result in (await sniffer.results() if sniffer else []):
+            if isinstance(result, Exception):
+                print(f"   ⚠️  Error calling {name}: {result}")
+                continue
+            if memory:
+                result = memory.compact_tool_result(result)
+            if "id" in args:
+                fetched_ids.add(args["id"])
+                tool_results.append(f"Work Item #{args['id']} Details:\n{result}")
+            else:
+                tool_results.append(f"{name} Result:\n{result}")
+            print(f"   ✅ Ran {name} requested by the model")
+            tool_calls_made = True
         
         if kernel and "azure_devops" in kernel.plugins:
             ado_plugin_obj = kernel.plugins["azure_devops"]
@@ -120,44 +239,70 @@ DO NOT make assumptions. Request tools when you need data.""")
             # Strategy: Automatically detect what tools to call based on prompt
             import re
             
-            # Pattern 1: Extract work item ID
+            # Pattern 1: Extract work item IDs (concurrent lookups share one batch call)
             work_item_ids = re.findall(r'#(\d+)|US[:\s]*#?(\d+)|ID[:\s]*(\d+)|item[:\s]*(\d+)', prompt, re.IGNORECASE)
-            if work_item_ids:
-                wi_id = next((id for group in work_item_ids for id in group if id), None)
-                if wi_id:
-                    print(f"   🔧 Detected work item #{wi_id}, fetching details...")
-                    
-                    # Find the right function
+            wi_ids = [i for i in dict.fromkeys(id for group in work_item_ids for id in group if id) if i not in fetched_ids]
+            get_fn_name = find_tool(ado_plugin_obj.functions, 'get', 'workitem', exclude=('workitems', 'batch'))
+            if wi_ids and get_fn_name:
+                print(f"   🔧 Detected work item(s) {', '.join('#' + i for i in wi_ids)}, fetching details...")
+                
+                fn = ado_plugin_obj.functions[get_fn_name]
+                results = await asyncio.gather(
+                    *(fn.invoke(kernel, KernelArguments(id=wi_id, project="demo")) for wi_id in wi_ids),
+                    return_exceptions=True
+                )
+                for wi_id, result in zip(wi_ids, results):
+                    if isinstance(result, Exception):
+                        print(f"   ⚠️  Error calling {get_fn_name} for #{wi_id}: {result}")
+                        continue
+                    if memory:
+                        result = memory.compact_tool_result(result)
+                    tool_results.append(f"Work Item #{wi_id} Details:\n{result}")
+                    print(f"   ✅ Retrieved work item #{wi_id}")
+                    tool_calls_made = True
+            
+            # Pattern 2: List work items (paged, filtered server-side, capped)
+            list_filters = filters_from_prompt(prompt)
+            if 'list' in prompt.lower() and ('work' in prompt.lower() or list_filters):
+                print(f"   🔧 Listing work items in project demo {list_filters or ''}...")
+                
+                client = McpToolClient.from_kernel(kernel)
+                limit = int(os.getenv("LIST_WORKITEMS_LIMIT", "200"))
+                stored = work_item_store.query("demo", limit=limit, **list_filters) if work_item_store else []
+                if stored:
+                    result = tool_result_transformer.transform("search_workitem", json.dumps(stored))
+                    if memory:
+                        result = memory.compact_tool_result(result)
+                    tool_results.append(f"Work Items List (first {len(stored)}):\n{result}")
+                    print(f"   ✅ Listed {len(stored)} work items from the local snapshot")
+                    tool_calls_made = True
+                elif client.find("search", "workitem"):
+                    try:
+                        items = await collect_work_items(client, limit, project="demo", **list_filters)
+                        result = tool_result_transformer.transform("search_workitem", json.dumps(items))
+                        if memory:
+                            result = memory.compact_tool_result(result)
+                        tool_results.append(f"Work Items List (first {len(items)}):\n{result}")
+                        print(f"   ✅ Retrieved {len(items)} work items in {client.total_calls} page(s)")
+                        tool_calls_made = True
+                    except Exception as e:
+                        print(f"   ⚠️  Error listing work items: {e}")
+                else:
                     for fn_name, fn in ado_plugin_obj.functions.items():
                         fn_lower = fn_name.lower().replace('-', '').replace('_', '')
-                        if 'get' in fn_lower and 'workitem' in fn_lower:
+                        if 'list' in fn_lower and 'workitem' in fn_lower:
                             try:
-                                args = KernelArguments(id=wi_id, project="demo")
+                                args = KernelArguments(project="demo")
                                 result = await fn.invoke(kernel, args)
-                                tool_results.append(f"Work Item #{wi_id} Details:\n{result}")
-                                print(f"   ✅ Retrieved work item data")
+                                if memory:
+                                    result = memory.compact_tool_result(result)
+                                tool_results.append(f"Work Items List:\n{result}")
+                                print(f"   ✅ Retrieved work items list")
                                 tool_calls_made = True
                                 break
                             except Exception as e:
                                 print(f"   ⚠️  Error calling {fn_name}: {e}")
             
-            # Pattern 2: List work items
-            if 'list' in prompt.lower() and 'work' in prompt.lower():
-                print(f"   🔧 Listing work items in project demo...")
-                
-                for fn_name, fn in ado_plugin_obj.functions.items():
-                    fn_lower = fn_name.lower().replace('-', '').replace('_', '')
-                    if 'list' in fn_lower and 'workitem' in fn_lower:
-                        try:
-                            args = KernelArguments(project="demo")
-                            result = await fn.invoke(kernel, args)
-                            tool_results.append(f"Work Items List:\n{result}")
-                            print(f"   ✅ Retrieved work items list")
-                            tool_calls_made = True
-                            break
-                        except Exception as e:
-                            print(f"   ⚠️  Error calling {fn_name}: {e}")
-            
             # Pattern 3: Create test case
             if 'create' in prompt.lower() and 'test' in prompt.lower():
                 # First, we need work item details if ID is mentioned
@@ -168,23 +313,39 @@ DO NOT make assumptions. Request tools when you need data.""")
         # Send tool results back for final answer
         if tool_calls_made and tool_results:
             print(f"   🔄 Sending tool results back to AI...")
-            final_prompt = f"""Original request: {prompt}
-
-Real data from Azure DevOps tools:
+            final_prompt = f"""Real data from Azure DevOps tools:
 {chr(10).join(tool_results)}
 
-Now respond to the original request using this REAL data. 
-If asked to create test cases, list them with titles and steps.
-If asked to create bugs, describe what would be created."""
+Original request: {prompt}"""
             
             final_msg = HumanMessage(content=final_prompt)
-            final_response = await llm.ainvoke([system_message, final_msg])
-            return final_response.content
+            final_messages = [system_message, *history, final_msg]
+            if streaming_enabled():
+                print(f"\n✅ Result:\n", end="")
+                final_response, metrics = await scheduler.asubmit(
+                    lambda: astream_langchain(llm, final_messages), estimate_request_tokens(final_messages)
+                )
+                print(f"\n   {metrics.report()}")
+            else:
+                final_response = await scheduler.asubmit(
+                    lambda: llm.ainvoke(final_messages), estimate_request_tokens(final_messages)
+                )
+            cache_stats.record_response(final_response)
+            answer = final_response.content
         else:
             # No tools called, return original response
-            if "retrieve" in response.content.lower() or "fetch" in response.content.lower():
-                return response.content + "\n\n⚠️  (Note: Tools available but not auto-executed)"
-            return response.content
+            answer = response.content
+            if "retrieve" in answer.lower() or "fetch" in answer.lower():
+                answer += "\n\n⚠️  (Note: Tools available but not auto-executed)"
+        
+        # Remember this turn, folding older ones into a summary if over budget
+        if memory:
+            memory.add_turn(prompt, answer, tool_results)
+            memory_tokens = await memory.compact()
+            print(f"   🧠 Conversation memory: {memory_tokens} tokens "
+                  f"({len(memory.turns)} recent turn(s){', older turns summarized' if memory.summary else ''})")
+        
+        return answer
         
     except Exception as e:
         import traceback
@@ -256,6 +417,11 @@ async def main():
         ado_plugin = None
         llm = None
         kernel = None
+        layout = None
+        memory = ConversationMemory(
+            max_tokens=int(os.getenv("MEMORY_MAX_TOKENS", "4000")),
+            tool_result_tokens=int(os.getenv("MEMORY_TOOL_RESULT_TOKENS", "800"))
+        )
         
         try:
             # Execute each prompt
@@ -269,9 +435,13 @@ async def main():
                     # Create agent on first run, reuse for subsequent runs
                     if llm is None:
                         llm, ado_plugin, kernel = await create_langchain_agent_with_mcp(ado_plugin)
+                        layout = build_prompt_layout(kernel)
+                        print(f"   🧊 Stable prompt prefix: {layout.prefix_tokens()} tokens "
+                              f"({'cacheable' if layout.is_cacheable() else 'below cache minimum'})")
                     
-                    result = await execute_prompt_with_langchain(prompt, llm, ado_plugin, kernel)
-                    print(f"\n✅ Result:\n{result}\n")
+                    result = await execute_prompt_with_langchain(prompt, llm, ado_plugin, kernel, layout, memory)
+                    if not streaming_enabled():
+                        print(f"\n✅ Result:\n{result}\n")
                 except Exception as e:
                     print(f"❌ Error executing prompt: {e}\n")
                     import traceback
@@ -279,6 +449,13 @@ async def main():
             
             print(f"\n{'='*70}")
             print("✅ All prompts executed!")
+            print(f"🧊 Prompt cache: {cache_stats.report()}")
+            print(f"🎨 Tool results: {tool_result_transformer.report()}")
+            if work_item_batcher:
+                print(f"📦 Work items: {work_item_batcher.report()}")
+            if work_item_store is not None:
+                print(f"🗄️  Work item snapshot: {work_item_store.report()}")
+            print(f"🚦 Scheduler: {scheduler.report()}")
             print(f"{'='*70}\n")
             
         finally:
@@ -299,4 +476,5 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    with profile_if_requested("mcpADOAgentLangChain"):
+        asyncio.run(main())
@@ -53,10 +53,26 @@ from semantic_kernel.connectors.mcp import MCPStdioPlugin
 import os
 import asyncio
 from dotenv import load_dotenv
+from streamingOutput import streaming_enabled, astream_semantic_kernel
+from toonToolResults import ToolResultTransformer, register_toon_result_filter
+from mcpTools import McpToolClient, ado_mcp_server, ado_mcp_env
+from workItemBatcher import WorkItemBatcher, register_batching_filter
+from workItemStore import open_work_item_store, sync_report
+from requestScheduler import get_scheduler, estimate_request_tokens, llm_client_options
+from scriptProfiler import profile_if_requested
 
 # Load environment variables
 load_dotenv()
 
+# Re-encodes JSON tool results as TOON inside the auto function calling loop
+tool_result_transformer = ToolResultTransformer()
+
+# Local work item snapshot (None unless WORK_ITEM_STORE_PATH is set)
+work_item_store = open_work_item_store()
+
+# Shared RPM/TPM budget for the chat calls (interactive priority)
+scheduler = get_scheduler()
+
 async def create_test_cases_with_ai(prompt: str, ado_plugin=None):
     """
     The architecture you want:
@@ -68,6 +84,7 @@ async def create_test_cases_with_ai(prompt: str, ado_plugin=None):
     
     # 1. Create kernel (the AI orchestrator)
     kernel = Kernel()
+    register_toon_result_filter(kernel, tool_result_transformer)
     
     # 2. Add AI service
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
@@ -77,19 +94,33 @@ async def create_test_cases_with_ai(prompt: str, ado_plugin=None):
     if not endpoint or not api_key:
         raise ValueError("Please set AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY in .env file")
     
+    # Own client, set up like every client whose calls go through the scheduler
+    from openai import AsyncAzureOpenAI
+    from semantic_kernel.connectors.ai.open_ai.const import DEFAULT_AZURE_API_VERSION
+    async_client = AsyncAzureOpenAI(
+        azure_endpoint=endpoint,
+        api_key=api_key,
+        api_version=DEFAULT_AZURE_API_VERSION,
+        **llm_client_options(async_client=True)
+    )
+    
     kernel.add_service(AzureChatCompletion(
         deployment_name=deployment_name,
         endpoint=endpoint,
-        api_key=api_key
+        api_key=api_key,
+        async_client=async_client
     ))
     
     # 3. Add MCP tools as plugins (reuse existing connection if provided)
+    new_connection = ado_plugin is None
     if ado_plugin is None:
         print("   🔌 Connecting to Azure DevOps MCP server...")
+        command, args = ado_mcp_server()
         ado_plugin = MCPStdioPlugin(
             name="azure_devops",
-            command="npx",
-            args=["-y", "@azure-devops/mcp@next", os.getenv("AZURE_DEVOPS_ORG", "GauravKhurana0262")],
+            command=command,
+            args=args,
+            env=ado_mcp_env(),
             description="Azure DevOps work item management",
             kernel=kernel
         )
@@ -109,6 +140,15 @@ async def create_test_cases_with_ai(prompt: str, ado_plugin=None):
     
     kernel.add_plugin(ado_plugin)
     
+    # Parallel work item lookups from one model turn share a batch call;
+    # with a local snapshot, known items never leave the machine
+    client = McpToolClient.from_kernel(kernel)
+    if new_connection and work_item_store is not None:
+        stats = await work_item_store.sync(client, os.getenv("AZURE_DEVOPS_PROJECT", "demo"))
+        print(f"   🗄️  Work item snapshot synced: {sync_report(stats)}")
+    batcher = WorkItemBatcher(client, store=work_item_store)
+    register_batching_filter(kernel, batcher)
+    
     # 4. Create execution settings to enable function calling
     from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
     from semantic_kernel.contents import ChatHistory
@@ -127,11 +167,29 @@ async def create_test_cases_with_ai(prompt: str, ado_plugin=None):
     )
     chat_history.add_user_message(prompt)
     
-    result = await kernel.get_service().get_chat_message_contents(
-        chat_history=chat_history,
-        settings=execution_settings,
-        kernel=kernel
+    # 6. Stream tokens as they arrive when STREAM_OUTPUT=true
+    if streaming_enabled():
+        print("   💭 ", end="")
+        text, metrics = await scheduler.asubmit(
+            lambda: astream_semantic_kernel(kernel.get_service(), chat_history, execution_settings, kernel),
+            estimate_request_tokens(chat_history.messages)
+        )
+        print(f"\n   {metrics.report()}")
+        if batcher.requests:
+            print(f"   📦 {batcher.report()}")
+        return text or "No response", ado_plugin
+    
+    # Admission is per prompt; the tool-calling turns inside share its budget
+    result = await scheduler.asubmit(
+        lambda: kernel.get_service().get_chat_message_contents(
+            chat_history=chat_history,
+            settings=execution_settings,
+            kernel=kernel
+        ),
+        estimate_request_tokens(chat_history.messages)
     )
+    if batcher.requests:
+        print(f"   📦 {batcher.report()}")
     
     return result[0].content if result else "No response", ado_plugin
 
@@ -260,7 +318,8 @@ async def main():
                 
                 try:
                     result, ado_plugin = await create_test_cases_with_ai(prompt, ado_plugin)
-                    print(f"✅ Result:\n{result}\n")
+                    if not streaming_enabled():
+                        print(f"✅ Result:\n{result}\n")
                 except Exception as e:
                     print(f"❌ Error executing prompt: {e}\n")
                     import traceback
@@ -268,6 +327,10 @@ async def main():
             
             print(f"\n{'='*70}")
             print("✅ All prompts executed!")
+            print(f"🎨 Tool results: {tool_result_transformer.report()}")
+            if work_item_store is not None:
+                print(f"🗄️  Work item snapshot: {work_item_store.report()}")
+            print(f"🚦 Scheduler: {scheduler.report()}")
             print(f"{'='*70}\n")
             
         finally:
@@ -288,4 +351,5 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    with profile_if_requested("mcpADOagent"):
+        asyncio.run(main())
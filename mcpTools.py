@@ -0,0 +1,134 @@
+"""
+Shared MCP Tool Helpers
+Locating Azure DevOps MCP tools by keyword, calling them directly for raw
+JSON results, and choosing between the real server and the local fake
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+from semantic_kernel import Kernel
+from semantic_kernel.functions import KernelArguments
+from replayCassette import mcp_server_command
+
+
+def ado_mcp_server() -> tuple:
+    """
+    (command, args) for the Azure DevOps MCP server
+
+    Set ADO_MCP_SERVER=fake to use the local fakeMcpServer.py instead.
+    With CASSETTE_MODE=record/replay the server runs behind a recording
+    proxy, or is replaced by a replay server (see replayCassette.py).
+    """
+    if os.getenv("ADO_MCP_SERVER", "").lower() == "fake":
+        return mcp_server_command(sys.executable, [str(Path(__file__).parent / "fakeMcpServer.py")])
+    return mcp_server_command(
+        "npx", ["-y", "@azure-devops/mcp@next", os.getenv("AZURE_DEVOPS_ORG", "GauravKhurana0262")]
+    )
+
+
+def ado_mcp_env() -> dict:
+    """
+    Environment for the MCP server process
+
+    The stdio client only inherits a small safe list of variables, so the
+    PAT (AZURE_DEVOPS_EXT_PAT) and fake server settings are passed explicitly.
+    """
+    return {k: v for k, v in os.environ.items() if k.startswith(("AZURE_DEVOPS", "FAKE_MCP"))}
+
+
+def normalize_tool_name(name: str) -> str:
+    """'wit_get-work_item' -> 'witgetworkitem'"""
+    return name.lower().replace('-', '').replace('_', '')
+
+
+def find_tool(functions: dict, *keywords, exclude=()):
+    """First function whose normalized name contains all keywords and none of `exclude`"""
+    for fn_name, fn in functions.items():
+        normalized = normalize_tool_name(fn_name)
+        if all(k in normalized for k in keywords) and not any(x in normalized for x in exclude):
+            return fn_name
+    return None
+
+
+def resolve_tool(functions: dict, requested: str):
+    """
+    Function a model-written tool name refers to ('get-workitem' -> 'wit_get_work_item')
+
+    Exact normalized match first, else the shortest name ending with it.
+    """
+    wanted = normalize_tool_name(requested)
+    matches = [name for name in functions if normalize_tool_name(name).endswith(wanted)]
+    exact = [name for name in matches if normalize_tool_name(name) == wanted]
+    return (exact or sorted(matches, key=len) or [None])[0]
+
+
+def result_text(value) -> str:
+    """Flatten a tool result (FunctionResult, content list, string) to text"""
+    value = getattr(value, "value", value)
+    if isinstance(value, list):
+        return "\n".join(str(getattr(item, "text", item)) for item in value)
+    return str(getattr(value, "text", value))
+
+
+class McpToolClient:
+    """
+    Calls MCP plugin functions directly and returns their raw text/JSON
+
+    Uses its own filter-free Kernel, so kernel filters such as the TOON
+    result encoder don't rewrite results this client needs to parse.
+    """
+
+    def __init__(self, functions: dict):
+        self.functions = functions
+        self.kernel = Kernel()
+        self.call_counts = {}
+
+    @classmethod
+    def from_kernel(cls, kernel, plugin_name: str = "azure_devops"):
+        """Client over the functions of a plugin already loaded in `kernel`"""
+        return cls(dict(kernel.plugins[plugin_name].functions))
+
+    def find(self, *keywords, exclude=()):
+        """Tool name matching keywords (see find_tool)"""
+        return find_tool(self.functions, *keywords, exclude=exclude)
+
+    async def call(self, name: str, **args) -> str:
+        """Invoke a tool and return its result text"""
+        self.call_counts[name] = self.call_counts.get(name, 0) + 1
+        result = await self.functions[name].invoke(self.kernel, KernelArguments(**args))
+        return result_text(result)
+
+    async def call_json(self, name: str, **args):
+        """Invoke a tool and parse its result as JSON"""
+        text = await self.call(name, **args)
+        try:
+            return json.loads(text)
+        except ValueError:
+            raise RuntimeError(f"{name} returned non-JSON result: {text[:200]}")
+
+    @property
+    def total_calls(self) -> int:
+        """Tool calls made through this client"""
+        return sum(self.call_counts.values())
+
+
+async def connect_ado_plugin(kernel=None):
+    """Connect the Azure DevOps MCP server (or the fake) as plugin 'azure_devops'"""
+    from semantic_kernel.connectors.mcp import MCPStdioPlugin
+
+    kernel = kernel or Kernel()
+    command, args = ado_mcp_server()
+    plugin = MCPStdioPlugin(
+        name="azure_devops",
+        command=command,
+        args=args,
+        env=ado_mcp_env(),
+        description="Azure DevOps work item management",
+        kernel=kernel
+    )
+    await plugin.connect()
+    if "azure_devops" not in kernel.plugins:
+        kernel.add_plugin(plugin)
+    return plugin, kernel
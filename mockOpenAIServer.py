@@ -0,0 +1,289 @@
+"""
+Mock OpenAI-Compatible Server
+Local chat completions endpoint with injected latency, stalls and 429s, for
+testing hedging, rate limiting and structured output code without an Azure
+quota (json_schema response formats get a random schema-valid answer)
+
+Answers both Azure (/openai/deployments/<name>/chat/completions) and
+OpenAI (/v1/chat/completions) paths. Point a client at it with:
+    AzureOpenAI(azure_endpoint="http://127.0.0.1:8765", api_key="mock", api_version="2024-08-01-preview")
+
+Also mocks the part of the Azure AI Agents API the triage scripts use
+(create/delete agent, create/delete thread, add message, streamed run), so
+an AgentsClient can use it as its project endpoint (see triageService.py).
+
+Settings (environment):
+    MOCK_LLM_PORT          port when run as a script (default 8765)
+    MOCK_LLM_LATENCY_MS    median latency (default 300)
+    MOCK_LLM_STALL_RATE    fraction of requests that stall (default 0.05)
+    MOCK_LLM_STALL_MS      extra latency of a stalled request (default 4000)
+    MOCK_LLM_429_RATE      fraction of requests rejected with 429 (default 0)
+
+Run standalone:
+    python mockOpenAIServer.py
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockSettings:
+    """Latency profile of the mock server"""
+
+    def __init__(self, latency_ms: float = None, stall_rate: float = None, stall_ms: float = None,
+                 rate_limit_rate: float = None, seed: int = None):
+        self.latency_ms = float(os.getenv("MOCK_LLM_LATENCY_MS", "300")) if latency_ms is None else latency_ms
+        self.stall_rate = float(os.getenv("MOCK_LLM_STALL_RATE", "0.05")) if stall_rate is None else stall_rate
+        self.stall_ms = float(os.getenv("MOCK_LLM_STALL_MS", "4000")) if stall_ms is None else stall_ms
+        self.rate_limit_rate = float(os.getenv("MOCK_LLM_429_RATE", "0")) if rate_limit_rate is None else rate_limit_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+
+    def next_delay(self) -> float:
+        """Seconds to wait before answering: log-normal body plus occasional stalls"""
+        with self.lock:
+            self.requests += 1
+            delay = self.latency_ms * self.rng.lognormvariate(0, 0.25)
+            if self.rng.random() < self.stall_rate:
+                delay += self.stall_ms * self.rng.uniform(0.5, 1.5)
+        return delay / 1000
+
+    def reject(self) -> bool:
+        with self.lock:
+            if self.rng.random() < self.rate_limit_rate:
+                self.rejected += 1
+                return True
+        return False
+
+
+def sample_from_schema(schema: dict, rng: random.Random):
+    """Random value matching a JSON schema (enums pick a random member, arrays hold 1-3 items)"""
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: sample_from_schema(prop, rng) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_from_schema(schema.get("items", {}), rng) for _ in range(rng.randint(1, 3))]
+    if kind in ("integer", "number"):
+        return 1
+    if kind == "boolean":
+        return True
+    return f"mock {rng.randint(1, 20)}"
+
+
+def answer_text(request: dict, rng: random.Random) -> str:
+    """JSON matching a json_schema response_format, else a fixed acknowledgement"""
+    response_format = request.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return json.dumps(sample_from_schema(response_format["json_schema"]["schema"], rng))
+    return "Acknowledged."
+
+
+def completion_body(request: dict, text: str = "Acknowledged.") -> dict:
+    """Chat completion response with rough (chars/4) usage numbers"""
+    prompt_chars = sum(len(str(m.get("content") or "")) for m in request.get("messages", []))
+    prompt_tokens = max(1, prompt_chars // 4)
+    completion_tokens = max(1, len(text) // 4)
+    return {
+        "id": f"chatcmpl-mock-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+class MockAgentsState:
+    """Agents and threads created through the mock Azure AI Agents API"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.agents = {}
+        self.threads = {}
+
+    @staticmethod
+    def new_id(prefix: str) -> str:
+        return f"{prefix}_mock{uuid.uuid4().hex[:20]}"
+
+
+def agent_message(thread_id: str, role: str, text: str, run: dict = None) -> dict:
+    """Thread message object with one text part"""
+    return {
+        "id": MockAgentsState.new_id("msg"), "object": "thread.message", "created_at": int(time.time()),
+        "thread_id": thread_id, "role": role, "status": "completed",
+        "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+        "assistant_id": run and run["assistant_id"], "run_id": run and run["id"],
+        "attachments": [], "metadata": {}
+    }
+
+
+def make_handler(settings: MockSettings):
+    agents = MockAgentsState()
+
+    class MockHandler(BaseHTTPRequestHandler):
+        # Keep-alive, so clients can reuse connections as they would against Azure
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body, headers: dict = None, content_type: str = "application/json"):
+            payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            try:
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (e.g. a cancelled hedge)
+
+        def _send_rate_limited(self):
+            self._send(429, {"error": {"code": "429", "message": "Rate limit is exceeded. Try again in 1 seconds."}},
+                       {"retry-after": "1", "retry-after-ms": "1000"})
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get("Content-Length", "0"))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_POST(self):
+            request = self._read_json()
+            path = self.path.split("?")[0]
+            if path.endswith("/chat/completions"):
+                self._chat_completion(request)
+            elif path.strip("/").split("/")[0] in ("assistants", "threads"):
+                self._agents_post(path.strip("/").split("/"), request)
+            else:
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def do_DELETE(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+            store = {"assistants": agents.agents, "threads": agents.threads}.get(parts[0])
+            if store is None or len(parts) != 2:
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            with agents.lock:
+                deleted = store.pop(parts[1], None) is not None
+            kind = "assistant" if parts[0] == "assistants" else "thread"
+            self._send(200, {"id": parts[1], "object": f"{kind}.deleted", "deleted": deleted})
+
+        def _chat_completion(self, request: dict):
+            if settings.reject():
+                self._send_rate_limited()
+                return
+            time.sleep(settings.next_delay())
+            with settings.lock:
+                text = answer_text(request, settings.rng)
+            self._send(200, completion_body(request, text))
+
+        def _agents_post(self, parts: list, request: dict):
+            """Azure AI Agents subset: create agent, create thread, add message, streamed run"""
+            now = int(time.time())
+            if parts == ["assistants"]:
+                agent = {"id": agents.new_id("asst"), "object": "assistant", "created_at": now, "tools": [],
+                         "metadata": {}, **request}
+                with agents.lock:
+                    agents.agents[agent["id"]] = agent
+                self._send(200, agent)
+                return
+            if parts == ["threads"]:
+                thread = {"id": agents.new_id("thread"), "object": "thread", "created_at": now, "metadata": {}}
+                with agents.lock:
+                    agents.threads[thread["id"]] = [
+                        agent_message(thread["id"], m.get("role", "user"), str(m.get("content", "")))
+                        for m in request.get("messages", [])
+                    ]
+                self._send(200, thread)
+                return
+            with agents.lock:
+                messages = agents.threads.get(parts[1]) if len(parts) == 3 else None
+                agent = agents.agents.get(request.get("assistant_id"))
+            if messages is None:
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+            elif parts[2] == "messages":
+                message = agent_message(parts[1], request.get("role", "user"), str(request.get("content", "")))
+                with agents.lock:
+                    messages.append(message)
+                self._send(200, message)
+            elif parts[2] == "runs" and agent is not None and request.get("stream"):
+                if settings.reject():
+                    self._send_rate_limited()
+                    return
+                self._stream_run(parts[1], agent, messages)
+            else:
+                self._send(400, {"error": {"message": "Only streamed runs of an existing agent are mocked"}})
+
+        def _stream_run(self, thread_id: str, agent: dict, messages: list):
+            """Answer a run as server-sent events (all sent once the run has finished)"""
+            run = {"id": agents.new_id("run"), "object": "thread.run", "created_at": int(time.time()),
+                   "thread_id": thread_id, "assistant_id": agent["id"], "model": agent.get("model"),
+                   "instructions": agent.get("instructions"), "status": "queued", "tools": [], "metadata": {}}
+            events = [("thread.run.created", dict(run)), ("thread.run.in_progress", {**run, "status": "in_progress"})]
+            time.sleep(settings.next_delay())
+            with settings.lock:
+                text = answer_text(agent, settings.rng)
+            prompt = [{"content": agent.get("instructions")}] + [
+                {"content": m["content"][0]["text"]["value"]} for m in messages]
+            message = agent_message(thread_id, "assistant", text, run)
+            with agents.lock:
+                messages.append(message)
+            events += [("thread.message.completed", message),
+                       ("thread.run.completed", {**run, "status": "completed", "completed_at": int(time.time()),
+                                                 "usage": completion_body({"messages": prompt}, text)["usage"]})]
+            body = "".join(f"event: {name}\ndata: {json.dumps(data)}\n\n" for name, data in events)
+            self._send(200, (body + "event: done\ndata: [DONE]\n\n").encode(), content_type="text/event-stream")
+
+    return MockHandler
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connection bursts from concurrent clients (1s SYN retries)
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def start_mock_server(port: int = 0, settings: MockSettings = None):
+    """Serve in a background thread; returns (server, base_url). Stop with server.shutdown()"""
+    settings = settings or MockSettings()
+    server = MockHTTPServer(("127.0.0.1", port), make_handler(settings))
+    server.settings = settings
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    port = int(os.getenv("MOCK_LLM_PORT", "8765"))
+    settings = MockSettings()
+    server = MockHTTPServer(("127.0.0.1", port), make_handler(settings))
+    print(f"🧪 Mock OpenAI server on http://127.0.0.1:{port} "
+          f"(median {settings.latency_ms:.0f}ms, {settings.stall_rate:.0%} stalls of ~{settings.stall_ms:.0f}ms, "
+          f"{settings.rate_limit_rate:.0%} 429s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
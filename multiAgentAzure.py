@@ -3,11 +3,13 @@ from dotenv import load_dotenv
 
 # Add references
 from azure.ai.agents import AgentsClient
-from azure.ai.agents.models import ConnectedAgentTool, MessageRole, ListSortOrder, ToolSet, FunctionTool
+from azure.ai.agents.models import MessageRole
 from azure.identity import DefaultAzureCredential
-
-# Clear the console
-os.system('cls' if os.name=='nt' else 'clear')
+from promptCache import CacheStats
+from triageClassifier import TRIAGE_INSTRUCTIONS, triage_response_format, parse_triage, format_triage, log_triage
+from ticketPreClassifier import load_preclassifier
+from runResults import stream_agent_run, show_thread_messages, print_thread
+from scriptProfiler import profile_if_requested
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,147 +17,98 @@ project_endpoint = os.getenv("PROJECT_ENDPOINT")
 model_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 
 
-# Connect to the agents client
-agents_client = AgentsClient(
-     endpoint=project_endpoint,
-     credential=DefaultAzureCredential(
-         exclude_environment_credential=True, 
-         exclude_managed_identity_credential=True
-     ),
-)
-
-with agents_client:
-
-    # Create an agent to prioritize support tickets
-    priority_agent_name = "priority_agent"
-    priority_agent_instructions = """
-Assess how urgent a ticket is based on its description.
-
-Respond with one of the following levels:
-- High: User-facing or blocking issues
-- Medium: Time-sensitive but not breaking anything
-- Low: Cosmetic or non-urgent tasks
-
-Only output the urgency level and a very brief explanation.
-"""
-
-    priority_agent = agents_client.create_agent(
-        model=model_deployment,
-        name=priority_agent_name,
-        instructions=priority_agent_instructions
-    )
-
-    # Create an agent to assign tickets to the appropriate team
-    team_agent_name = "team_agent"
-    team_agent_instructions = """
-Decide which team should own each ticket.
-
-Choose from the following teams:
-- Frontend
-- Backend
-- Infrastructure
-- Marketing
-
-Base your answer on the content of the ticket. Respond with the team name and a very brief explanation.
-"""
-
-    team_agent = agents_client.create_agent(
-        model=model_deployment,
-        name=team_agent_name,
-        instructions=team_agent_instructions
-    )
-
-    # Create an agent to estimate effort for a support ticket
-    effort_agent_name = "effort_agent"
-    effort_agent_instructions = """
-Estimate how much work each ticket will require.
-
-Use the following scale:
-- Small: Can be completed in a day
-- Medium: 2-3 days of work
-- Large: Multi-day or cross-team effort
-
-Base your estimate on the complexity implied by the ticket. Respond with the effort level and a brief justification.
-"""
-
-    effort_agent = agents_client.create_agent(
-        model=model_deployment,
-        name=effort_agent_name,
-        instructions=effort_agent_instructions
-    )
-
-    # Create connected agent tools for the support agents
-    priority_agent_tool = ConnectedAgentTool(
-        id=priority_agent.id, 
-        name=priority_agent_name, 
-        description="Assess the priority of a ticket"
-    )
-    
-    team_agent_tool = ConnectedAgentTool(
-        id=team_agent.id, 
-        name=team_agent_name, 
-        description="Determines which team should take the ticket"
-    )
-    
-    effort_agent_tool = ConnectedAgentTool(
-        id=effort_agent.id, 
-        name=effort_agent_name, 
-        description="Determines the effort required to complete the ticket"
-    )
+def main():
+    # Clear the console
+    os.system('cls' if os.name=='nt' else 'clear')
 
-    # Create an agent to triage support ticket processing by using connected agents
-    triage_agent_name = "triage-agent"
-    triage_agent_instructions = """
-Triage the given ticket. Use the connected tools to determine the ticket's priority, 
-which team it should be assigned to, and how much effort it may take.
-"""
-
-    triage_agent = agents_client.create_agent(
-        model=model_deployment,
-        name=triage_agent_name,
-        instructions=triage_agent_instructions,
-        tools=[
-            priority_agent_tool.definitions[0],
-            team_agent_tool.definitions[0],
-            effort_agent_tool.definitions[0]
-        ]
+    # Connect to the agents client
+    agents_client = AgentsClient(
+         endpoint=project_endpoint,
+         credential=DefaultAzureCredential(
+             exclude_environment_credential=True,
+             exclude_managed_identity_credential=True
+         ),
     )
 
-    # Use the agents to triage a support issue
-    print("Creating agent thread.")
-    thread = agents_client.threads.create()  
-
-    # Create the ticket prompt
-    prompt = input("\nWhat's the support problem you need to resolve?: ")
-    
-    # Send a prompt to the agent
-    message = agents_client.messages.create(
-        thread_id=thread.id,
-        role=MessageRole.USER,
-        content=prompt,
-    )   
-    
-    # Run the thread usng the primary agent
-    print("\nProcessing agent thread. Please wait.")
-    run = agents_client.runs.create_and_process(thread_id=thread.id, agent_id=triage_agent.id)
-        
-    if run.status == "failed":
-        print(f"Run failed: {run.last_error}")
-
-    # Fetch and display messages
-    messages = agents_client.messages.list(thread_id=thread.id, order=ListSortOrder.ASCENDING)
-    for message in messages:
-        if message.text_messages:
-            last_msg = message.text_messages[-1]
-            print(f"{message.role}:\n{last_msg.text.value}\n")
-
-    # Clean up
-    print("Cleaning up agents:")
-    agents_client.delete_agent(triage_agent.id)
-    print("Deleted triage agent.")
-    agents_client.delete_agent(priority_agent.id)
-    print("Deleted priority agent.")
-    agents_client.delete_agent(team_agent.id)
-    print("Deleted team agent.")
-    agents_client.delete_agent(effort_agent.id)
-    print("Deleted effort agent.")
\ No newline at end of file
+    # Local classifier trained on earlier triage results (None until enough are logged)
+    preclassifier = load_preclassifier()
+
+    with agents_client:
+
+        # Create the ticket prompt
+        prompt = input("\nWhat's the support problem you need to resolve?: ")
+
+        # Obvious tickets are answered locally; the rest go to the triage agent
+        triage = preclassifier.classify(prompt) if preclassifier else None
+        if triage is not None:
+            print(f"\nTicket:\n{prompt}\n")
+            print(format_triage(triage))
+            print(f"Fields: {triage.model_dump_json()}\n")
+            print("No LLM call needed.")
+            return
+
+        # One agent returns priority, team and effort together as JSON that
+        # matches TicketTriage (replaces three connected agents and an orchestrator)
+        triage_agent_name = "triage-agent"
+        triage_agent = agents_client.create_agent(
+            model=model_deployment,
+            name=triage_agent_name,
+            instructions=TRIAGE_INSTRUCTIONS,
+            response_format=triage_response_format()
+        )
+        thread = None
+
+        try:
+            # Use the agent to triage a support issue
+            print("Creating agent thread.")
+            thread = agents_client.threads.create()
+
+            # Send a prompt to the agent
+            message = agents_client.messages.create(
+                thread_id=thread.id,
+                role=MessageRole.USER,
+                content=prompt,
+            )
+
+            # Run the thread usng the primary agent
+            print("\nProcessing agent thread. Please wait.")
+            # The answer arrives on the run's event stream: no polling, no message listing
+            run = stream_agent_run(agents_client, thread.id, triage_agent.id)
+
+            if run.status is None:
+                print("Run failed: the stream ended without a run event")
+            elif run.status == "failed":
+                print(f"Run failed: {run.last_error}")
+
+            # Agent instructions are sent ahead of the thread, so they form a stable cached prefix
+            cache_stats = CacheStats()
+            cache_stats.record_response(run)
+            print(f"Prompt cache: {cache_stats.report()}\n")
+
+            # Display the structured answer
+            if run.message is not None:
+                triage = parse_triage(run.text)
+                log_triage(prompt, triage)
+                print(f"Ticket:\n{prompt}\n")
+                print(format_triage(triage))
+                print(f"Fields: {triage.model_dump_json()}\n")
+
+            # The whole thread is only fetched (page by page) when asked for
+            if show_thread_messages():
+                print("Thread messages:\n")
+                print_thread(agents_client, thread.id)
+
+        finally:
+            # Clean up, also when the run or the parsing failed
+            print("Cleaning up agents:")
+            if thread is not None:
+                agents_client.threads.delete(thread.id)
+                print("Deleted agent thread.")
+            agents_client.delete_agent(triage_agent.id)
+            print("Deleted triage agent.")
+
+
+if __name__ == "__main__":
+    # --profile: sample the whole run
+    with profile_if_requested("multiAgentAzure"):
+        main()
@@ -1,149 +1,172 @@
 import os
 import warnings
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import AzureOpenAI, NotFoundError
+from pydantic import ValidationError
+from promptCache import CacheStats
+from requestScheduler import get_scheduler, estimate_request_tokens, llm_client_options, INTERACTIVE
+from hedgedRequests import get_hedger
+from runResults import stream_openai_run, stream_openai_thread_run, show_thread_messages, print_thread
+from scriptProfiler import profile_if_requested
+from triageClassifier import TRIAGE_INSTRUCTIONS, triage_response_format, parse_triage, format_triage, log_triage
 
 # Suppress deprecation warnings for Assistants API
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# Clear the console
-os.system('cls' if os.name=='nt' else 'clear')
-
 # Load environment variables from .env file
 load_dotenv()
 
 # Initialize Azure OpenAI client
 client = AzureOpenAI(
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version="2024-05-01-preview",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
+    # Structured outputs (json_schema response format) need 2024-08-01-preview or later
+    api_version="2024-08-01-preview",
+    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    # Retries and CASSETTE_MODE record/replay as for every scheduled client
+    **llm_client_options()
 )
 
 deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 
-# Create specialized assistants
-print("Creating specialized assistants...")
-
-priority_assistant = client.beta.assistants.create(
-    name="priority_agent",
-    instructions="""
-Assess how urgent a ticket is based on its description.
-
-Respond with one of the following levels:
-- High: User-facing or blocking issues
-- Medium: Time-sensitive but not breaking anything
-- Low: Cosmetic or non-urgent tasks
-
-Only output the urgency level and a very brief explanation.
-""",
-    model=deployment_name
-)
-
-team_assistant = client.beta.assistants.create(
-    name="team_agent",
-    instructions="""
-Decide which team should own each ticket.
-
-Choose from the following teams:
-- Frontend
-- Backend
-- Infrastructure
-- Marketing
-
-Base your answer on the content of the ticket. Respond with the team name and a very brief explanation.
-""",
-    model=deployment_name
-)
-
-effort_assistant = client.beta.assistants.create(
-    name="effort_agent",
-    instructions="""
-Estimate how much work each ticket will require.
-
-Use the following scale:
-- Small: Can be completed in a day
-- Medium: 2-3 days of work
-- Large: Multi-day or cross-team effort
-
-Base your estimate on the complexity implied by the ticket. Respond with the effort level and a brief justification.
-""",
-    model=deployment_name
-)
-
-# Create a thread
-print("Creating thread...")
-thread = client.beta.threads.create()
-
-# Get user input
-prompt = input("\nWhat's the support problem you need to resolve?: ")
-
-# Add user message to thread
-client.beta.threads.messages.create(
-    thread_id=thread.id,
-    role="user",
-    content=prompt
-)
-
-print("\nProcessing ticket through agents. Please wait...\n")
-
-# Run each assistant and collect results
-results = {}
-
-# Priority assessment
-print("Assessing priority...")
-run = client.beta.threads.runs.create_and_poll(
-    thread_id=thread.id,
-    assistant_id=priority_assistant.id
-)
-
-if run.status == "completed":
-    messages = client.beta.threads.messages.list(thread_id=thread.id, order="desc", limit=1)
-    results["priority"] = messages.data[0].content[0].text.value
-else:
-    results["priority"] = f"Failed: {run.status}"
-
-# Team assignment
-print("Determining team assignment...")
-run = client.beta.threads.runs.create_and_poll(
-    thread_id=thread.id,
-    assistant_id=team_assistant.id
-)
-
-if run.status == "completed":
-    messages = client.beta.threads.messages.list(thread_id=thread.id, order="desc", limit=1)
-    results["team"] = messages.data[0].content[0].text.value
-else:
-    results["team"] = f"Failed: {run.status}"
-
-# Effort estimation
-print("Estimating effort...")
-run = client.beta.threads.runs.create_and_poll(
-    thread_id=thread.id,
-    assistant_id=effort_assistant.id
-)
-
-if run.status == "completed":
-    messages = client.beta.threads.messages.list(thread_id=thread.id, order="desc", limit=1)
-    results["effort"] = messages.data[0].content[0].text.value
-else:
-    results["effort"] = f"Failed: {run.status}"
-
-# Display results
-print("\n" + "="*60)
-print("TICKET TRIAGE RESULTS")
-print("="*60)
-print(f"\nOriginal Ticket:\n{prompt}\n")
-print(f"Priority Assessment:\n{results['priority']}\n")
-print(f"Team Assignment:\n{results['team']}\n")
-print(f"Effort Estimation:\n{results['effort']}\n")
-print("="*60)
-
-# Clean up
-print("\nCleaning up assistants...")
-client.beta.assistants.delete(priority_assistant.id)
-print("Deleted priority assistant.")
-client.beta.assistants.delete(team_assistant.id)
-print("Deleted team assistant.")
-client.beta.assistants.delete(effort_assistant.id)
-print("Deleted effort assistant.")
-print("\nDone!")
+# Runs go through the shared scheduler: RPM/TPM budgets, Retry-After on 429s
+scheduler = get_scheduler()
+
+# With HEDGE_REQUESTS=true a slow run gets a backup copy on its own thread
+hedger = get_hedger()
+
+# Threads of hedged attempts that finished, deleted during clean up (losing
+# attempts that were cancelled or failed delete their own thread)
+hedged_threads = []
+
+
+def estimated_run_tokens(assistant, prompt):
+    """Rough TPM cost of one run: instructions plus the ticket"""
+    return estimate_request_tokens(
+        [{"role": "system", "content": assistant.instructions}, {"role": "user", "content": prompt}],
+        model=deployment_name
+    )
+
+
+def run_on_own_thread(assistant, prompt, cancelled):
+    """
+    Run an assistant on a fresh thread holding just the ticket; cancel it if
+    the other copy wins
+    """
+    result = scheduler.submit(
+        lambda: stream_openai_thread_run(
+            client,
+            assistant.id,
+            [{"role": "user", "content": prompt}],
+            cancelled,
+            delete_thread=True
+        ),
+        estimated_run_tokens(assistant, prompt),
+        INTERACTIVE
+    )
+    if result.run is not None:
+        hedged_threads.append(result.thread_id)
+    return result
+
+
+def triage_run(assistant, thread, prompt):
+    """One assistant run on the shared thread, or hedged runs on separate threads"""
+    if hedger is not None:
+        return hedger.call_sync(lambda cancelled: run_on_own_thread(assistant, prompt, cancelled))
+    # The answer arrives on the run's event stream: no polling, no message listing
+    return scheduler.submit(
+        lambda: stream_openai_run(client, thread.id, assistant.id),
+        estimated_run_tokens(assistant, prompt),
+        INTERACTIVE
+    )
+
+
+def main():
+    # Clear the console
+    os.system('cls' if os.name=='nt' else 'clear')
+
+    # One assistant returns priority, team and effort together as JSON that
+    # matches TicketTriage (replaces three free-text assistants)
+    print("Creating triage assistant...")
+
+    triage_assistant = client.beta.assistants.create(
+        name="triage_agent",
+        instructions=TRIAGE_INSTRUCTIONS,
+        model=deployment_name,
+        response_format=triage_response_format()
+    )
+
+    try:
+        # Create a thread
+        print("Creating thread...")
+        thread = client.beta.threads.create()
+
+        # Get user input
+        prompt = input("\nWhat's the support problem you need to resolve?: ")
+
+        # Add user message to thread
+        client.beta.threads.messages.create(
+            thread_id=thread.id,
+            role="user",
+            content=prompt
+        )
+
+        print("\nProcessing ticket. Please wait...\n")
+
+        # The assistant's instructions are a stable prefix ahead of the thread
+        # messages, so repeated runs can be served from the prompt cache
+        cache_stats = CacheStats()
+
+        # Triage in a single run
+        print("Triaging ticket...")
+        run = triage_run(triage_assistant, thread, prompt)
+        cache_stats.record_response(run)
+
+        triage = None
+        failure = run.status or "no run event received"
+        if run.status == "completed":
+            try:
+                triage = parse_triage(run.text)
+                # Logged results train the local pre-classifier (ticketPreClassifier.py)
+                log_triage(prompt, triage)
+            except ValidationError as e:
+                # Empty, truncated or refused output
+                failure = f"invalid response ({e.error_count()} validation error(s))"
+
+        # Display results
+        print("\n" + "="*60)
+        print("TICKET TRIAGE RESULTS")
+        print("="*60)
+        print(f"\nOriginal Ticket:\n{prompt}\n")
+        if triage is not None:
+            print(format_triage(triage))
+            print(f"Fields: {triage.model_dump_json()}\n")
+        else:
+            print(f"Triage failed: {failure}\n")
+        print(f"Prompt cache: {cache_stats.report()}")
+        print(f"Scheduler: {scheduler.report()}")
+        if hedger is not None:
+            print(f"Hedging: {hedger.report()}")
+        print("="*60)
+
+        # The whole thread is only fetched (page by page) when asked for
+        if show_thread_messages():
+            print("\nThread messages:\n")
+            print_thread(client, run.thread_id)
+
+    finally:
+        # Clean up, also when the run or the parsing failed
+        for thread_id in set(hedged_threads):
+            try:
+                client.beta.threads.delete(thread_id)
+            except NotFoundError:
+                pass  # a losing attempt already deleted it
+        print("\nCleaning up assistant...")
+        client.beta.assistants.delete(triage_assistant.id)
+        print("Deleted triage assistant.")
+    print("\nDone!")
+
+
+if __name__ == "__main__":
+    # --profile: sample the whole run
+    with profile_if_requested("multiAgentOpenAI"):
+        main()
@@ -0,0 +1,133 @@
+"""
+Prompt Prefix Caching Layout
+Assembles prompts as stable-prefix-first (instructions, tool schemas,
+reference data in TOON) then variable suffix, and tracks cached tokens
+
+Azure OpenAI caches the longest identical prompt prefix (from 1,024 tokens,
+in 128-token steps). Anything that changes per request must therefore come
+after everything that doesn't, or the whole prompt misses the cache.
+"""
+
+import json
+import hashlib
+from toon_format import encode
+from toonVsJson import count_tokens
+
+
+# Minimum prefix length the service will cache
+MIN_CACHEABLE_TOKENS = 1024
+
+
+class PromptLayout:
+    """Deterministic stable prefix + per-request variable suffix"""
+
+    def __init__(self, instructions: str = ""):
+        self.instructions = instructions.strip()
+        self.tool_schemas = []
+        self.reference_data = {}
+        self._prefix = None
+
+    def add_tool_schemas(self, tools: list):
+        """Add tool definitions (sorted by name so order never varies)"""
+        self.tool_schemas.extend(tools)
+        self.tool_schemas.sort(key=lambda t: (
+            t.get("name") or t.get("function", {}).get("name", ""),
+            json.dumps(t, sort_keys=True)
+        ))
+        self._prefix = None
+        return self
+
+    def add_reference_data(self, name: str, data):
+        """Add reference data, encoded as TOON inside the prefix"""
+        self.reference_data[name] = data
+        self._prefix = None
+        return self
+
+    @property
+    def prefix(self) -> str:
+        """The stable part of the prompt, identical across requests"""
+        if self._prefix is None:
+            sections = [self.instructions] if self.instructions else []
+            if self.tool_schemas:
+                sections.append("Tools:\n" + encode({"tools": self.tool_schemas}))
+            for name in sorted(self.reference_data):
+                sections.append(f"{name}:\n" + encode(self.reference_data[name]))
+            self._prefix = "\n\n".join(sections)
+        return self._prefix
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of the prefix; a change here means a guaranteed cache miss"""
+        return hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()[:12]
+
+    def prefix_tokens(self, model: str = "gpt-4") -> int:
+        """Token length of the stable prefix"""
+        return count_tokens(self.prefix, model)
+
+    def is_cacheable(self, model: str = "gpt-4") -> bool:
+        """Whether the prefix is long enough for server-side caching"""
+        return self.prefix_tokens(model) >= MIN_CACHEABLE_TOKENS
+
+    def build_messages(self, suffix: str, history: list = None) -> list:
+        """Chat messages: system prefix, then prior turns, then the variable suffix"""
+        messages = [{"role": "system", "content": self.prefix}]
+        messages.extend(history or [])
+        messages.append({"role": "user", "content": suffix})
+        return messages
+
+
+def _get(obj, key, default=None):
+    """Read a field from either an SDK object or a plain dict"""
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+class CacheStats:
+    """Accumulates prompt and cached token counts across responses"""
+
+    def __init__(self):
+        self.requests = 0
+        self.requests_with_hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record_usage(self, usage):
+        """
+        Record one response's usage
+
+        Accepts OpenAI `usage` objects (chat completions and assistant runs,
+        with `prompt_tokens_details.cached_tokens`) and LangChain
+        `usage_metadata` dicts (with `input_token_details.cache_read`).
+        """
+        if usage is None:
+            return
+        prompt = _get(usage, "prompt_tokens") or _get(usage, "input_tokens") or 0
+        details = (_get(usage, "prompt_tokens_details")
+                   or _get(usage, "prompt_token_details")
+                   or _get(usage, "input_token_details"))
+        cached = _get(details, "cached_tokens") or _get(details, "cache_read") or 0
+
+        self.requests += 1
+        self.prompt_tokens += prompt
+        self.cached_tokens += cached
+        if cached:
+            self.requests_with_hits += 1
+
+    def record_response(self, response):
+        """Record usage from a chat completion, assistant run or LangChain message"""
+        usage = _get(response, "usage_metadata") or _get(response, "usage")
+        self.record_usage(usage)
+
+    @property
+    def hit_ratio(self) -> float:
+        """Fraction of prompt tokens served from the cache"""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def report(self) -> str:
+        """One-line summary for console output"""
+        return (f"{self.cached_tokens:,}/{self.prompt_tokens:,} prompt tokens cached "
+                f"({self.hit_ratio * 100:.1f}%), "
+                f"{self.requests_with_hits}/{self.requests} requests hit the cache")
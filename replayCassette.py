@@ -0,0 +1,439 @@
+"""
+Record / Replay Cassettes for LLM and MCP Calls
+Captures every LLM HTTP exchange and MCP JSON-RPC call (with timings) into a
+compact gzip JSONL cassette, then replays them deterministically without
+Azure OpenAI or Azure DevOps - at the recorded latency or with none at all
+
+Settings (environment):
+    CASSETTE_MODE      off (default), record or replay
+    CASSETTE_DIR       cassette directory (default cassettes/default)
+    CASSETTE_LATENCY   recorded (default) or zero; zero leaves only the
+                       orchestration overhead of the script being measured
+
+LLM calls are hooked through the OpenAI client's httpx transport, MCP calls
+by running the server behind a recording proxy (or a replay server) via
+ado_mcp_server() in mcpTools.py. A replay needs placeholder credentials in
+.env so the scripts' configuration checks pass.
+
+Streamed (server-sent event) responses still stream while recording: chunks
+pass through as they arrive and the cassette keeps a copy plus the time to
+the first byte. Replay sends the first event after that time and the rest
+at the recorded total, so time-to-first-token survives a replay.
+
+Inspect a cassette:
+    python replayCassette.py show cassettes/default
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import atexit
+import hashlib
+import threading
+import subprocess
+from collections import defaultdict, deque
+from pathlib import Path
+import httpx
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+MODES = ("off", "record", "replay")
+LLM_FILE = "llm.jsonl.gz"
+MCP_FILE = "mcp.jsonl.gz"
+
+
+class CassetteMiss(KeyError):
+    """Replay found no recorded response for a request"""
+
+
+def cassette_mode() -> str:
+    mode = os.getenv("CASSETTE_MODE", "off").lower()
+    return mode if mode in MODES else "off"
+
+
+def request_key(kind: str, method: str, target: str, body) -> str:
+    """Stable hash of a request; JSON bodies are compared with sorted keys"""
+    if isinstance(body, (bytes, bytearray)):
+        body = body.decode("utf-8", errors="replace")
+    if isinstance(body, str):
+        try:
+            body = json.loads(body) if body else None
+        except ValueError:
+            pass
+    canonical = json.dumps([kind, method, target, body], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:24]
+
+
+class Cassette:
+    """One file of recorded exchanges; repeated identical requests replay in order"""
+
+    def __init__(self, path: str, mode: str = "replay", latency: str = "recorded"):
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.entries = []
+        self.queues = defaultdict(deque)
+        self.lock = threading.Lock()
+        self.replayed = 0
+        self.skipped_latency = 0.0
+        if mode == "replay":
+            if not self.path.exists():
+                raise FileNotFoundError(f"No cassette at {self.path} (record one with CASSETTE_MODE=record)")
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries.append(entry)
+                    self.queues[entry["key"]].append(entry)
+
+    def record(self, key: str, request: dict, response: dict, latency_s: float, first_byte_s: float = None):
+        entry = {"key": key, "request": request, "response": response,
+                 "latency_s": round(latency_s, 4), "at": time.time()}
+        if first_byte_s is not None:
+            entry["first_byte_s"] = round(first_byte_s, 4)
+        with self.lock:
+            self.entries.append(entry)
+
+    def take(self, key: str, wait: bool = True) -> dict:
+        """
+        Next recorded entry for `key` (the last one repeats once the queue runs dry)
+
+        Sleeps for the recorded latency unless `wait` is off (the caller
+        paces a streamed replay itself) or CASSETTE_LATENCY=zero.
+        """
+        with self.lock:
+            queue = self.queues.get(key)
+            if not queue:
+                raise CassetteMiss(f"No recorded response for request {key} in {self.path}")
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+            self.replayed += 1
+        if self.latency != "recorded":
+            self.skipped_latency += entry["latency_s"]
+        elif wait:
+            time.sleep(entry["latency_s"])
+        return entry
+
+    def save(self):
+        if self.mode != "record" or not self.entries:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock, gzip.open(self.path, "wt", encoding="utf-8") as f:
+            for entry in self.entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def report(self) -> str:
+        if self.mode == "record":
+            return f"recorded {len(self.entries)} exchange(s) to {self.path}"
+        saved = f", {self.skipped_latency:.2f}s of recorded latency skipped" if self.latency == "zero" else ""
+        return f"replayed {self.replayed} exchange(s) from {self.path}{saved}"
+
+
+# -- LLM calls (httpx transports for the OpenAI SDK) ------------------------
+
+def _http_request_key(request: httpx.Request) -> tuple:
+    target = request.url.raw_path.decode()
+    body = request.content
+    return request_key("llm", request.method, target, body), {
+        "method": request.method, "target": target, "body": body.decode("utf-8", errors="replace")
+    }
+
+
+def _is_event_stream(response: httpx.Response) -> bool:
+    return response.headers.get("content-type", "").startswith("text/event-stream")
+
+
+def _recorded_response(response: httpx.Response, body: bytes) -> dict:
+    # The body is stored decoded, so encoding/length headers no longer apply
+    headers = {k: v for k, v in response.headers.items() if k.lower() not in ("content-encoding", "content-length",
+                                                                              "transfer-encoding")}
+    return {"status": response.status_code, "headers": headers, "body": body.decode("utf-8", errors="replace")}
+
+
+def _decoded(response: httpx.Response, raw: bytes) -> bytes:
+    """Body bytes with any content-encoding removed"""
+    encoding = {"content-encoding": response.headers["content-encoding"]} if "content-encoding" in response.headers else {}
+    return httpx.Response(200, headers=encoding, stream=httpx.ByteStream(raw)).read()
+
+
+class _TeeStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Passes a live response body through, keeping a copy for the cassette once it is complete"""
+
+    def __init__(self, stream, started: float, on_complete):
+        self.stream = stream
+        self.started = started
+        self.on_complete = on_complete
+        self.chunks = []
+        self.first_byte_s = None
+        self.complete = False
+
+    def _keep(self, chunk: bytes) -> bytes:
+        if self.first_byte_s is None:
+            self.first_byte_s = time.perf_counter() - self.started
+        self.chunks.append(chunk)
+        return chunk
+
+    def _finish(self):
+        # Abandoned streams are not recorded: their replay would be truncated
+        if self.complete:
+            self.complete = False
+            self.on_complete(b"".join(self.chunks), self.first_byte_s)
+
+    def __iter__(self):
+        for chunk in self.stream:
+            yield self._keep(chunk)
+        self.complete = True
+
+    def close(self):
+        self.stream.close()
+        self._finish()
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield self._keep(chunk)
+        self.complete = True
+
+    async def aclose(self):
+        await self.stream.aclose()
+        self._finish()
+
+
+class _ReplayStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Recorded event stream: first event after first_byte_s, the rest at the recorded total"""
+
+    def __init__(self, entry: dict, paced: bool):
+        body = entry["response"]["body"].encode("utf-8")
+        first, separator, rest = body.partition(b"\n\n")
+        first_byte_s = entry["first_byte_s"] if paced else 0.0
+        rest_s = max(0.0, entry["latency_s"] - entry["first_byte_s"]) if paced else 0.0
+        self.parts = [(first_byte_s, first + separator), (rest_s, rest)]
+
+    def __iter__(self):
+        for delay, data in self.parts:
+            time.sleep(delay)
+            yield data
+
+    async def __aiter__(self):
+        import asyncio
+        for delay, data in self.parts:
+            await asyncio.sleep(delay)
+            yield data
+
+
+def _replayed_response(entry: dict, request: httpx.Request, paced: bool) -> httpx.Response:
+    response = entry["response"]
+    if "first_byte_s" in entry:
+        return httpx.Response(response["status"], headers=response["headers"],
+                              stream=_ReplayStream(entry, paced), request=request)
+    return httpx.Response(response["status"], headers=response["headers"],
+                          content=response["body"].encode("utf-8"), request=request)
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """Sync transport that records through to the network or replays"""
+
+    def __init__(self, cassette: Cassette, inner: httpx.BaseTransport = None):
+        self.cassette = cassette
+        self.inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key, summary = _http_request_key(request)
+        if self.cassette.mode == "replay":
+            entry = self.cassette.take(key, wait=False)
+            if "first_byte_s" not in entry and self.cassette.latency == "recorded":
+                time.sleep(entry["latency_s"])
+            return _replayed_response(entry, request, self.cassette.latency == "recorded")
+        start = time.perf_counter()
+        response = self.inner.handle_request(request)
+        if _is_event_stream(response):
+            def complete(raw, first_byte_s):
+                self.cassette.record(key, summary, _recorded_response(response, _decoded(response, raw)),
+                                     time.perf_counter() - start, first_byte_s)
+            return httpx.Response(response.status_code, headers=response.headers, request=request,
+                                  stream=_TeeStream(response.stream, start, complete))
+        body = response.read()
+        response.close()
+        recorded = _recorded_response(response, body)
+        self.cassette.record(key, summary, recorded, time.perf_counter() - start)
+        return httpx.Response(recorded["status"], headers=recorded["headers"], content=body, request=request)
+
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    """Async transport that records through to the network or replays"""
+
+    def __init__(self, cassette: Cassette, inner: httpx.AsyncBaseTransport = None):
+        self.cassette = cassette
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        import asyncio
+        key, summary = _http_request_key(request)
+        if self.cassette.mode == "replay":
+            entry = self.cassette.take(key, wait=False)
+            if "first_byte_s" not in entry and self.cassette.latency == "recorded":
+                await asyncio.sleep(entry["latency_s"])
+            return _replayed_response(entry, request, self.cassette.latency == "recorded")
+        start = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        if _is_event_stream(response):
+            def complete(raw, first_byte_s):
+                self.cassette.record(key, summary, _recorded_response(response, _decoded(response, raw)),
+                                     time.perf_counter() - start, first_byte_s)
+            return httpx.Response(response.status_code, headers=response.headers, request=request,
+                                  stream=_TeeStream(response.stream, start, complete))
+        body = await response.aread()
+        await response.aclose()
+        recorded = _recorded_response(response, body)
+        self.cassette.record(key, summary, recorded, time.perf_counter() - start)
+        return httpx.Response(recorded["status"], headers=recorded["headers"], content=body, request=request)
+
+
+_llm_cassette = None
+
+
+def llm_cassette():
+    """Process-wide LLM cassette for the configured mode (None when off)"""
+    global _llm_cassette
+    mode = cassette_mode()
+    if mode == "off":
+        return None
+    if _llm_cassette is None:
+        directory = Path(os.getenv("CASSETTE_DIR", "cassettes/default"))
+        _llm_cassette = Cassette(directory / LLM_FILE, mode, os.getenv("CASSETTE_LATENCY", "recorded"))
+
+        def finish():
+            _llm_cassette.save()
+            print(f"📼 LLM cassette: {_llm_cassette.report()}", file=sys.stderr)
+
+        atexit.register(finish)
+    return _llm_cassette
+
+
+def cassette_http_client():
+    """httpx.Client for `AzureOpenAI(http_client=...)`, or None when cassettes are off"""
+    cassette = llm_cassette()
+    return httpx.Client(transport=CassetteTransport(cassette), timeout=600) if cassette else None
+
+
+def cassette_async_http_client():
+    """httpx.AsyncClient for `AsyncAzureOpenAI(http_client=...)`, or None when cassettes are off"""
+    cassette = llm_cassette()
+    return httpx.AsyncClient(transport=AsyncCassetteTransport(cassette), timeout=600) if cassette else None
+
+
+# -- MCP calls (stdio proxy / replay server) --------------------------------
+
+def mcp_server_command(command: str, args: list) -> tuple:
+    """Wrap an MCP server command for the configured cassette mode"""
+    mode = cassette_mode()
+    if mode == "off":
+        return command, args
+    script = str(Path(__file__).resolve())
+    directory = str(Path(os.getenv("CASSETTE_DIR", "cassettes/default")).resolve())
+    latency = os.getenv("CASSETTE_LATENCY", "recorded")
+    if mode == "record":
+        return sys.executable, [script, "mcp-record", directory, "--", command, *args]
+    return sys.executable, [script, "mcp-replay", directory, latency]
+
+
+def _mcp_key(message: dict) -> str:
+    return request_key("mcp", message.get("method"), "", message.get("params"))
+
+
+def run_mcp_recorder(directory: str, command: list):
+    """Forward stdio JSON-RPC to the real server, recording each request/response pair"""
+    cassette = Cassette(Path(directory) / MCP_FILE, "record")
+    child = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1,
+                             shell=(os.name == "nt"))
+    pending = {}
+
+    def pump_responses():
+        for line in child.stdout:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            request = pending.pop(message.get("id"), None) if "id" in message else None
+            if request is not None:
+                sent, original = request
+                response = {k: v for k, v in message.items() if k != "id"}
+                cassette.record(_mcp_key(original), {"method": original.get("method"), "params": original.get("params")},
+                                response, time.perf_counter() - sent)
+
+    reader = threading.Thread(target=pump_responses, daemon=True)
+    reader.start()
+    try:
+        for line in sys.stdin:
+            try:
+                message = json.loads(line)
+                if "id" in message and "method" in message:
+                    pending[message["id"]] = (time.perf_counter(), message)
+            except ValueError:
+                pass
+            child.stdin.write(line)
+            child.stdin.flush()
+    finally:
+        # The client closes stdin on shutdown: let in-flight responses drain, then save
+        child.stdin.close()
+        reader.join(timeout=5)
+        child.terminate()
+        cassette.save()
+
+
+def run_mcp_replayer(directory: str, latency: str = "recorded"):
+    """Answer stdio JSON-RPC from a recorded cassette"""
+    cassette = Cassette(Path(directory) / MCP_FILE, "replay", latency)
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        message = json.loads(line)
+        if "id" not in message:
+            continue  # notification
+        try:
+            response = dict(cassette.take(_mcp_key(message))["response"])
+        except CassetteMiss as e:
+            response = {"jsonrpc": "2.0", "error": {"code": -32603, "message": str(e)}}
+        response["id"] = message["id"]
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+def show(directory: str):
+    """Summarize the exchanges in a cassette directory"""
+    for name in (LLM_FILE, MCP_FILE):
+        path = Path(directory) / name
+        if not path.exists():
+            continue
+        cassette = Cassette(path, "replay")
+        by_target = defaultdict(list)
+        for entry in cassette.entries:
+            request = entry["request"]
+            target = request.get("target") or request.get("method")
+            if request.get("method") == "tools/call":
+                target = f"tools/call {request['params'].get('name')}"
+            by_target[target.split("?")[0]].append(entry["latency_s"])
+        print(f"\n📼 {path} ({len(cassette.entries)} exchanges)")
+        for target, latencies in sorted(by_target.items()):
+            print(f"   {len(latencies):>4} x {target}  (total {sum(latencies):.2f}s)")
+
+
+def main():
+    if len(sys.argv) >= 4 and sys.argv[1] == "mcp-record" and "--" in sys.argv:
+        split = sys.argv.index("--")
+        run_mcp_recorder(sys.argv[2], sys.argv[split + 1:])
+    elif len(sys.argv) >= 3 and sys.argv[1] == "mcp-replay":
+        run_mcp_replayer(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else "recorded")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "show":
+        show(sys.argv[2])
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
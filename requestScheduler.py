@@ -0,0 +1,415 @@
+"""
+Priority-Aware LLM Request Scheduler
+One shared gate for every LLM call: requests/min and tokens/min budgets
+(token cost estimated locally before the call), a global pause when the
+service answers 429 with Retry-After, and priority classes so interactive
+prompts go ahead of batch jobs
+
+Transient failures (connection errors, timeouts, 408, 409, 5xx) are retried
+too, with exponential backoff for that request only. Clients whose calls go
+through the scheduler are built with llm_client_options(), which turns the
+SDK's own retries off so nothing is retried twice.
+
+Works from plain threads and from asyncio code alike: waiters take a ticket
+and poll a lock-protected queue, so sync and async callers share one budget.
+
+Configure with LLM_RPM, LLM_TPM and LLM_MAX_RETRIES in .env
+"""
+
+import os
+import re
+import time
+import heapq
+import asyncio
+import itertools
+import random
+import threading
+from email.utils import parsedate_to_datetime
+import httpx
+from dotenv import load_dotenv
+from replayCassette import cassette_http_client, cassette_async_http_client
+
+try:
+    from openai import APIConnectionError   # also APITimeoutError
+except ImportError:
+    APIConnectionError = ()
+
+# Load environment variables
+load_dotenv()
+
+
+# Priority classes (lower runs first)
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Used when a 429 carries no usable Retry-After header
+DEFAULT_RETRY_AFTER = 5.0
+
+# Backoff for transient failures: doubles per attempt up to the cap (as the
+# OpenAI SDK's own retries), with jitter
+TRANSIENT_BACKOFF_S = 0.5
+MAX_TRANSIENT_BACKOFF_S = 8.0
+
+# Completion budget assumed when the call sets no max_tokens (the real
+# usage replaces the estimate once the response arrives)
+DEFAULT_COMPLETION_TOKENS = 256
+
+# How often queued requests that are not at the head re-check the queue
+POLL_INTERVAL = 0.05
+
+
+class TokenBucket:
+    """Per-minute budget that refills continuously"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.rate = per_minute / 60
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (requests above capacity wait for a full bucket)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.available >= amount else (amount - self.available) / self.rate
+
+    def take(self, amount: float):
+        # May go negative when a response used more than estimated
+        self.available -= amount
+
+    def refund(self, amount: float):
+        self.available = min(self.capacity, self.available + amount)
+
+
+def parse_retry_after(headers) -> float:
+    """Seconds from retry-after-ms / retry-after (delta or HTTP date) headers"""
+    headers = headers or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return DEFAULT_RETRY_AFTER
+
+
+def retry_after_seconds(outcome):
+    """
+    How long to back off if `outcome` is a rate-limit failure, else None
+
+    Understands OpenAI SDK errors (also when wrapped by LangChain or
+    Semantic Kernel) and Assistants runs that failed with
+    `rate_limit_exceeded`.
+    """
+    seen = set()
+    while outcome is not None and id(outcome) not in seen:
+        seen.add(id(outcome))
+        response = getattr(outcome, "response", None)
+        status = getattr(outcome, "status_code", None) or getattr(response, "status_code", None)
+        if status == 429:
+            return parse_retry_after(getattr(response, "headers", None))
+
+        last_error = getattr(outcome, "last_error", None)
+        if getattr(outcome, "status", None) == "failed" and getattr(last_error, "code", "") == "rate_limit_exceeded":
+            match = re.search(r"try again in (\d+(?:\.\d+)?) ?s", getattr(last_error, "message", "") or "", re.I)
+            return float(match.group(1)) if match else DEFAULT_RETRY_AFTER
+
+        if not isinstance(outcome, BaseException):
+            return None
+        outcome = outcome.__cause__ or outcome.__context__
+    return None
+
+
+def is_transient_failure(error) -> bool:
+    """
+    Whether `error` is worth retrying although it is not a rate limit:
+    connection errors, timeouts, 408, 409 and 5xx responses
+
+    Follows wrapped errors like retry_after_seconds.
+    """
+    seen = set()
+    while isinstance(error, BaseException) and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (httpx.TransportError, ConnectionError, APIConnectionError)):
+            return True
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+        if isinstance(status, int) and (status in (408, 409) or status >= 500):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def llm_client_options(async_client: bool = False) -> dict:
+    """
+    Keyword arguments for an OpenAI / Azure OpenAI client whose calls go
+    through the scheduler: SDK retries off (the scheduler retries) and the
+    record/replay transport (CASSETTE_MODE)
+    """
+    return {
+        "http_client": cassette_async_http_client() if async_client else cassette_http_client(),
+        "max_retries": 0
+    }
+
+
+def usage_tokens(result):
+    """
+    Total tokens reported by a response, run, LangChain message, SK result
+    or usage object (None if absent)
+
+    Lists and tuples, such as the (text, metrics, usage) results of the
+    streaming helpers, report the first element that carries usage.
+    """
+    if isinstance(result, (list, tuple)):
+        for item in result:
+            total = usage_tokens(item)
+            if total is not None:
+                return total
+        return None
+    usage = getattr(result, "usage", None)
+    if usage is None:
+        metadata = getattr(result, "metadata", None)
+        usage = metadata.get("usage") if isinstance(metadata, dict) else None
+    if usage is None and hasattr(result, "prompt_tokens"):
+        usage = result
+    if usage is not None:
+        total = getattr(usage, "total_tokens", None)
+        if total is None:
+            total = (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+        return total or None
+    metadata = getattr(result, "usage_metadata", None)
+    if metadata:
+        return metadata.get("total_tokens")
+    return None
+
+
+def estimate_request_tokens(messages: list, max_tokens: int = None, model: str = "gpt-4") -> int:
+    """
+    Tokens a chat request counts against the TPM quota: calibrated prompt
+    estimate plus the completion budget
+
+    Accepts OpenAI-style dicts, LangChain messages and Semantic Kernel
+    chat message contents.
+    """
+    from tokenCalibration import estimate_prompt_tokens
+
+    roles = {"human": "user", "ai": "assistant"}
+    normalized = []
+    for message in messages:
+        if isinstance(message, dict):
+            normalized.append(message)
+            continue
+        role = getattr(message, "role", None) or getattr(message, "type", "user")
+        role = str(getattr(role, "value", role))
+        normalized.append({"role": roles.get(role, role), "content": str(getattr(message, "content", "") or "")})
+    completion = DEFAULT_COMPLETION_TOKENS if max_tokens is None else max_tokens
+    return estimate_prompt_tokens(normalized, model) + completion
+
+
+class RequestScheduler:
+    """Admits LLM calls in priority order within RPM/TPM budgets"""
+
+    def __init__(self, rpm: int = None, tpm: int = None, max_retries: int = None,
+                 poll_interval: float = POLL_INTERVAL):
+        self.rpm = rpm or int(os.getenv("LLM_RPM", "180"))
+        self.tpm = tpm or int(os.getenv("LLM_TPM", "30000"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "3")) if max_retries is None else max_retries
+        self.poll_interval = poll_interval
+        self.request_bucket = TokenBucket(self.rpm)
+        self.token_bucket = TokenBucket(self.tpm)
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._queue = []
+        self._sequence = itertools.count()
+        self.stats = {
+            "admitted": {name: 0 for name in PRIORITY_NAMES.values()},
+            "waited_s": {name: 0.0 for name in PRIORITY_NAMES.values()},
+            "rate_limited": 0,
+            "transient_retries": 0,
+            "estimated_tokens": 0,
+            "actual_tokens": 0
+        }
+
+    # -- admission -------------------------------------------------------
+
+    def _enqueue(self, priority: int) -> tuple:
+        ticket = (priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _abandon(self, ticket: tuple):
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _try_admit(self, ticket: tuple, tokens: int) -> float:
+        """0 once `ticket` is admitted, otherwise seconds to wait before asking again"""
+        with self._lock:
+            if self._queue[0] != ticket:
+                return self.poll_interval
+            now = time.monotonic()
+            wait = max(
+                self.blocked_until - now,
+                self.request_bucket.wait_time(1, now),
+                self.token_bucket.wait_time(tokens, now)
+            )
+            if wait > 0:
+                # Re-check often enough to let a newly queued interactive request through
+                return min(wait, 1.0)
+            heapq.heappop(self._queue)
+            self.request_bucket.take(1)
+            self.token_bucket.take(tokens)
+            return 0.0
+
+    def _admitted(self, priority: int, tokens: int, started: float):
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        with self._lock:
+            self.stats["admitted"][name] = self.stats["admitted"].get(name, 0) + 1
+            self.stats["waited_s"][name] = self.stats["waited_s"].get(name, 0.0) + time.monotonic() - started
+            self.stats["estimated_tokens"] += tokens
+
+    def wait_turn(self, tokens: int = 0, priority: int = INTERACTIVE):
+        """Block the calling thread until the request may be sent"""
+        started = time.monotonic()
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_admit(ticket, tokens)
+                if wait == 0:
+                    break
+                time.sleep(wait)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        self._admitted(priority, tokens, started)
+
+    async def await_turn(self, tokens: int = 0, priority: int = INTERACTIVE):
+        """Async version of wait_turn (cancellation leaves the queue)"""
+        started = time.monotonic()
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_admit(ticket, tokens)
+                if wait == 0:
+                    break
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        self._admitted(priority, tokens, started)
+
+    # -- outcomes --------------------------------------------------------
+
+    def _back_off(self, delay: float):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.stats["rate_limited"] += 1
+        print(f"   ⏳ Rate limited, pausing all LLM calls for {delay:.1f}s")
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Backoff before retrying a transient failure (only this request waits)"""
+        delay = min(MAX_TRANSIENT_BACKOFF_S, TRANSIENT_BACKOFF_S * 2 ** attempt) * random.uniform(0.75, 1.0)
+        with self._lock:
+            self.stats["transient_retries"] += 1
+        print(f"   🔁 {type(error).__name__}, retrying in {delay:.1f}s")
+        return delay
+
+    def _settle(self, estimated: int, result):
+        """Correct the TPM budget with the usage the service reported"""
+        actual = usage_tokens(result)
+        if actual is None:
+            return
+        with self._lock:
+            self.stats["actual_tokens"] += actual
+            if actual > estimated:
+                self.token_bucket.take(actual - estimated)
+            else:
+                self.token_bucket.refund(estimated - actual)
+
+    def submit(self, call, tokens: int = 0, priority: int = INTERACTIVE):
+        """
+        Run `call()` when admitted, retrying rate-limited attempts after
+        Retry-After and transient failures after a backoff
+        """
+        for attempt in range(self.max_retries + 1):
+            self.wait_turn(tokens, priority)
+            try:
+                result = call()
+            except Exception as e:
+                delay = retry_after_seconds(e)
+                transient = delay is None and is_transient_failure(e)
+                if (delay is None and not transient) or attempt == self.max_retries:
+                    raise
+                if transient:
+                    time.sleep(self._retry_delay(attempt, e))
+                else:
+                    self._back_off(delay)
+                continue
+            delay = retry_after_seconds(result)
+            if delay is not None and attempt < self.max_retries:
+                self._back_off(delay)
+                continue
+            self._settle(tokens, result)
+            return result
+
+    async def asubmit(self, call, tokens: int = 0, priority: int = INTERACTIVE):
+        """Async version of submit; `call()` returns an awaitable"""
+        for attempt in range(self.max_retries + 1):
+            await self.await_turn(tokens, priority)
+            try:
+                result = await call()
+            except Exception as e:
+                delay = retry_after_seconds(e)
+                transient = delay is None and is_transient_failure(e)
+                if (delay is None and not transient) or attempt == self.max_retries:
+                    raise
+                if transient:
+                    await asyncio.sleep(self._retry_delay(attempt, e))
+                else:
+                    self._back_off(delay)
+                continue
+            delay = retry_after_seconds(result)
+            if delay is not None and attempt < self.max_retries:
+                self._back_off(delay)
+                continue
+            self._settle(tokens, result)
+            return result
+
+    def report(self) -> str:
+        """One-line summary for console output"""
+        admitted = ", ".join(
+            f"{count} {name} (avg wait {self.stats['waited_s'][name] / count:.2f}s)"
+            for name, count in self.stats["admitted"].items() if count
+        )
+        return (f"{admitted or 'no requests'}; {self.stats['rate_limited']} rate limit pause(s), "
+                f"{self.stats['transient_retries']} transient retry(ies); "
+                f"budget {self.rpm} RPM / {self.tpm:,} TPM")
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Process-wide scheduler shared by every LLM call site"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = RequestScheduler()
+        return _default_scheduler
@@ -0,0 +1,198 @@
+"""
+Run Result Extraction
+Reads an agent run's final answer from the run's own stream events instead
+of polling the run and then listing thread messages: one streamed request
+per run, however long the thread grows
+
+Works with OpenAI Assistants (multiAgentOpenAI.py) and Azure AI Agents
+(multiAgentAzure.py, triageService.py), which emit the same event names. Earlier thread
+messages are only fetched when asked for, one page at a time, through
+iter_thread_messages (set SHOW_THREAD_MESSAGES=true in .env).
+"""
+
+import os
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+MESSAGE_COMPLETED = "thread.message.completed"
+RUN_EVENT_PREFIX = "thread.run."
+STEP_EVENT_PREFIX = "thread.run.step"
+
+
+def show_thread_messages() -> bool:
+    """Whether SHOW_THREAD_MESSAGES asks for the whole thread to be printed"""
+    return os.getenv("SHOW_THREAD_MESSAGES", "false").lower() == "true"
+
+
+def message_text(message) -> str:
+    """Text content of an Assistants or Agents message"""
+    return "".join(part.text.value for part in message.content if getattr(part, "type", None) == "text")
+
+
+class RunResult:
+    """
+    Last run state and final assistant message seen on a run's event stream
+
+    Any other attribute (usage, last_error, thread_id, ...) reads through
+    to the run, so a RunResult can go wherever a run object did
+    (scheduler retries, CacheStats.record_response).
+    """
+
+    def __init__(self):
+        self.run = None
+        self.message = None
+        self.events = 0
+
+    def __getattr__(self, name):
+        run = self.__dict__.get("run")
+        if run is None:
+            raise AttributeError(name)
+        return getattr(run, name)
+
+    @property
+    def status(self):
+        """The run's last status (None if the stream carried no run event)"""
+        return getattr(self.run, "status", None)
+
+    @property
+    def text(self) -> str:
+        """The assistant's final answer ("" if the run produced no message)"""
+        return message_text(self.message) if self.message is not None else ""
+
+
+def collect_run(events, cancelled=None, cancel=None, close=None) -> RunResult:
+    """
+    Fold (event name, data) pairs from a run stream into a RunResult
+
+    If `cancelled` (a threading.Event) gets set, a watcher thread calls
+    `cancel(run)` (once a run event has arrived) and `close()` on the
+    stream, so a run that has stopped sending events is abandoned too.
+    """
+    result = RunResult()
+    done = threading.Event()
+    stopping = threading.Lock()
+
+    def stop():
+        # Called by whichever of the reader and the watcher notices first
+        if not stopping.acquire(blocking=False):
+            return
+        try:
+            if result.run is not None:
+                cancel(result.run)
+        except Exception as e:
+            print(f"⚠️  Could not cancel run {result.run.id}: {e}")
+        if close is not None:
+            close()
+
+    def watch():
+        while not done.is_set():
+            if cancelled.wait(0.5):
+                stop()
+                return
+
+    if cancelled is not None:
+        threading.Thread(target=watch, daemon=True).start()
+    try:
+        for name, data in events:
+            _fold_event(result, name, data)
+            if cancelled is not None and cancelled.is_set():
+                stop()
+                break
+    except Exception:
+        # Reading a stream the watcher closed fails; that is the cancellation
+        if cancelled is None or not cancelled.is_set():
+            raise
+    finally:
+        done.set()
+    return result
+
+
+async def collect_run_async(events) -> RunResult:
+    """collect_run for an async iterable of (event name, data) pairs"""
+    result = RunResult()
+    async for name, data in events:
+        _fold_event(result, name, data)
+    return result
+
+
+def _fold_event(result: RunResult, name: str, data):
+    result.events += 1
+    if name.startswith(RUN_EVENT_PREFIX) and not name.startswith(STEP_EVENT_PREFIX):
+        result.run = data
+    elif name == MESSAGE_COMPLETED and getattr(data, "role", None) == "assistant":
+        result.message = data
+
+
+def _cancel_openai_run(client):
+    return lambda run: client.beta.threads.runs.cancel(thread_id=run.thread_id, run_id=run.id)
+
+
+def stream_openai_run(client, thread_id: str, assistant_id: str, cancelled=None) -> RunResult:
+    """Run an assistant on an existing thread, reading the answer from the stream"""
+    with client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id) as stream:
+        return collect_run(((event.event, event.data) for event in stream), cancelled, _cancel_openai_run(client),
+                           stream.close)
+
+
+def stream_openai_thread_run(client, assistant_id: str, messages: list, cancelled=None,
+                             delete_thread: bool = False) -> RunResult:
+    """
+    Create a thread holding `messages` and run an assistant on it, reading the answer from the stream
+
+    With delete_thread the thread is deleted if the attempt fails or is
+    cancelled (a losing hedged attempt); a finished run's thread is left to
+    the caller, which may still read it (result.thread_id).
+    """
+    stream = None
+    finished = False
+    try:
+        with client.beta.threads.create_and_run_stream(assistant_id=assistant_id,
+                                                       thread={"messages": messages}) as stream:
+            result = collect_run(((event.event, event.data) for event in stream), cancelled,
+                                 _cancel_openai_run(client), stream.close)
+            finished = True
+            return result
+    finally:
+        run = getattr(stream, "current_run", None)
+        lost = not finished or (cancelled is not None and cancelled.is_set())
+        if delete_thread and lost and run is not None:
+            try:
+                client.beta.threads.delete(run.thread_id)
+            except Exception as e:
+                print(f"⚠️  Could not delete thread {run.thread_id}: {e}")
+
+
+def stream_agent_run(agents_client, thread_id: str, agent_id: str) -> RunResult:
+    """Azure AI Agents version of stream_openai_run"""
+    with agents_client.runs.stream(thread_id=thread_id, agent_id=agent_id) as stream:
+        return collect_run((event_type, data) for event_type, data, _ in stream)
+
+
+async def stream_agent_run_async(agents_client, thread_id: str, agent_id: str) -> RunResult:
+    """stream_agent_run for the async client (azure.ai.agents.aio)"""
+    async with await agents_client.runs.stream(thread_id=thread_id, agent_id=agent_id) as stream:
+        return await collect_run_async((event_type, data) async for event_type, data, _ in stream)
+
+
+def iter_thread_messages(client, thread_id: str, order: str = "asc", page_size: int = 20):
+    """
+    Yield a thread's messages, requesting the next page only once the
+    current one has been consumed (stop iterating to stop fetching)
+
+    `client` is an OpenAI client or an Azure AgentsClient.
+    """
+    if hasattr(client, "beta"):
+        yield from client.beta.threads.messages.list(thread_id=thread_id, order=order, limit=page_size)
+    else:
+        yield from client.messages.list(thread_id=thread_id, order=order, limit=page_size)
+
+
+def print_thread(client, thread_id: str):
+    """Print every message of a thread, oldest first"""
+    for message in iter_thread_messages(client, thread_id):
+        role = getattr(message.role, "value", message.role)
+        print(f"{role}:\n{message_text(message)}\n")
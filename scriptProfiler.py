@@ -0,0 +1,285 @@
+"""
+Script Profiling Mode
+Run any of the entry-point scripts with --profile to find out where a slow
+agent run spends its time: local orchestration (tool dispatch, TOON
+encoding, plugin loading) or waiting on the network
+
+    python mcpADOagent.py --profile
+    python toonVsJson.py --profile
+
+A sampling profiler walks every thread's stack (sys._current_frames) every
+PROFILE_INTERVAL_MS and checks each thread's CPU clock to tell on-CPU
+samples from waiting ones; tracemalloc records allocations alongside
+(PROFILE_TRACEMALLOC=false to skip it). On exit it prints a summary and
+writes into PROFILE_DIR (default profiles/):
+    <script>-<time>.collapsed   collapsed stacks for flamegraph.pl / speedscope
+                                (waiting samples end in a [waiting] frame)
+    <script>-<time>.alloc.txt   top allocation sites
+"""
+
+import os
+import sys
+import time
+import atexit
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+PROFILE_FLAG = "--profile"
+WAITING_FRAME = "[waiting]"
+# Leaf frames that mean "blocked", used where per-thread CPU clocks are unavailable (Windows)
+BLOCKING_LEAVES = {
+    ("selectors.py", "select"), ("socket.py", "recv_into"), ("socket.py", "accept"),
+    ("ssl.py", "read"), ("ssl.py", "recv_into"), ("threading.py", "wait"), ("queue.py", "get"),
+    ("subprocess.py", "_communicate"), ("connection.py", "_recv")
+}
+
+
+def profile_requested() -> bool:
+    """Whether the script was started with --profile"""
+    return PROFILE_FLAG in sys.argv
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Background thread sampling all other threads' stacks"""
+
+    def __init__(self, interval_s: float = None):
+        self.interval_s = (float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000) if interval_s is None else interval_s
+        self.stacks = Counter()
+        self.samples = 0
+        self.cpu_samples = 0
+        # CPU time of the sampling thread itself, excluded from the script's CPU time
+        self.overhead_s = 0.0
+        self._cpu_clocks = {}
+        self._last_cpu = {}
+        # Called from the sampling thread after every sample
+        self.on_sample = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _thread_cpu(self, thread_id: int):
+        """CPU seconds used by a thread so far (None where the OS can't tell us)"""
+        if not hasattr(time, "pthread_getcpuclockid"):
+            return None
+        try:
+            if thread_id not in self._cpu_clocks:
+                self._cpu_clocks[thread_id] = time.pthread_getcpuclockid(thread_id)
+            return time.clock_gettime(self._cpu_clocks[thread_id])
+        except (OSError, OverflowError):
+            return None
+
+    def _on_cpu(self, thread_id: int, frame, elapsed: float) -> bool:
+        cpu = self._thread_cpu(thread_id)
+        if cpu is None:
+            code = frame.f_code
+            return (os.path.basename(code.co_filename), code.co_name) not in BLOCKING_LEAVES
+        previous = self._last_cpu.get(thread_id)
+        self._last_cpu[thread_id] = cpu
+        # A thread that used at least half of the interval's CPU time was running
+        return previous is not None and cpu - previous >= elapsed / 2
+
+    def _sample(self, elapsed: float):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        me = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            on_cpu = self._on_cpu(thread_id, frame, elapsed)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, f"thread-{thread_id}"))
+            labels.reverse()
+            if not on_cpu:
+                labels.append(WAITING_FRAME)
+            self.stacks[";".join(labels)] += 1
+            self.samples += 1
+            self.cpu_samples += on_cpu
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval_s):
+            now = time.perf_counter()
+            self._sample(now - last)
+            if self.on_sample is not None:
+                self.on_sample()
+            last = now
+        self.overhead_s = time.thread_time()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stack format, one `frame;frame;... count` per line"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 15) -> list:
+        """(function, inclusive samples, on-CPU samples), by inclusive samples"""
+        inclusive, on_cpu = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            waiting = frames[-1] == WAITING_FRAME
+            for label in set(frames) - {WAITING_FRAME}:
+                inclusive[label] += count
+                if not waiting:
+                    on_cpu[label] += count
+        return [(label, count, on_cpu[label]) for label, count in inclusive.most_common(limit)]
+
+    def top_self(self, limit: int = 10) -> list:
+        """(leaf function, on-CPU samples): where CPU time is actually spent"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            if frames[-1] != WAITING_FRAME:
+                leaves[frames[-1]] += count
+        return leaves.most_common(limit)
+
+
+class ProfileSession:
+    """Sampling profiler plus tracemalloc for one script run"""
+
+    def __init__(self, name: str, output_dir: str = None):
+        self.name = name
+        self.output_dir = output_dir or os.getenv("PROFILE_DIR", "profiles")
+        self.profiler = SamplingProfiler()
+        # tracemalloc can slow allocation-heavy code several times over, which
+        # skews the CPU/waiting split; switch it off for clean timings
+        self.trace_malloc = os.getenv("PROFILE_TRACEMALLOC", "true").lower() == "true"
+        self.malloc_frames = int(os.getenv("PROFILE_MALLOC_FRAMES", "1"))
+        self.peak_snapshot = None
+        self.peak_traced = 0
+        self._last_snapshot = 0.0
+        self.started = self.started_cpu = None
+        self.finished = False
+
+    def _watch_memory(self):
+        """Keep a snapshot near the traced-memory peak (at most one per second)"""
+        current, _ = tracemalloc.get_traced_memory()
+        now = time.perf_counter()
+        if current > self.peak_traced * 1.1 and now - self._last_snapshot >= 1.0:
+            self.peak_snapshot = self._filtered(tracemalloc.take_snapshot())
+            self.peak_traced = current
+            self._last_snapshot = now
+
+    @staticmethod
+    def _filtered(snapshot):
+        """Drop the profiler's own bookkeeping from a snapshot"""
+        return snapshot.filter_traces([tracemalloc.Filter(False, __file__),
+                                       tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def start(self):
+        if self.trace_malloc:
+            tracemalloc.start(self.malloc_frames)
+            self.profiler.on_sample = self._watch_memory
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+        self.profiler.start()
+        print(f"🔬 Profiling {self.name} (sampling every {self.profiler.interval_s * 1000:.0f}ms, "
+              f"tracemalloc {'on' if self.trace_malloc else 'off'})")
+        return self
+
+    def _write_allocations(self, path: str, at_exit, peak: int):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Peak traced memory: {peak / 1e6:.1f} MB\n")
+            for title, snapshot in (("Near peak", self.peak_snapshot), ("Still allocated at exit", at_exit)):
+                if snapshot is None:
+                    continue
+                f.write(f"\n{title}:\n")
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{stat}\n")
+
+    def stop(self):
+        """Stop sampling, write the reports and print a summary"""
+        if self.finished or self.started is None:
+            return
+        self.finished = True
+        wall = time.perf_counter() - self.started
+        self.profiler.stop()
+        cpu = max(0.0, time.process_time() - self.started_cpu - self.profiler.overhead_s)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{self.name}-{datetime.now():%Y%m%d-%H%M%S}")
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(self.profiler.collapsed())
+        if self.trace_malloc:
+            at_exit = self._filtered(tracemalloc.take_snapshot())
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self._write_allocations(base + ".alloc.txt", at_exit, peak)
+
+        samples = self.profiler.samples
+        print("\n" + "=" * 70)
+        print(f"🔬 Profile of {self.name}")
+        print("=" * 70)
+        # CPU time can exceed wall time when several threads run at once
+        waiting = max(0.0, wall - cpu)
+        print(f"Wall time {wall:.2f}s, process CPU {cpu:.2f}s -> "
+              f"{waiting:.2f}s ({waiting / wall if wall else 0:.0%}) spent waiting (network, disk, sleeps)")
+        if samples:
+            print(f"Samples: {samples:,} across threads, {self.profiler.cpu_samples / samples:.0%} on CPU, "
+                  f"{1 - self.profiler.cpu_samples / samples:.0%} waiting")
+        else:
+            print("Samples: none (run shorter than the sampling interval)")
+        print(f"\n{'Function (inclusive)':52} {'samples':>8} {'on CPU':>8}")
+        for label, count, on_cpu in self.profiler.top_functions():
+            print(f"{label[:52]:52} {count:>8} {on_cpu:>8}")
+        print(f"\n{'Hottest on-CPU leaves':52} {'samples':>8}")
+        for label, count in self.profiler.top_self():
+            print(f"{label[:52]:52} {count:>8}")
+        files = f"{base}.collapsed (flamegraph.pl / speedscope)"
+        if self.trace_malloc:
+            snapshot = self.peak_snapshot or at_exit
+            print(f"\nMemory: {peak / 1e6:.1f} MB peak traced; top allocation sites "
+                  f"{'near the peak' if self.peak_snapshot else 'at exit'}:")
+            for stat in snapshot.statistics("lineno")[:5]:
+                frame = stat.traceback[0]
+                print(f"   {stat.size / 1e6:7.2f} MB  {os.path.basename(frame.filename)}:{frame.lineno}")
+            print("(timings include tracemalloc overhead; PROFILE_TRACEMALLOC=false for clean CPU/waiting numbers)")
+            files += f", {base}.alloc.txt"
+        print(f"\n📁 {files}")
+        print("=" * 70)
+
+
+def start_profiling_if_requested(name: str):
+    """
+    Start a ProfileSession that reports at exit, when --profile was given
+
+    For scripts that do their work at module level; removes the flag from
+    sys.argv. Returns the session or None.
+    """
+    if not profile_requested():
+        return None
+    sys.argv.remove(PROFILE_FLAG)
+    session = ProfileSession(name).start()
+    atexit.register(session.stop)
+    return session
+
+
+@contextmanager
+def profile_if_requested(name: str):
+    """Profile the body of the `with` block when --profile was given"""
+    session = start_profiling_if_requested(name)
+    try:
+        yield session
+    finally:
+        if session is not None:
+            session.stop()
@@ -0,0 +1,213 @@
+"""
+Streaming Token Output
+Shared helpers that surface tokens as they arrive from each LLM entry point
+(OpenAI SDK, LangChain, Semantic Kernel, Agent Framework) and measure
+time-to-first-token and tokens/sec
+
+Enable with STREAM_OUTPUT=true in .env
+"""
+
+import os
+import re
+import time
+import asyncio
+from toonVsJson import count_tokens
+
+
+def streaming_enabled() -> bool:
+    """Whether STREAM_OUTPUT is switched on"""
+    return os.getenv("STREAM_OUTPUT", "false").lower() == "true"
+
+
+def print_token(text: str):
+    """Default token sink: write straight to the console"""
+    print(text, end="", flush=True)
+
+
+class StreamMetrics:
+    """Time-to-first-token and throughput for one streamed response"""
+
+    def __init__(self, model: str = "gpt-4"):
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.text = ""
+        # Token usage reported by the service, when the stream carries it
+        self.usage = None
+
+    def on_chunk(self, text: str):
+        """Record an incoming chunk of text"""
+        if text and self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.text += text
+
+    def finish(self):
+        """Mark the stream as complete"""
+        self.finished_at = time.perf_counter()
+        return self
+
+    @property
+    def ttft(self) -> float:
+        """Seconds from request to first token"""
+        if self.first_token_at is None:
+            return 0.0
+        return self.first_token_at - self.started
+
+    @property
+    def tokens(self) -> int:
+        """Completion tokens received"""
+        return count_tokens(self.text, self.model) if self.text else 0
+
+    @property
+    def tokens_per_sec(self) -> float:
+        """Generation rate after the first token"""
+        if self.first_token_at is None or self.finished_at is None:
+            return 0.0
+        elapsed = self.finished_at - self.first_token_at
+        return self.tokens / elapsed if elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        """One-line summary for console output"""
+        return f"⏱️  TTFT {self.ttft:.2f}s, {self.tokens} tokens at {self.tokens_per_sec:.1f} tokens/s"
+
+
+class ToolCallSniffer:
+    """
+    Detects `TOOL_CALL: name(args)` lines in partial output
+
+    Each complete line is parsed as soon as its newline arrives. With a
+    `dispatch(name, args)` that returns a coroutine (or None to skip the
+    call), the tool runs as a task while the model is still generating;
+    collect the outcomes with `await sniffer.results()`. Repeated calls
+    (also from a retried stream) are dispatched once.
+    """
+
+    PATTERN = re.compile(r"TOOL_CALL:\s*([\w\-]+)\((.*)\)")
+
+    def __init__(self, on_tool_call=None, dispatch=None):
+        self.on_tool_call = on_tool_call
+        self.dispatch = dispatch
+        self.buffer = ""
+        self.calls = []
+        self.pending = []
+
+    def feed(self, text: str):
+        """Consume a chunk of streamed text"""
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            self._parse(line)
+
+    def close(self):
+        """Parse any trailing line without a newline"""
+        if self.buffer:
+            self._parse(self.buffer)
+            self.buffer = ""
+        return self.calls
+
+    def _parse(self, line: str):
+        match = self.PATTERN.search(line)
+        if not match:
+            return
+        name, raw_args = match.groups()
+        args = dict(re.findall(r"(\w+)\s*=\s*([^,]+)", raw_args))
+        call = (name, {k: v.strip() for k, v in args.items()})
+        if call in self.calls:
+            return
+        self.calls.append(call)
+        if self.on_tool_call:
+            self.on_tool_call(*call)
+        if self.dispatch:
+            coroutine = self.dispatch(*call)
+            if coroutine is not None:
+                self.pending.append((call, asyncio.ensure_future(coroutine)))
+
+    async def results(self) -> list:
+        """((name, args), result or exception) for every dispatched call"""
+        outcomes = await asyncio.gather(*(task for _, task in self.pending), return_exceptions=True)
+        return [(call, outcome) for (call, _), outcome in zip(self.pending, outcomes)]
+
+
+def stream_chat_completion(client, on_token=print_token, include_usage: bool = True, **kwargs):
+    """
+    Stream an OpenAI/Azure OpenAI chat completion
+
+    Returns (text, metrics, usage). `usage` is only reported when
+    include_usage is set (needs API version 2024-09-01-preview or later).
+    """
+    metrics = StreamMetrics(kwargs.get("model", "gpt-4"))
+    if include_usage:
+        kwargs["stream_options"] = {"include_usage": True}
+    usage = None
+    for chunk in client.chat.completions.create(stream=True, **kwargs):
+        if getattr(chunk, "usage", None):
+            usage = metrics.usage = chunk.usage
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content or ""
+        metrics.on_chunk(text)
+        if text and on_token:
+            on_token(text)
+    return metrics.text, metrics.finish(), usage
+
+
+async def astream_langchain(llm, messages: list, on_token=print_token, sniffer: ToolCallSniffer = None):
+    """
+    Stream a LangChain chat model
+
+    Returns (message, metrics) where message is the aggregated chunk, so
+    `.content` and `.usage_metadata` work as with `ainvoke`.
+    """
+    metrics = StreamMetrics(getattr(llm, "deployment_name", None) or "gpt-4")
+    full = None
+    async for chunk in llm.astream(messages):
+        full = chunk if full is None else full + chunk
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        metrics.on_chunk(text)
+        if sniffer:
+            sniffer.feed(text)
+        if text and on_token:
+            on_token(text)
+    if sniffer:
+        sniffer.close()
+    return full, metrics.finish()
+
+
+async def astream_semantic_kernel(service, chat_history, settings, kernel, on_token=print_token):
+    """
+    Stream a Semantic Kernel chat completion (auto function calling still applies)
+
+    Returns (text, metrics); metrics.usage holds the usage of the last chunk
+    that reported any.
+    """
+    metrics = StreamMetrics(getattr(service, "ai_model_id", None) or "gpt-4")
+    async for messages in service.get_streaming_chat_message_contents(
+        chat_history=chat_history,
+        settings=settings,
+        kernel=kernel
+    ):
+        for message in messages or []:
+            usage = (getattr(message, "metadata", None) or {}).get("usage")
+            if usage:
+                metrics.usage = usage
+            text = str(message) if message is not None else ""
+            metrics.on_chunk(text)
+            if text and on_token:
+                on_token(text)
+    return metrics.text, metrics.finish()
+
+
+async def astream_agent(agent, messages, on_token=print_token):
+    """
+    Stream an Agent Framework agent run
+
+    Returns (text, metrics).
+    """
+    metrics = StreamMetrics()
+    async for update in agent.run_stream(messages):
+        text = getattr(update, "text", "") or ""
+        metrics.on_chunk(text)
+        if text and on_token:
+            on_token(text)
+    return metrics.text, metrics.finish()
@@ -0,0 +1,258 @@
+"""
+Local vs Server Token Count Calibration
+Learns the chat-template overhead the server adds on top of tiktoken counts
+(per message, per role, per tool schema) so prompts can be budgeted offline
+"""
+
+import os
+import json
+from dotenv import load_dotenv
+from toonVsJson import count_tokens
+
+# Load environment variables
+load_dotenv()
+
+
+# Feature layout of one calibration sample. "user" is the reference role, so
+# the other role entries are deltas on top of the per-message overhead.
+FEATURES = ["base", "per_message", "system", "assistant", "tool", "per_tool", "tool_schema"]
+
+# Starting point before any data is recorded (OpenAI cookbook values:
+# 3 tokens per message, 3 tokens to prime the reply, schemas counted as-is)
+DEFAULT_COEFFICIENTS = {
+    "base": 3.0,
+    "per_message": 3.0,
+    "system": 0.0,
+    "assistant": 0.0,
+    "tool": 0.0,
+    "per_tool": 0.0,
+    "tool_schema": 1.0
+}
+
+# How strongly the fit is pulled towards the defaults
+RIDGE_STRENGTH = 0.5
+# Relative residual below which a feature counts as a combination of earlier ones
+COLLINEAR_TOLERANCE = 1e-6
+MAX_SAMPLES_PER_MODEL = 500
+
+
+def message_text(message) -> str:
+    """Extract the text the tokenizer sees from one chat message"""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    parts = [content]
+    if message.get("name"):
+        parts.append(message["name"])
+    if message.get("tool_calls"):
+        parts.append(json.dumps(message["tool_calls"], separators=(",", ":")))
+    return "".join(parts)
+
+
+def content_tokens(messages: list, model: str) -> int:
+    """tiktoken count of the message contents alone"""
+    return sum(count_tokens(message_text(m), model) for m in messages)
+
+
+def extract_features(messages: list, model: str, tools: list = None) -> list:
+    """Build the overhead feature vector for one prompt"""
+    roles = [m.get("role", "user") for m in messages]
+    tools = tools or []
+    schema_tokens = count_tokens(json.dumps(tools, separators=(",", ":")), model) if tools else 0
+    return [
+        1,
+        len(messages),
+        roles.count("system") + roles.count("developer"),
+        roles.count("assistant"),
+        roles.count("tool"),
+        len(tools),
+        schema_tokens
+    ]
+
+
+def solve_linear_system(matrix: list, vector: list) -> list:
+    """Solve A x = b with Gaussian elimination and partial pivoting"""
+    n = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            raise ValueError("Calibration system is singular")
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(col + 1, n):
+            factor = rows[r][col] / rows[col][col]
+            for c in range(col, n + 1):
+                rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        total = rows[r][n] - sum(rows[r][c] * solution[c] for c in range(r + 1, n))
+        solution[r] = total / rows[r][r]
+    return solution
+
+
+def identifiable_features(samples: list) -> list:
+    """
+    Indexes of the features the samples can tell apart, in FEATURES order
+
+    A feature that is always zero, or a linear combination of earlier ones
+    (per_message when every sample has one message, which moves in lockstep
+    with base), carries no information of its own and keeps its default.
+    """
+    basis, chosen = [], []
+    for index in range(len(FEATURES)):
+        column = [float(sample["features"][index]) for sample in samples]
+        norm = sum(v * v for v in column) ** 0.5
+        if norm == 0:
+            continue
+        for vector in basis:
+            projection = sum(a * b for a, b in zip(column, vector))
+            column = [a - projection * b for a, b in zip(column, vector)]
+        residual = sum(v * v for v in column) ** 0.5
+        if residual > COLLINEAR_TOLERANCE * norm:
+            basis.append([v / residual for v in column])
+            chosen.append(index)
+    return chosen
+
+
+class TokenCalibration:
+    """Per-model overhead coefficients learned from recorded responses"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("TOKEN_CALIBRATION_PATH", "token_calibration.json")
+        self.models = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.models = json.load(f)
+
+    def save(self):
+        """Persist samples and fitted coefficients"""
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.models, f, indent=2)
+
+    def record_sample(self, messages: list, prompt_tokens: int, model: str, tools: list = None):
+        """Record one (prompt, server prompt_tokens) observation"""
+        entry = self.models.setdefault(model, {"samples": [], "coefficients": dict(DEFAULT_COEFFICIENTS)})
+        overhead = prompt_tokens - content_tokens(messages, model)
+        entry["samples"].append({"features": extract_features(messages, model, tools), "overhead": overhead})
+        del entry["samples"][:-MAX_SAMPLES_PER_MODEL]
+
+    def record_response(self, messages: list, response, model: str, tools: list = None):
+        """Record a chat completion response (uses response.usage.prompt_tokens)"""
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "prompt_tokens", None):
+            self.record_sample(messages, usage.prompt_tokens, model, tools)
+
+    def fit(self, model: str) -> dict:
+        """
+        Ridge least squares fit of the overhead, pulled towards the defaults
+
+        Only identifiable features are fitted; the rest keep their defaults
+        and their contribution is taken off the overhead first. With only
+        single user-message samples that leaves base (plus tool_schema when
+        tools vary), and "fitted" in the entry lists what the data supports.
+        """
+        entry = self.models.get(model)
+        if not entry or not entry["samples"]:
+            return dict(DEFAULT_COEFFICIENTS)
+
+        prior = [DEFAULT_COEFFICIENTS[name] for name in FEATURES]
+        free = identifiable_features(entry["samples"])
+        fixed = [i for i in range(len(FEATURES)) if i not in free]
+        size = len(free)
+        normal = [[RIDGE_STRENGTH if i == j else 0.0 for j in range(size)] for i in range(size)]
+        rhs = [RIDGE_STRENGTH * prior[f] for f in free]
+        for sample in entry["samples"]:
+            x = sample["features"]
+            y = sample["overhead"] - sum(prior[f] * x[f] for f in fixed)
+            for i in range(size):
+                rhs[i] += x[free[i]] * y
+                for j in range(size):
+                    normal[i][j] += x[free[i]] * x[free[j]]
+
+        coefficients = list(prior)
+        for f, value in zip(free, solve_linear_system(normal, rhs) if free else []):
+            coefficients[f] = value
+        entry["coefficients"] = {name: round(value, 4) for name, value in zip(FEATURES, coefficients)}
+        entry["fitted"] = [FEATURES[f] for f in free]
+        return entry["coefficients"]
+
+    def fit_all(self):
+        """Refit every model that has samples"""
+        for model in self.models:
+            self.fit(model)
+
+    def coefficients(self, model: str) -> dict:
+        """Fitted coefficients for a model (defaults if never calibrated)"""
+        entry = self.models.get(model)
+        return entry["coefficients"] if entry else dict(DEFAULT_COEFFICIENTS)
+
+    def estimate_prompt_tokens(self, messages: list, model: str = "gpt-4", tools: list = None) -> int:
+        """Estimate server-side prompt_tokens without calling the API"""
+        coefficients = self.coefficients(model)
+        features = extract_features(messages, model, tools)
+        overhead = sum(coefficients[name] * value for name, value in zip(FEATURES, features))
+        # Schema tokens are already scaled by the tool_schema coefficient
+        return max(0, round(content_tokens(messages, model) + overhead))
+
+    def error_report(self, model: str) -> dict:
+        """Mean absolute error of the current fit vs raw tiktoken on recorded samples"""
+        entry = self.models.get(model)
+        if not entry or not entry["samples"]:
+            return {"samples": 0, "calibrated_mae": 0.0, "uncalibrated_mae": 0.0}
+        coefficients = entry["coefficients"]
+        calibrated, uncalibrated = [], []
+        for sample in entry["samples"]:
+            predicted = sum(coefficients[n] * v for n, v in zip(FEATURES, sample["features"]))
+            calibrated.append(abs(sample["overhead"] - predicted))
+            uncalibrated.append(abs(sample["overhead"]))
+        return {
+            "samples": len(entry["samples"]),
+            "calibrated_mae": sum(calibrated) / len(calibrated),
+            "uncalibrated_mae": sum(uncalibrated) / len(uncalibrated)
+        }
+
+
+_default_calibration = None
+
+
+def get_calibration() -> TokenCalibration:
+    """Shared calibration table loaded from TOKEN_CALIBRATION_PATH"""
+    global _default_calibration
+    if _default_calibration is None:
+        _default_calibration = TokenCalibration()
+    return _default_calibration
+
+
+def estimate_prompt_tokens(messages: list, model: str = "gpt-4", tools: list = None) -> int:
+    """Estimate server-side prompt_tokens for a chat request using the shared calibration"""
+    return get_calibration().estimate_prompt_tokens(messages, model, tools)
+
+
+def main():
+    """Show the calibration table and how well it predicts recorded samples"""
+    calibration = get_calibration()
+    print("\n" + "=" * 80)
+    print("  Token Count Calibration")
+    print("=" * 80)
+
+    if not calibration.models:
+        print(f"\n⚠️  No samples in {calibration.path} yet")
+        print("   Run toonAbBenchmark.py (or toonVsJson.py) against the API to record some")
+        return
+
+    calibration.fit_all()
+    calibration.save()
+    for model in calibration.models:
+        coefficients = calibration.coefficients(model)
+        report = calibration.error_report(model)
+        print(f"\n📐 {model} ({report['samples']} samples)")
+        fitted = calibration.models[model].get("fitted", [])
+        for name in FEATURES:
+            source = "fitted" if name in fitted else "default (not identifiable from samples)"
+            print(f"   {name:<12} {coefficients[name]:>8.2f}  {source}")
+        print(f"   Error vs server: {report['calibrated_mae']:.2f} tokens "
+              f"(raw tiktoken: {report['uncalibrated_mae']:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Persistent Token Count Cache
+On-disk, content-addressed cache of (encoding, text hash) -> token count, so
+re-scoring unchanged payloads costs a hash instead of a tokenization
+
+The cache is one fixed-size memory-mapped file of checksummed 32-byte slots.
+Readers never lock: a slot whose checksum doesn't match (empty, or torn by a
+concurrent writer) is simply a miss. Writers serialize on a sidecar lock
+file (fcntl on Linux/macOS, msvcrt on Windows). When a key's probe window
+is full the oldest-written entry is evicted, so the file never grows.
+
+Enable for toonVsJson.count_tokens with TOKEN_CACHE_PATH in .env. Cold vs
+warm re-scoring demo:
+    python tokenCountCache.py
+"""
+
+import os
+import sys
+import time
+import zlib
+import mmap
+import struct
+import atexit
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+MAGIC = b"TKC1"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIQ")   # magic, version, reserved, slot count, write clock
+HEADER_SIZE = 64
+SLOT = struct.Struct("<16sIII4x")   # key, token count, write stamp, crc32 of the first 24 bytes
+SLOT_SIZE = SLOT.size
+PROBE_WINDOW = 8
+DEFAULT_SLOTS = 1 << 18             # 8 MB file
+# Shorter texts tokenize faster than they hash and look up
+MIN_CACHED_CHARS = 64
+
+
+def _lock_file(f):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(f):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def content_key(encoding_name: str, text: str) -> bytes:
+    """16-byte content hash of a text under one tokenizer encoding"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(encoding_name.encode())
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8", "surrogatepass"))
+    return digest.digest()
+
+
+class TokenCountCache:
+    """Memory-mapped fixed-slot table shared by every process using the same file"""
+
+    def __init__(self, path: str, slots: int = None):
+        self.path = path
+        slots = int(os.getenv("TOKEN_CACHE_SLOTS", str(DEFAULT_SLOTS))) if slots is None else slots
+        self._thread_lock = threading.Lock()
+        self._lock_handle = open(path + ".lock", "a+b")
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        try:
+            with self._locked():
+                self._file = self._open_table(slots)
+        except Exception:
+            self._lock_handle.close()
+            raise
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        _, _, _, self.slots, _ = HEADER.unpack_from(self._map, 0)
+
+    def _open_table(self, slots: int):
+        """
+        Open the table, initializing it only if the file is missing or empty
+
+        Anything else that is not a cache table of this version is left
+        alone and raises ValueError, so a mistyped TOKEN_CACHE_PATH never
+        overwrites another file.
+        """
+        size = HEADER_SIZE + slots * SLOT_SIZE
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            actual = os.path.getsize(self.path)
+            f = open(self.path, "r+b")
+            magic, version, _, existing, _ = HEADER.unpack(f.read(HEADER.size).ljust(HEADER.size, b"\0"))
+            if magic == MAGIC and version == VERSION and actual == HEADER_SIZE + existing * SLOT_SIZE:
+                return f  # another process's table size wins
+            f.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} token count cache; "
+                             f"point TOKEN_CACHE_PATH at a new or empty file")
+        f = open(self.path, "w+b")
+        f.truncate(size)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, slots, 0))
+        f.flush()
+        return f
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive writer lock: across threads, then across processes"""
+        with self._thread_lock:
+            _lock_file(self._lock_handle)
+            try:
+                yield
+            finally:
+                _unlock_file(self._lock_handle)
+
+    def _probe(self, key: bytes):
+        start = int.from_bytes(key[:8], "little") % self.slots
+        for i in range(PROBE_WINDOW):
+            yield HEADER_SIZE + ((start + i) % self.slots) * SLOT_SIZE
+
+    def _read_slot(self, offset: int):
+        """(key, count, stamp), or None for an empty or torn slot"""
+        raw = self._map[offset:offset + SLOT_SIZE]
+        key, count, stamp, crc = SLOT.unpack(raw)
+        if zlib.crc32(raw[:24]) != crc:
+            return None
+        return key, count, stamp
+
+    def get(self, key: bytes):
+        """Cached token count for `key`, or None"""
+        for offset in self._probe(key):
+            slot = self._read_slot(offset)
+            if slot is not None and slot[0] == key:
+                self.hits += 1
+                return slot[1]
+        self.misses += 1
+        return None
+
+    def put(self, key: bytes, count: int):
+        """Store a count, evicting the oldest entry of the probe window if it is full"""
+        with self._locked():
+            _, _, _, _, clock = HEADER.unpack_from(self._map, 0)
+            clock += 1
+            target, oldest = None, None
+            for offset in self._probe(key):
+                slot = self._read_slot(offset)
+                if slot is None or slot[0] == key:
+                    target = offset
+                    break
+                if oldest is None or slot[2] < oldest[1]:
+                    oldest = (offset, slot[2])
+            if target is None:
+                target = oldest[0]
+                self.evictions += 1
+            body = SLOT.pack(key, count, clock & 0xFFFFFFFF, 0)[:24]
+            self._map[target:target + SLOT_SIZE] = SLOT.pack(key, count, clock & 0xFFFFFFFF, zlib.crc32(body))
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, 0, self.slots, clock)
+            self.writes += 1
+
+    def count(self, encoding, text: str) -> int:
+        """Token count of `text` under a tiktoken encoding, tokenizing only on a miss"""
+        if len(text) < MIN_CACHED_CHARS:
+            return len(encoding.encode(text))
+        key = content_key(encoding.name, text)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        tokens = len(encoding.encode(text))
+        self.put(key, tokens)
+        return tokens
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self) -> str:
+        """One-line summary for console output"""
+        return (f"{self.hits:,} hit(s), {self.misses:,} miss(es) ({self.hit_ratio:.1%} hit ratio), "
+                f"{self.writes:,} write(s), {self.evictions:,} eviction(s), "
+                f"{self.slots:,} slots ({(HEADER_SIZE + self.slots * SLOT_SIZE) / 1e6:.1f} MB) at {self.path}")
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+        self._lock_handle.close()
+
+
+_default_cache = None
+
+
+def get_token_cache():
+    """Shared cache at TOKEN_CACHE_PATH, or None when no path is configured"""
+    global _default_cache
+    path = os.getenv("TOKEN_CACHE_PATH")
+    if _default_cache is None and path:
+        _default_cache = TokenCountCache(path)
+        atexit.register(_default_cache.flush)
+    return _default_cache
+
+
+def main():
+    """Score a corpus cold, then re-score it warm (in this and in a fresh process)"""
+    import json
+    import subprocess
+    import tiktoken
+    from toon_format import encode
+    from toonAbBenchmark import build_payloads
+
+    if len(sys.argv) >= 3 and sys.argv[1] == "warm":
+        # Child process: re-score the corpus against a cache filled by the parent
+        cache = TokenCountCache(sys.argv[2])
+        encoding = tiktoken.get_encoding("cl100k_base")
+        corpus = json.loads(sys.stdin.read())
+        start = time.perf_counter()
+        total = sum(cache.count(encoding, text) for text in corpus)
+        print(json.dumps({"seconds": time.perf_counter() - start, "tokens": total, "hits": cache.hits}))
+        return
+
+    print("\n" + "=" * 70)
+    print("  Persistent Token Count Cache Demo")
+    print("=" * 70)
+
+    payloads = build_payloads(int(os.getenv("TOKEN_CACHE_DEMO_PAYLOADS", "3000")))
+    corpus = [json.dumps(p, indent=2) for p in payloads] + [encode(p) for p in payloads]
+    encoding = tiktoken.get_encoding("cl100k_base")
+    path = os.path.join(tempfile.mkdtemp(), "token_counts.bin")
+    cache = TokenCountCache(path)
+
+    start = time.perf_counter()
+    uncached = sum(len(encoding.encode(text)) for text in corpus)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cold = sum(cache.count(encoding, text) for text in corpus)
+    cold_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm = sum(cache.count(encoding, text) for text in corpus)
+    warm_s = time.perf_counter() - start
+    assert uncached == cold == warm
+    cache.flush()
+
+    child = subprocess.run([sys.executable, __file__, "warm", path], input=json.dumps(corpus),
+                           capture_output=True, text=True, check=True)
+    other = json.loads(child.stdout.strip().splitlines()[-1])
+
+    print(f"\n📚 Corpus: {len(corpus):,} JSON/TOON payloads, {uncached:,} tokens")
+    print(f"{'':26} {'seconds':>9} {'per text':>10}")
+    for label, seconds in (("No cache", baseline), ("Cold cache (fill)", cold_s),
+                           ("Warm cache", warm_s), ("Warm, another process", other["seconds"])):
+        print(f"{label:26} {seconds:>9.3f} {seconds / len(corpus) * 1e6:>8.1f}µs")
+    cacheable = sum(len(text) >= MIN_CACHED_CHARS for text in corpus)
+    print(f"\n⚡ Re-scoring speedup: {baseline / warm_s:.1f}x "
+          f"(the other process hit {other['hits']:,} of {cacheable:,} cacheable texts)")
+    print(f"🗄️  {cache.report()}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+TOON vs JSON A/B Token Benchmark
+Sends N payloads in both formats concurrently to Azure OpenAI and measures
+real prompt/completion tokens and latency, so savings claims come from data
+"""
+
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import statistics
+from dataclasses import dataclass, asdict
+from typing import Optional
+from dotenv import load_dotenv
+from openai import AsyncAzureOpenAI
+from toon_format import encode
+from toonVsJson import EXAMPLES, count_tokens
+from tokenCalibration import get_calibration
+from requestScheduler import get_scheduler, estimate_request_tokens, llm_client_options, BATCH
+
+# Load environment variables
+load_dotenv()
+
+
+# Two-sided 95% t critical values for small samples (df -> t)
+T_CRITICAL_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+    8: 2.306, 9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145,
+    15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086,
+    21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060, 26: 2.056,
+    27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042
+}
+
+FIRST_NAMES = ["John", "Jane", "Mike", "Sarah", "Priya", "Wei", "Olga", "Carlos", "Aisha", "Tom"]
+LAST_NAMES = ["Doe", "Smith", "Johnson", "Williams", "Sharma", "Chen", "Ivanova", "Garcia", "Khan", "Brown"]
+DEPARTMENTS = ["Engineering", "Marketing", "HR", "Sales", "Finance", "Support"]
+
+
+@dataclass
+class Measurement:
+    """One API call for one payload in one format"""
+    payload_id: int
+    fmt: str
+    local_tokens: int
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_s: float = 0.0
+    error: Optional[str] = None
+
+
+def build_payloads(n: int, seed: int = 42) -> list:
+    """Generate N realistic payloads based on the EXAMPLES shapes"""
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(n):
+        shape = i % 3
+        if shape == 0:
+            data = dict(EXAMPLES["simple"])
+            data["name"] = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            data["age"] = rng.randint(18, 70)
+        elif shape == 1:
+            data = json.loads(json.dumps(EXAMPLES["medium"]))
+            data["products"] = [
+                {"id": p, "name": f"Product {p}", "price": round(rng.uniform(5, 1500), 2)}
+                for p in range(1, rng.randint(2, 12) + 1)
+            ]
+        else:
+            data = json.loads(json.dumps(EXAMPLES["complex"]))
+            employees = [
+                {
+                    "emp_id": f"E{e:03d}",
+                    "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    "dept": rng.choice(DEPARTMENTS),
+                    "salary": rng.randrange(50000, 160000, 500)
+                }
+                for e in range(1, rng.randint(3, 25) + 1)
+            ]
+            data["data"]["employees"] = employees
+            data["data"]["total_count"] = len(employees)
+        payloads.append(data)
+    return payloads
+
+
+def build_prompts(data) -> dict:
+    """Build the JSON and TOON prompts exactly as demo_azure_openai does"""
+    json_str = json.dumps(data, indent=2)
+    toon_str = encode(data)
+    return {
+        "json": f"Here is data in JSON:\n\n{json_str}\n\nAcknowledge receipt.",
+        "toon": f"Here is data in TOON:\n\n{toon_str}\n\nAcknowledge receipt.",
+    }
+
+
+def mean_ci(values: list, confidence: float = 0.95) -> tuple:
+    """Return (mean, half_width) of a confidence interval for the mean"""
+    n = len(values)
+    if n == 0:
+        return 0.0, 0.0
+    mean = statistics.fmean(values)
+    if n == 1:
+        return mean, 0.0
+    if confidence != 0.95:
+        raise ValueError("Only 95% confidence intervals are supported")
+    t = T_CRITICAL_95.get(n - 1, 1.96)
+    return mean, t * statistics.stdev(values) / math.sqrt(n)
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def measure_call(client, deployment, semaphore, payload_id, fmt, prompt, max_tokens,
+                       calibration=None) -> Measurement:
+    """Send one prompt and record server usage and latency"""
+    messages = [{"role": "user", "content": prompt}]
+    measurement = Measurement(
+        payload_id=payload_id,
+        fmt=fmt,
+        local_tokens=count_tokens(prompt)
+    )
+    scheduler = get_scheduler()
+    tokens = estimate_request_tokens(messages, max_tokens, deployment)
+    start = time.perf_counter()
+
+    async def send():
+        # Latency covers the (last) API call only, not time queued for budget
+        nonlocal start
+        start = time.perf_counter()
+        return await client.chat.completions.create(
+            model=deployment,
+            messages=messages,
+            max_tokens=max_tokens
+        )
+
+    async with semaphore:
+        try:
+            response = await scheduler.asubmit(send, tokens, BATCH)
+            measurement.prompt_tokens = response.usage.prompt_tokens
+            measurement.completion_tokens = response.usage.completion_tokens
+            if calibration is not None:
+                calibration.record_response(messages, response, deployment)
+        except Exception as e:
+            measurement.error = str(e)
+        measurement.latency_s = time.perf_counter() - start
+    return measurement
+
+
+async def run_ab_benchmark(samples: int = 20, concurrency: int = 4, max_tokens: int = 50,
+                           seed: int = 42, client=None, deployment: str = None,
+                           calibration=None) -> list:
+    """
+    Send every payload in both formats concurrently (bounded by `concurrency`)
+
+    Format order is shuffled per payload so neither format systematically
+    goes first and benefits from a warm connection. Successful responses are
+    recorded into `calibration` (a TokenCalibration) when one is given.
+    """
+    own_client = client is None
+    if own_client:
+        client = AsyncAzureOpenAI(
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-10-21"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            **llm_client_options(async_client=True)
+        )
+    deployment = deployment or os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
+    semaphore = asyncio.Semaphore(concurrency)
+    rng = random.Random(seed)
+
+    tasks = []
+    for payload_id, data in enumerate(build_payloads(samples, seed)):
+        prompts = list(build_prompts(data).items())
+        rng.shuffle(prompts)
+        for fmt, prompt in prompts:
+            tasks.append(measure_call(client, deployment, semaphore, payload_id, fmt,
+                                      prompt, max_tokens, calibration))
+
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        if own_client:
+            await client.close()
+
+
+def summarize(measurements: list) -> dict:
+    """Pair JSON/TOON measurements per payload and compute intervals"""
+    by_payload = {}
+    for m in measurements:
+        if m.error is None:
+            by_payload.setdefault(m.payload_id, {})[m.fmt] = m
+    pairs = [p for p in by_payload.values() if "json" in p and "toon" in p]
+
+    token_deltas = [p["json"].prompt_tokens - p["toon"].prompt_tokens for p in pairs]
+    savings_pct = [
+        (p["json"].prompt_tokens - p["toon"].prompt_tokens) / p["json"].prompt_tokens * 100
+        for p in pairs if p["json"].prompt_tokens
+    ]
+    summary = {
+        "pairs": len(pairs),
+        "errors": sum(1 for m in measurements if m.error is not None),
+        "token_savings": mean_ci(token_deltas),
+        "savings_pct": mean_ci(savings_pct),
+        "formats": {}
+    }
+    for fmt in ("json", "toon"):
+        ok = [p[fmt] for p in pairs]
+        latencies = [m.latency_s for m in ok]
+        summary["formats"][fmt] = {
+            "prompt_tokens": mean_ci([m.prompt_tokens for m in ok]),
+            "completion_tokens": mean_ci([m.completion_tokens for m in ok]),
+            "latency_s": mean_ci(latencies),
+            "latency_p95_s": percentile(latencies, 95),
+            # Server count minus local tiktoken estimate (chat template overhead)
+            "server_minus_local": mean_ci([m.prompt_tokens - m.local_tokens for m in ok]),
+        }
+    return summary
+
+
+def print_report(summary: dict):
+    """Print the A/B summary"""
+    def fmt_ci(value, digits=1):
+        mean, half = value
+        return f"{mean:.{digits}f} ± {half:.{digits}f}"
+
+    print(f"\n📊 A/B Results ({summary['pairs']} payload pairs, {summary['errors']} errors, 95% CI):")
+    for fmt, stats in summary["formats"].items():
+        print(f"   {fmt.upper()}:")
+        print(f"      Prompt tokens:     {fmt_ci(stats['prompt_tokens'])}")
+        print(f"      Completion tokens: {fmt_ci(stats['completion_tokens'])}")
+        print(f"      Latency:           {fmt_ci(stats['latency_s'], 3)}s (p95 {stats['latency_p95_s']:.3f}s)")
+        print(f"      Server - tiktoken: {fmt_ci(stats['server_minus_local'])} tokens")
+    print(f"   Savings: {fmt_ci(summary['token_savings'])} tokens/request "
+          f"({fmt_ci(summary['savings_pct'])}%)")
+
+
+def save_measurements(measurements: list, path: str):
+    """Persist raw measurements as JSON lines for later analysis"""
+    with open(path, "w", encoding="utf-8") as f:
+        for m in measurements:
+            f.write(json.dumps(asdict(m)) + "\n")
+
+
+def run_from_env():
+    """
+    Run the A/B benchmark with settings from .env, update the token
+    calibration and save raw measurements to TOON_AB_OUTPUT when set
+
+    Returns the summary, or None when nothing was measured.
+    """
+    if not os.getenv("AZURE_OPENAI_API_KEY"):
+        print("\n⚠️  Azure OpenAI not configured (skipping A/B benchmark)")
+        return None
+
+    samples = int(os.getenv("TOON_AB_SAMPLES", "20"))
+    concurrency = int(os.getenv("TOON_AB_CONCURRENCY", "4"))
+    print(f"\n⚠️  Making {samples * 2} API calls ({concurrency} concurrent)...")
+
+    calibration = get_calibration()
+    try:
+        measurements = asyncio.run(run_ab_benchmark(samples=samples, concurrency=concurrency,
+                                                    calibration=calibration))
+    except Exception as e:
+        print(f"\n⚠️  A/B benchmark error: {e}")
+        return None
+    summary = summarize(measurements)
+    print_report(summary)
+
+    # Recorded responses refine the offline prompt token estimates
+    calibration.fit_all()
+    calibration.save()
+    print(f"\n📐 Token calibration updated in {calibration.path}")
+
+    output_path = os.getenv("TOON_AB_OUTPUT")
+    if output_path:
+        save_measurements(measurements, output_path)
+        print(f"\n💾 Measurements saved to {output_path}")
+    return summary if summary["pairs"] else None
+
+
+def main():
+    """Run the A/B benchmark with settings from .env"""
+    run_from_env()
+
+
+if __name__ == "__main__":
+    main()
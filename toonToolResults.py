@@ -0,0 +1,117 @@
+"""
+TOON-Encoded MCP Tool Results
+Middleware that re-encodes JSON tool results (work-item lists, fields) as
+TOON and drops unused fields before they are fed back to the model
+
+Works as a Semantic Kernel function invocation filter, so it covers both
+the auto function calling loop (mcpADOagent.py) and direct `fn.invoke`
+calls (mcpADOAgentLangChain.py).
+"""
+
+import os
+import json
+from toon_format import encode
+from toonVsJson import count_tokens
+from mcpTools import result_text
+
+
+# Azure DevOps fields that cost tokens but never help the model
+DEFAULT_DROP_FIELDS = {
+    "_links",
+    "url",
+    "commentVersionRef",
+    "System.Watermark",
+    "System.CommentCount",
+    "System.AuthorizedDate",
+    "System.RevisedDate",
+    "imageUrl",
+    "descriptor",
+    "avatar"
+}
+
+
+def drop_fields(data, fields: set):
+    """Recursively remove keys in `fields` from dicts"""
+    if isinstance(data, dict):
+        return {k: drop_fields(v, fields) for k, v in data.items() if k not in fields}
+    if isinstance(data, list):
+        return [drop_fields(item, fields) for item in data]
+    return data
+
+
+def is_structured(data) -> bool:
+    """Lists, work items with `fields`, and wrappers like {"value": [...]}"""
+    if isinstance(data, list):
+        return len(data) > 0
+    if isinstance(data, dict):
+        return any(isinstance(v, (list, dict)) for v in data.values())
+    return False
+
+
+class ToolResultTransformer:
+    """Re-encodes structured tool results as TOON and tracks token savings"""
+
+    def __init__(self, drop: set = None, model: str = "gpt-4"):
+        if drop is None:
+            configured = os.getenv("TOON_TOOL_DROP_FIELDS")
+            drop = {f.strip() for f in configured.split(",") if f.strip()} if configured else DEFAULT_DROP_FIELDS
+        self.drop = set(drop)
+        self.model = model
+        self.calls = []
+
+    def transform(self, tool_name: str, text: str) -> str:
+        """Return the TOON version of `text` when it is smaller, else `text`"""
+        try:
+            data = json.loads(text)
+        except (ValueError, TypeError):
+            return text
+        if not is_structured(data):
+            return text
+
+        encoded = encode(drop_fields(data, self.drop))
+        original_tokens = count_tokens(text, self.model)
+        encoded_tokens = count_tokens(encoded, self.model)
+        if encoded_tokens >= original_tokens:
+            return text
+
+        self.calls.append({"tool": tool_name, "json_tokens": original_tokens, "toon_tokens": encoded_tokens})
+        return encoded
+
+    @property
+    def tokens_saved(self) -> int:
+        """Total tokens removed from tool round trips so far"""
+        return sum(c["json_tokens"] - c["toon_tokens"] for c in self.calls)
+
+    def report(self) -> str:
+        """One-line summary for console output"""
+        if not self.calls:
+            return "no structured tool results transformed"
+        before = sum(c["json_tokens"] for c in self.calls)
+        return (f"{len(self.calls)} tool result(s) TOON-encoded, {before:,} -> {before - self.tokens_saved:,} "
+                f"tokens ({self.tokens_saved / before * 100:.1f}% saved)")
+
+
+def register_toon_result_filter(kernel, transformer: ToolResultTransformer, plugin_name: str = "azure_devops"):
+    """Install the transformer as a function invocation filter on `kernel`"""
+    from semantic_kernel.filters import FilterTypes
+    from semantic_kernel.functions import FunctionResult
+
+    async def toon_result_filter(context, next):
+        await next(context)
+        if context.function.plugin_name != plugin_name or context.result is None:
+            return
+        if context.result.value is None:
+            return
+        text = result_text(context.result.value)
+        encoded = transformer.transform(context.function.name, text)
+        if encoded != text:
+            saved = transformer.calls[-1]["json_tokens"] - transformer.calls[-1]["toon_tokens"]
+            print(f"   🎨 {context.function.name}: result TOON-encoded ({saved} tokens saved)")
+            context.result = FunctionResult(
+                function=context.function.metadata,
+                value=encoded,
+                metadata=context.result.metadata
+            )
+
+    kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, toon_result_filter)
+    return toon_result_filter
@@ -5,10 +5,14 @@ Single file demonstrating format conversion and token analysis with Azure OpenAI
 
 import os
 import json
+import time
 import tiktoken
 from dotenv import load_dotenv
 from openai import AzureOpenAI
 from toon_format import encode, decode
+from requestScheduler import llm_client_options
+from tokenCountCache import get_token_cache
+from scriptProfiler import profile_if_requested
 
 # Load environment variables
 load_dotenv()
@@ -57,11 +61,14 @@ EXAMPLES = {
 
 
 def count_tokens(text: str, model: str = "gpt-4") -> int:
-    """Count tokens using tiktoken"""
+    """Count tokens using tiktoken (through the on-disk cache when TOKEN_CACHE_PATH is set)"""
     try:
         encoding = tiktoken.encoding_for_model(model)
     except KeyError:
         encoding = tiktoken.get_encoding("cl100k_base")
+    cache = get_token_cache()
+    if cache is not None:
+        return cache.count(encoding, text)
     return len(encoding.encode(text))
 
 
@@ -103,6 +110,43 @@ def demo_conversion():
         print(f"   Round-trip: {'✅ Success' if data == decoded else '❌ Failed'}")
 
 
+def chat_usage(client, deployment: str, prompt: str, max_tokens: int = 50):
+    """Send one prompt and return its usage, None if the server reported none (streams tokens when STREAM_OUTPUT=true)"""
+    messages = [{"role": "user", "content": prompt}]
+    
+    # Measurement calls queue behind interactive prompts in the shared scheduler
+    from requestScheduler import get_scheduler, estimate_request_tokens, BATCH
+    scheduler = get_scheduler()
+    tokens = estimate_request_tokens(messages, max_tokens, deployment)
+    
+    from streamingOutput import streaming_enabled, stream_chat_completion
+    if not streaming_enabled():
+        response = scheduler.submit(
+            lambda: client.chat.completions.create(
+                model=deployment,
+                messages=messages,
+                max_tokens=max_tokens
+            ),
+            tokens,
+            BATCH
+        )
+        return response.usage
+    
+    print("   ", end="")
+    _, metrics, usage = scheduler.submit(
+        lambda: stream_chat_completion(
+            client,
+            model=deployment,
+            messages=messages,
+            max_tokens=max_tokens
+        ),
+        tokens,
+        BATCH
+    )
+    print(f"\n   {metrics.report()}")
+    return usage
+
+
 def demo_azure_openai():
     """Demonstrate with Azure OpenAI API"""
     print("\n" + "=" * 80)
@@ -118,8 +162,10 @@ def demo_azure_openai():
         # Setup client
         client = AzureOpenAI(
             api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
+            # Streamed usage (stream_options) needs 2024-09-01-preview or later
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-10-21"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            **llm_client_options()
         )
         
         deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
@@ -136,23 +182,32 @@ def demo_azure_openai():
         
         # Call API with JSON
         print("📤 Calling with JSON...")
-        json_response = client.chat.completions.create(
-            model=deployment,
-            messages=[{"role": "user", "content": json_prompt}],
-            max_tokens=50
-        )
+        start = time.perf_counter()
+        json_usage = chat_usage(client, deployment, json_prompt)
+        json_latency = time.perf_counter() - start
         
         # Call API with TOON
         print("📤 Calling with TOON...")
-        toon_response = client.chat.completions.create(
-            model=deployment,
-            messages=[{"role": "user", "content": toon_prompt}],
-            max_tokens=50
-        )
+        start = time.perf_counter()
+        toon_usage = chat_usage(client, deployment, toon_prompt)
+        toon_latency = time.perf_counter() - start
+        
+        if json_usage is None or toon_usage is None:
+            print("\n⚠️  The API returned no token usage (streamed usage needs "
+                  "AZURE_OPENAI_API_VERSION 2024-09-01-preview or later)")
+            return
+        
+        # Record server counts so offline estimates can be calibrated
+        from tokenCalibration import get_calibration
+        calibration = get_calibration()
+        calibration.record_sample([{"role": "user", "content": json_prompt}], json_usage.prompt_tokens, deployment)
+        calibration.record_sample([{"role": "user", "content": toon_prompt}], toon_usage.prompt_tokens, deployment)
+        calibration.fit(deployment)
+        calibration.save()
         
         # Show results
-        json_tokens = json_response.usage.prompt_tokens
-        toon_tokens = toon_response.usage.prompt_tokens
+        json_tokens = json_usage.prompt_tokens
+        toon_tokens = toon_usage.prompt_tokens
         savings = json_tokens - toon_tokens
         savings_pct = (savings / json_tokens) * 100
         
@@ -161,10 +216,14 @@ def demo_azure_openai():
         print(f"   TOON: {toon_tokens} tokens")
         print(f"   Savings: {savings} tokens ({savings_pct:.1f}%)")
         
-        print(f"\n💰 Cost Impact (at $30/1M tokens):")
-        for scale in [1000, 10000, 100000]:
-            cost_saved = (savings * scale / 1_000_000) * 30
-            print(f"   {scale:,} requests: ${cost_saved:.2f} saved")
+        # Throughput, queueing and cost at load for this deployment's limits and pricing
+        from capacityPlanner import TokenDistribution, plan
+        print("\n📐 Capacity plan from these two calls (one sample per format; "
+              "run toonAbBenchmark.py for real percentiles)")
+        plan({
+            "json": TokenDistribution("json", [json_tokens], [json_usage.completion_tokens], [json_latency]),
+            "toon": TokenDistribution("toon", [toon_tokens], [toon_usage.completion_tokens], [toon_latency])
+        })
         
         print("\n✅ Azure OpenAI test complete!")
         
@@ -173,6 +232,16 @@ def demo_azure_openai():
         print("   Check your .env configuration")
 
 
+def demo_ab_benchmark():
+    """Measure JSON vs TOON savings at volume with concurrent A/B calls"""
+    print("\n" + "=" * 80)
+    print("  A/B Token Measurement (live API)")
+    print("=" * 80)
+    
+    from toonAbBenchmark import run_from_env
+    return run_from_env()
+
+
 def main():
     """Main demo"""
     print("\n" + "=" * 80)
@@ -183,11 +252,17 @@ def main():
     # Run demos
     demo_conversion()
     demo_azure_openai()
+    measured = demo_ab_benchmark()
     
     # Summary
     print("\n" + "=" * 80)
     print("✨ Summary:")
-    print("   • TOON reduces tokens by 20-60% vs JSON")
+    if measured:
+        mean, half = measured["savings_pct"]
+        print(f"   • TOON reduced prompt tokens by {mean:.1f}% ± {half:.1f}% vs JSON "
+              f"(measured over {measured['pairs']} payloads, 95% CI)")
+    else:
+        print("   • TOON reduces tokens by 20-60% vs JSON")
     print("   • Best for tabular/uniform data structures")
     print("   • Perfect round-trip conversion (lossless)")
     print("   • Direct cost savings on LLM API calls")
@@ -195,4 +270,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    with profile_if_requested("toonVsJson"):
+        main()
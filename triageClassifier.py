@@ -0,0 +1,145 @@
+"""
+Structured Ticket Triage
+Priority, owning team and effort for a support ticket from ONE structured
+LLM call (JSON schema response format) instead of three free-text agents
+plus an orchestrator
+
+Used by multiAgentOpenAI.py (Assistants) and multiAgentAzure.py (Azure AI
+Agents); `triage_ticket` does the same with a plain chat completion.
+"""
+
+import os
+import json
+from enum import Enum
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class Priority(str, Enum):
+    HIGH = "High"
+    MEDIUM = "Medium"
+    LOW = "Low"
+
+
+class Team(str, Enum):
+    FRONTEND = "Frontend"
+    BACKEND = "Backend"
+    INFRASTRUCTURE = "Infrastructure"
+    MARKETING = "Marketing"
+
+
+class Effort(str, Enum):
+    SMALL = "Small"
+    MEDIUM = "Medium"
+    LARGE = "Large"
+
+
+class TicketTriage(BaseModel):
+    """All three classifications of one ticket, each with a short reason"""
+
+    # Structured outputs (strict mode) reject schemas with extra properties
+    model_config = ConfigDict(extra="forbid")
+
+    priority: Priority = Field(description="High: user-facing or blocking; Medium: time-sensitive but not "
+                                           "breaking anything; Low: cosmetic or non-urgent")
+    priority_reason: str = Field(description="Very brief explanation of the priority")
+    team: Team = Field(description="Team that should own the ticket")
+    team_reason: str = Field(description="Very brief explanation of the team choice")
+    effort: Effort = Field(description="Small: a day; Medium: 2-3 days; Large: multi-day or cross-team")
+    effort_reason: str = Field(description="Brief justification of the effort estimate")
+
+
+TRIAGE_INSTRUCTIONS = """
+Triage the support ticket in the user's message.
+
+Assess how urgent it is:
+- High: User-facing or blocking issues
+- Medium: Time-sensitive but not breaking anything
+- Low: Cosmetic or non-urgent tasks
+
+Decide which team should own it: Frontend, Backend, Infrastructure or Marketing.
+
+Estimate how much work it will require:
+- Small: Can be completed in a day
+- Medium: 2-3 days of work
+- Large: Multi-day or cross-team effort
+
+Keep each reason to one short sentence.
+"""
+
+SCHEMA_NAME = "ticket_triage"
+
+
+def triage_json_schema() -> dict:
+    """JSON schema of TicketTriage as accepted by structured outputs (enum $refs inlined)"""
+    schema = TicketTriage.model_json_schema()
+    definitions = schema.pop("$defs", {})
+    for prop in schema["properties"].values():
+        ref = prop.pop("$ref", None)
+        if ref:
+            definition = definitions[ref.rsplit("/", 1)[-1]]
+            prop.update({"type": definition["type"], "enum": definition["enum"]})
+    return schema
+
+
+def triage_response_format() -> dict:
+    """
+    `response_format` value for Chat Completions, Assistants and Azure AI Agents
+
+    Strict, so the service enforces the schema. (The Agents SDK's
+    ResponseFormatJsonSchema model has no `strict` field; the plain dict
+    serializes the same way.)
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": SCHEMA_NAME,
+            "description": "Priority, team and effort of a support ticket",
+            "strict": True,
+            "schema": triage_json_schema()
+        }
+    }
+
+
+def parse_triage(text: str) -> TicketTriage:
+    """Validate a structured response (raises pydantic.ValidationError)"""
+    return TicketTriage.model_validate_json(text)
+
+
+def triage_ticket(client, deployment: str, ticket: str) -> TicketTriage:
+    """Classify one ticket with a single chat completion (through the shared scheduler)"""
+    from requestScheduler import get_scheduler, estimate_request_tokens, INTERACTIVE
+
+    messages = [
+        {"role": "system", "content": TRIAGE_INSTRUCTIONS},
+        {"role": "user", "content": ticket}
+    ]
+    response = get_scheduler().submit(
+        lambda: client.chat.completions.create(
+            model=deployment,
+            messages=messages,
+            response_format=triage_response_format(),
+            temperature=0
+        ),
+        estimate_request_tokens(messages, model=deployment),
+        INTERACTIVE
+    )
+    return parse_triage(response.choices[0].message.content)
+
+
+def format_triage(triage: TicketTriage) -> str:
+    """Console rendering in the layout the triage scripts print"""
+    return (f"Priority Assessment:\n{triage.priority.value}: {triage.priority_reason}\n\n"
+            f"Team Assignment:\n{triage.team.value}: {triage.team_reason}\n\n"
+            f"Effort Estimation:\n{triage.effort.value}: {triage.effort_reason}\n")
+
+
+def triage_record(ticket: str, triage: TicketTriage) -> str:
+    """One JSON line (ticket plus fields) for storing or logging"""
+    return json.dumps({"ticket": ticket, **triage.model_dump(mode="json")})
+
+
+def log_triage(ticket: str, triage: TicketTriage, path: str = None):
+    """Append an LLM triage result to TRIAGE_LOG_PATH (training data for the pre-classifier)"""
+    path = path or os.getenv("TRIAGE_LOG_PATH", "triage_log.jsonl")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(triage_record(ticket, triage) + "\n")
@@ -0,0 +1,315 @@
+"""
+Triage Service
+Long-lived asyncio version of multiAgentAzure.py: the triage agent, the
+credential and the HTTP connections are created once and kept warm, and
+concurrent tickets each run on their own thread of the shared agent
+
+    python triageService.py          # serve on TRIAGE_SERVICE_PORT
+    python triageService.py bench    # load test against the local agents mock
+
+Endpoints:
+    POST /triage   {"ticket": "..."} -> triage fields, source (local/agent), latency
+    GET  /stats    requests, errors, in flight, p50/p99 latency, requests/sec
+    GET  /health
+
+Settings (environment):
+    TRIAGE_BACKEND           azure (default, PROJECT_ENDPOINT) or mock (local agents
+                             mock from mockOpenAIServer.py, latency via MOCK_LLM_*)
+    TRIAGE_SERVICE_PORT      port (default 8080)
+    TRIAGE_MAX_CONCURRENCY   agent runs in flight at once; more tickets queue (default 32)
+    TRIAGE_STATS_WINDOW      latest requests used for percentiles and rate (default 10000)
+"""
+
+import os
+import sys
+import time
+import asyncio
+from collections import deque
+from aiohttp import web
+from dotenv import load_dotenv
+
+from azure.ai.agents.aio import AgentsClient
+from azure.ai.agents.models import MessageRole, ThreadMessageOptions
+from promptCache import CacheStats
+from triageClassifier import TRIAGE_INSTRUCTIONS, triage_response_format, parse_triage, log_triage
+from ticketPreClassifier import load_preclassifier
+from runResults import stream_agent_run_async
+from toonAbBenchmark import percentile
+from scriptProfiler import profile_if_requested
+
+# Load environment variables
+load_dotenv()
+
+
+class LatencyStats:
+    """Outcome and timing of the latest requests"""
+
+    def __init__(self, window: int = None):
+        window = int(os.getenv("TRIAGE_STATS_WINDOW", "10000")) if window is None else window
+        self.recent = deque(maxlen=window)  # (started, finished)
+        self.requests = 0
+        self.errors = 0
+        self.local = 0
+        self.in_flight = 0
+
+    def record(self, started: float, ok: bool = True, local: bool = False):
+        self.recent.append((started, time.perf_counter()))
+        self.requests += 1
+        self.errors += not ok
+        self.local += local
+
+    def snapshot(self) -> dict:
+        latencies = [finished - started for started, finished in self.recent]
+        span = (self.recent[-1][1] - min(started for started, _ in self.recent)) if self.recent else 0
+        return {
+            "requests": self.requests, "errors": self.errors, "answered_locally": self.local,
+            "in_flight": self.in_flight,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "requests_per_s": round(len(latencies) / span, 1) if span else 0.0
+        }
+
+    def report(self) -> str:
+        s = self.snapshot()
+        return (f"{s['requests']:,} request(s), {s['errors']} error(s), {s['answered_locally']} answered locally, "
+                f"p50 {s['p50_ms']:.0f}ms / p99 {s['p99_ms']:.0f}ms, {s['requests_per_s']:.1f} req/s")
+
+
+class MockCredential:
+    """Async credential for the local mock (which ignores authentication)"""
+
+    async def get_token(self, *scopes, **kwargs):
+        from azure.core.credentials import AccessToken
+        return AccessToken("mock", int(time.time()) + 3600)
+
+    async def close(self):
+        pass
+
+
+class AgentsTriageBackend:
+    """
+    One triage agent on Azure AI Agents, shared by every ticket
+
+    Each ticket gets its own thread (created with the ticket as its first
+    message) and a streamed run: two requests per ticket over the client's
+    pooled connections. Threads are deleted in the background.
+    """
+
+    def __init__(self, endpoint: str, deployment: str, credential=None, log_results: bool = True, **client_kwargs):
+        self.endpoint = endpoint
+        self.deployment = deployment
+        self.credential = credential
+        self.client_kwargs = client_kwargs
+        # Results are training data for the pre-classifier; mock answers are random
+        self.log_results = log_results
+        self.client = None
+        self.agent = None
+        self._cleanup = set()
+
+    async def start(self):
+        if self.credential is None:
+            from azure.identity.aio import DefaultAzureCredential
+            self.credential = DefaultAzureCredential(exclude_environment_credential=True,
+                                                     exclude_managed_identity_credential=True)
+        self.client = AgentsClient(endpoint=self.endpoint, credential=self.credential, **self.client_kwargs)
+        self.agent = await self.client.create_agent(
+            model=self.deployment,
+            name="triage-agent",
+            instructions=TRIAGE_INSTRUCTIONS,
+            response_format=triage_response_format()
+        )
+        print(f"🤖 Triage agent {self.agent.id} ready at {self.endpoint}")
+
+    async def triage(self, ticket: str):
+        """RunResult of one ticket"""
+        thread = await self.client.threads.create(messages=[ThreadMessageOptions(role=MessageRole.USER, content=ticket)])
+        try:
+            return await stream_agent_run_async(self.client, thread.id, self.agent.id)
+        finally:
+            task = asyncio.create_task(self.client.threads.delete(thread.id))
+            self._cleanup.add(task)
+            task.add_done_callback(self._cleanup.discard)
+
+    async def close(self):
+        if self._cleanup:
+            await asyncio.gather(*self._cleanup, return_exceptions=True)
+        if self.agent is not None:
+            await self.client.delete_agent(self.agent.id)
+            print("Deleted triage agent.")
+        if self.client is not None:
+            await self.client.close()
+        await self.credential.close()
+
+
+def make_backend(name: str = None, endpoint: str = None) -> AgentsTriageBackend:
+    """Backend by name: azure (PROJECT_ENDPOINT) or mock (endpoint of a running local mock)"""
+    name = name or os.getenv("TRIAGE_BACKEND", "azure")
+    deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+    if name == "azure":
+        return AgentsTriageBackend(endpoint or os.getenv("PROJECT_ENDPOINT"), deployment)
+    if name == "mock":
+        from azure.core.pipeline.policies import SansIOHTTPPolicy
+        # The mock is plain http, where bearer token authentication is refused
+        return AgentsTriageBackend(endpoint, deployment or "mock", MockCredential(), log_results=False,
+                                   authentication_policy=SansIOHTTPPolicy())
+    raise ValueError(f"Unknown TRIAGE_BACKEND {name!r} (use azure or mock)")
+
+
+class TriageService:
+    """HTTP/JSON front end: local pre-classifier first, then the agent backend"""
+
+    def __init__(self, backend, preclassifier=None, max_concurrency: int = None):
+        self.backend = backend
+        self.preclassifier = preclassifier
+        self.max_concurrency = (int(os.getenv("TRIAGE_MAX_CONCURRENCY", "32")) if max_concurrency is None
+                                else max_concurrency)
+        self.runs = asyncio.Semaphore(self.max_concurrency)
+        self.stats = LatencyStats()
+        self.cache_stats = CacheStats()
+
+    async def handle_triage(self, request: web.Request) -> web.Response:
+        started = time.perf_counter()
+        try:
+            ticket = str((await request.json())["ticket"]).strip()
+        except (ValueError, KeyError, TypeError):
+            return web.json_response({"error": 'Expected a JSON body like {"ticket": "..."}'}, status=400)
+        if not ticket:
+            return web.json_response({"error": "Empty ticket"}, status=400)
+
+        triage = self.preclassifier.classify(ticket) if self.preclassifier else None
+        if triage is not None:
+            self.stats.record(started, local=True)
+            return self._answer(triage, "local", started)
+
+        self.stats.in_flight += 1
+        try:
+            async with self.runs:
+                run = await self.backend.triage(ticket)
+            self.cache_stats.record_response(run)
+            if run.status in ("failed", None) or run.message is None:
+                raise RuntimeError(f"Run {run.status or 'sent no run event'}: {getattr(run, 'last_error', None)}")
+            triage = parse_triage(run.text)
+        except Exception as e:  # failed run, invalid JSON, azure.core HttpResponseError, ...
+            self.stats.record(started, ok=False)
+            return web.json_response({"error": f"{type(e).__name__}: {e}"}, status=502)
+        finally:
+            self.stats.in_flight -= 1
+
+        if self.backend.log_results:
+            log_triage(ticket, triage)
+        self.stats.record(started)
+        return self._answer(triage, "agent", started)
+
+    @staticmethod
+    def _answer(triage, source: str, started: float) -> web.Response:
+        return web.json_response({**triage.model_dump(mode="json"), "source": source,
+                                  "latency_ms": round((time.perf_counter() - started) * 1000, 1)})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats.snapshot(), "prompt_cache": self.cache_stats.report()})
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "agent": getattr(self.backend.agent, "id", None)})
+
+    async def _startup(self, app):
+        await self.backend.start()
+
+    async def _cleanup(self, app):
+        print(f"\n📊 {self.stats.report()}")
+        await self.backend.close()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/triage", self.handle_triage)
+        app.router.add_get("/stats", self.handle_stats)
+        app.router.add_get("/health", self.handle_health)
+        app.on_startup.append(self._startup)
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+
+async def bench():
+    """Fire synthetic tickets at the service (mock backend) and report client-side latency"""
+    import aiohttp
+    from mockOpenAIServer import start_mock_server
+    from ticketPreClassifier import synthetic_log
+
+    requests = int(os.getenv("TRIAGE_BENCH_REQUESTS", "500"))
+    concurrency = int(os.getenv("TRIAGE_BENCH_CONCURRENCY", "64"))
+    tickets = [record["ticket"] for record in synthetic_log(requests)]
+
+    print("\n" + "=" * 70)
+    print("  Triage Service Load Test (local agents mock)")
+    print("=" * 70)
+    server, url = start_mock_server()
+    service = TriageService(make_backend("mock", url))
+    runner = web.AppRunner(service.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    service_url = "http://%s:%d" % runner.addresses[0][:2]
+
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+
+            async def one(ticket: str):
+                nonlocal failures
+                async with semaphore:
+                    start = time.perf_counter()
+                    async with session.post(f"{service_url}/triage", json={"ticket": ticket}) as response:
+                        await response.read()
+                        failures += response.status != 200
+                    latencies.append(time.perf_counter() - start)
+
+            start, start_cpu = time.perf_counter(), time.process_time()
+            await asyncio.gather(*(one(ticket) for ticket in tickets))
+            elapsed, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+            async with session.get(f"{service_url}/stats") as response:
+                stats = await response.json()
+    finally:
+        await runner.cleanup()
+        server.shutdown()
+
+    settings = server.settings
+    print(f"\n🎫 {requests:,} tickets, {concurrency} concurrent clients, "
+          f"at most {service.max_concurrency} agent runs at once")
+    print(f"   mock run latency: median {settings.latency_ms:.0f}ms, {settings.stall_rate:.0%} stalls")
+    print(f"\n{'':10} {'p50':>8} {'p99':>8} {'req/s':>8}")
+    print(f"{'Client':10} {percentile(latencies, 50) * 1000:>6.0f}ms {percentile(latencies, 99) * 1000:>6.0f}ms "
+          f"{requests / elapsed:>8.1f}")
+    print(f"{'Service':10} {stats['p50_ms']:>6.0f}ms {stats['p99_ms']:>6.0f}ms {stats['requests_per_s']:>8.1f}")
+    print(f"\n⚙️  CPU: {cpu / requests * 1000:.1f}ms per ticket ({cpu / elapsed:.0%} of wall time; the mock, the "
+          f"service and the load generator share this process)")
+    print(f"❌ Failed requests: {failures}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        asyncio.run(bench())
+        return
+
+    backend_name = os.getenv("TRIAGE_BACKEND", "azure")
+    mock_server = None
+    if backend_name == "mock":
+        from mockOpenAIServer import start_mock_server
+        mock_server, endpoint = start_mock_server()
+    else:
+        endpoint = os.getenv("PROJECT_ENDPOINT")
+        if not endpoint:
+            print("❌ Set PROJECT_ENDPOINT in .env (or TRIAGE_BACKEND=mock)")
+            return
+
+    port = int(os.getenv("TRIAGE_SERVICE_PORT", "8080"))
+    service = TriageService(make_backend(backend_name, endpoint), load_preclassifier())
+    print(f"🚀 Triage service on http://127.0.0.1:{port} (POST /triage, GET /stats); Ctrl+C to stop")
+    try:
+        web.run_app(service.app(), host="127.0.0.1", port=port, print=None)
+    finally:
+        if mock_server is not None:
+            mock_server.shutdown()
+
+
+if __name__ == "__main__":
+    with profile_if_requested("triageService"):
+        main()
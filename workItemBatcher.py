@@ -0,0 +1,213 @@
+"""
+Work Item Batching for Azure DevOps MCP Tools
+Coalesces single `get work item` requests issued within a short window into
+one batch tool call, and submits test case creations in groups
+
+Without this, "List all work items" or an epic with hundreds of children
+becomes hundreds of sequential MCP round trips.
+
+Try it offline against the fake server:
+    python workItemBatcher.py
+"""
+
+import os
+import json
+import time
+import asyncio
+from dotenv import load_dotenv
+from mcpTools import McpToolClient, connect_ado_plugin
+
+# Load environment variables
+load_dotenv()
+
+
+# Azure DevOps caps work items per batch request at 200
+MAX_BATCH_SIZE = 200
+
+
+class WorkItemBatcher:
+    """Collects `get(id)` calls for `window_ms` and fetches them in one batch"""
+
+    def __init__(self, client: McpToolClient, window_ms: float = 20, max_batch: int = MAX_BATCH_SIZE,
+                 store=None):
+        self.client = client
+        # Optional WorkItemStore: answers lookups locally and keeps fetched items
+        self.store = store
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batch_tool = client.find("get", "workitems", "batch")
+        self.single_tool = client.find("get", "workitem", exclude=("workitems", "batch"))
+        self.pending = {}
+        self.timers = {}
+        self.requests = 0
+        self.round_trips = 0
+
+    async def get(self, work_item_id, project: str = "demo") -> dict:
+        """Fetch one work item; concurrent calls share a batch round trip"""
+        if self.store is not None:
+            item = self.store.get(work_item_id)
+            if item is not None:
+                self.requests += 1
+                return item
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiting = self.pending.setdefault(project, {})
+        waiting.setdefault(int(work_item_id), []).append(future)
+        self.requests += 1
+
+        if len(waiting) >= self.max_batch:
+            self._flush(project)
+        elif project not in self.timers:
+            self.timers[project] = loop.call_later(self.window, self._flush, project)
+        return await future
+
+    async def get_many(self, work_item_ids, project: str = "demo") -> list:
+        """Fetch several work items (batched), preserving order"""
+        return await asyncio.gather(*(self.get(i, project) for i in work_item_ids))
+
+    def _flush(self, project: str):
+        timer = self.timers.pop(project, None)
+        if timer:
+            timer.cancel()
+        waiting = self.pending.pop(project, None)
+        if waiting:
+            asyncio.ensure_future(self._fetch(project, waiting))
+
+    async def _fetch(self, project: str, waiting: dict):
+        ids = list(waiting)
+        try:
+            if self.batch_tool:
+                self.round_trips += 1
+                items = await self.client.call_json(self.batch_tool, project=project, ids=ids)
+                found = {item["id"]: item for item in items or []}
+            else:
+                # No batch tool on this server: at least run the singles concurrently
+                self.round_trips += len(ids)
+                results = await asyncio.gather(
+                    *(self.client.call_json(self.single_tool, id=i, project=project) for i in ids),
+                    return_exceptions=True
+                )
+                found = {i: r for i, r in zip(ids, results) if not isinstance(r, Exception)}
+        except Exception as e:
+            for futures in waiting.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        if self.store is not None and found:
+            self.store.upsert(list(found.values()), project)
+
+        for work_item_id, futures in waiting.items():
+            for future in futures:
+                if future.done():
+                    continue
+                if work_item_id in found:
+                    future.set_result(found[work_item_id])
+                else:
+                    future.set_exception(KeyError(f"Work item {work_item_id} not found"))
+
+    def report(self) -> str:
+        """One-line summary for console output"""
+        local = f" ({self.store.hits} from the local store)" if self.store is not None else ""
+        return f"{self.requests} work item request(s) served in {self.round_trips} round trip(s){local}"
+
+
+async def create_test_cases(client: McpToolClient, test_cases: list, project: str = "demo",
+                            parent_id=None, batch_size: int = 50, concurrency: int = 4) -> list:
+    """
+    Create test cases in grouped submissions
+
+    With a parent work item, each group of `batch_size` goes out as one
+    `add child work items` call; otherwise single creations run
+    concurrently (bounded by `concurrency`). Each test case is a dict with
+    `title` and optional `steps`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    batch_tool = client.find("add", "child", "workitems")
+    single_tool = client.find("create", "testcase")
+
+    async def submit_group(group):
+        async with semaphore:
+            return await client.call_json(
+                batch_tool,
+                parentId=int(parent_id),
+                project=project,
+                workItemType="Test Case",
+                items=[{"title": tc["title"], "description": tc.get("steps", "")} for tc in group]
+            )
+
+    async def submit_one(tc):
+        async with semaphore:
+            return await client.call_json(single_tool, project=project, title=tc["title"], steps=tc.get("steps", ""))
+
+    if parent_id is not None and batch_tool:
+        groups = [test_cases[i:i + batch_size] for i in range(0, len(test_cases), batch_size)]
+        results = await asyncio.gather(*(submit_group(g) for g in groups))
+        return [item for group in results for item in group]
+    return list(await asyncio.gather(*(submit_one(tc) for tc in test_cases)))
+
+
+def register_batching_filter(kernel, batcher: WorkItemBatcher, plugin_name: str = "azure_devops"):
+    """
+    Route single work item lookups through the batcher
+
+    Semantic Kernel runs the tool calls from one model response
+    concurrently, so parallel `get work item` calls become one batch.
+    """
+    from semantic_kernel.filters import FilterTypes
+    from semantic_kernel.functions import FunctionResult
+
+    async def batching_filter(context, next):
+        function = context.function
+        if (function.plugin_name != plugin_name or function.name != batcher.single_tool
+                or not batcher.batch_tool or "id" not in context.arguments):
+            await next(context)
+            return
+        project = context.arguments.get("project", "demo")
+        item = await batcher.get(context.arguments["id"], project)
+        context.result = FunctionResult(function=function.metadata, value=json.dumps(item))
+
+    kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, batching_filter)
+    return batching_filter
+
+
+async def main():
+    """Compare one-by-one and batched access against the configured MCP server"""
+    print("\n" + "=" * 70)
+    print("  Work Item Batching Demo")
+    print("=" * 70)
+
+    os.environ.setdefault("ADO_MCP_SERVER", "fake")
+    project = os.getenv("AZURE_DEVOPS_PROJECT", "demo")
+    ids = list(range(2, 102))
+
+    plugin, kernel = await connect_ado_plugin()
+    try:
+        client = McpToolClient.from_kernel(kernel)
+        single_tool = client.find("get", "workitem", exclude=("workitems", "batch"))
+
+        start = time.perf_counter()
+        for work_item_id in ids:
+            await client.call_json(single_tool, id=work_item_id, project=project)
+        sequential = time.perf_counter() - start
+        print(f"\n🐢 One by one: {len(ids)} round trips in {sequential:.2f}s")
+
+        batcher = WorkItemBatcher(client)
+        start = time.perf_counter()
+        items = await batcher.get_many(ids, project)
+        batched = time.perf_counter() - start
+        print(f"🚀 Batched:    {batcher.report()} in {batched:.2f}s ({len(items)} items)")
+
+        cases = [{"title": f"Negative test {n} for US #13", "steps": "1. Do X\n2. Expect error"} for n in range(1, 121)]
+        before = client.total_calls
+        start = time.perf_counter()
+        created = await create_test_cases(client, cases, project, parent_id=13)
+        print(f"🧪 Created {len(created)} test cases in {client.total_calls - before} call(s) "
+              f"in {time.perf_counter() - start:.2f}s")
+    finally:
+        await plugin.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+"""
+Paginated Work Item Streaming
+Async generator over paged MCP search results: filters are pushed down to
+the tool arguments, the next page is fetched while the current one is
+consumed, and iteration stops as soon as enough items are collected
+
+Memory and latency scale with what the caller needs, not project size.
+
+Try it offline against the fake server:
+    python workItemPaging.py
+"""
+
+import os
+import re
+import time
+import asyncio
+from dotenv import load_dotenv
+from mcpTools import McpToolClient, connect_ado_plugin
+
+# Load environment variables
+load_dotenv()
+
+
+# Azure DevOps search returns at most 1,000 results per request
+MAX_PAGE_SIZE = 1000
+
+# Whole-word patterns (singular or plural), so "debug" does not select Bug
+WORK_ITEM_TYPES = {
+    r"epics?": "Epic",
+    r"features?": "Feature",
+    r"(?:user )?stor(?:y|ies)": "User Story",
+    r"bugs?": "Bug",
+    r"tasks?": "Task",
+    r"test cases?": "Test Case"
+}
+STATES = ["New", "Active", "Resolved", "Closed"]
+
+
+def filters_from_prompt(prompt: str) -> dict:
+    """Pick work item type/state filters out of a natural language prompt"""
+    text = prompt.lower()
+    types = list(dict.fromkeys(v for k, v in WORK_ITEM_TYPES.items() if re.search(rf"\b{k}\b", text)))
+    states = [s for s in STATES if re.search(rf"\b{s.lower()}\b", text)]
+    filters = {}
+    if types:
+        filters["work_item_types"] = types
+    if states:
+        filters["states"] = states
+    return filters
+
+
+def work_item_id(item: dict):
+    """ID from either a work item or a search hit (lowercase field names)"""
+    if "id" in item:
+        return item["id"]
+    fields = item.get("fields", {})
+    return fields.get("system.id") or fields.get("System.Id")
+
+
+async def iter_work_items(client: McpToolClient, project: str = "demo", page_size: int = 200,
+                          work_item_types: list = None, states: list = None, area_paths: list = None,
+                          search_text: str = "*", limit: int = None):
+    """
+    Yield work items one at a time from paged `search_workitem` results
+
+    Type, state and area path filters are sent to the server rather than
+    applied locally. While the caller consumes one page the next is
+    already in flight; it is cancelled if the caller stops early or
+    `limit` items have been yielded.
+    """
+    search_tool = client.find("search", "workitem")
+    if search_tool is None:
+        raise RuntimeError("MCP server has no work item search tool")
+
+    page_size = min(page_size, MAX_PAGE_SIZE)
+    if limit is not None:
+        page_size = min(page_size, limit)
+
+    args = {"searchText": search_text, "project": [project]}
+    if work_item_types:
+        args["workItemType"] = list(work_item_types)
+    if states:
+        args["state"] = list(states)
+    if area_paths:
+        args["areaPath"] = list(area_paths)
+
+    def fetch(skip):
+        return asyncio.ensure_future(client.call_json(search_tool, top=page_size, skip=skip, **args))
+
+    yielded = 0
+    skip = 0
+    pending = fetch(skip)
+    try:
+        while pending is not None:
+            page = await pending
+            results = page.get("results", []) if isinstance(page, dict) else page or []
+            total = page.get("count") if isinstance(page, dict) else None
+            skip += len(results)
+
+            more = len(results) == page_size and (total is None or skip < total)
+            if limit is not None and yielded + len(results) >= limit:
+                more = False
+            pending = fetch(skip) if more else None
+
+            for item in results:
+                yield item
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+
+async def collect_work_items(client: McpToolClient, limit: int, **filters) -> list:
+    """Gather up to `limit` items from iter_work_items"""
+    return [item async for item in iter_work_items(client, limit=limit, **filters)]
+
+
+async def main():
+    """Stream a filtered listing from the configured MCP server"""
+    print("\n" + "=" * 70)
+    print("  Paginated Work Item Streaming Demo")
+    print("=" * 70)
+
+    os.environ.setdefault("ADO_MCP_SERVER", "fake")
+    os.environ.setdefault("FAKE_MCP_WORK_ITEMS", "20000")
+    project = os.getenv("AZURE_DEVOPS_PROJECT", "demo")
+
+    plugin, kernel = await connect_ado_plugin()
+    try:
+        client = McpToolClient.from_kernel(kernel)
+
+        start = time.perf_counter()
+        first = None
+        count = 0
+        async for item in iter_work_items(client, project, work_item_types=["Bug"], states=["Active"], limit=50):
+            first = first or time.perf_counter()
+            count += 1
+        print(f"\n🐞 First 50 active bugs: {count} items, first after {first - start:.2f}s, "
+              f"done in {time.perf_counter() - start:.2f}s, {client.total_calls} page request(s)")
+
+        before = client.total_calls
+        start = time.perf_counter()
+        tasks = [item async for item in iter_work_items(client, project, page_size=500,
+                                                        work_item_types=["Task"])]
+        print(f"📋 All tasks: {len(tasks)} items in {time.perf_counter() - start:.2f}s, "
+              f"{client.total_calls - before} page request(s)")
+    finally:
+        await plugin.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,304 @@
+"""
+Local Work Item Snapshot Store
+SQLite copy of Azure DevOps work items (fields, relations, revision) that is
+filled through the MCP tools and kept current with incremental syncs
+
+The first sync copies the project; later syncs ask only for items changed
+since the stored watermark, so agent lookups are answered locally and only
+deltas cross the network.
+
+Try it offline against the fake server:
+    python workItemStore.py
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import tempfile
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from mcpTools import McpToolClient, connect_ado_plugin
+from workItemBatcher import MAX_BATCH_SIZE, WorkItemBatcher
+
+# Load environment variables
+load_dotenv()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    rev INTEGER NOT NULL,
+    type TEXT,
+    state TEXT,
+    title TEXT,
+    parent_id INTEGER,
+    changed_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_work_items_parent ON work_items(parent_id);
+CREATE INDEX IF NOT EXISTS idx_work_items_state ON work_items(project, state);
+CREATE INDEX IF NOT EXISTS idx_work_items_changed ON work_items(project, changed_date);
+
+CREATE TABLE IF NOT EXISTS relations (
+    source_id INTEGER NOT NULL,
+    target_id INTEGER NOT NULL,
+    rel TEXT NOT NULL,
+    PRIMARY KEY (source_id, rel, target_id)
+);
+CREATE INDEX IF NOT EXISTS idx_relations_target ON relations(target_id);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    project TEXT PRIMARY KEY,
+    watermark TEXT,
+    last_sync TEXT
+);
+"""
+
+PARENT_LINK = "System.LinkTypes.Hierarchy-Reverse"
+
+
+def item_relations(item: dict) -> list:
+    """(rel, target_id) pairs from a work item's `relations` and System.Parent"""
+    found = []
+    for relation in item.get("relations") or []:
+        url = relation.get("url", "")
+        target = url.rstrip("/").rsplit("/", 1)[-1]
+        if target.isdigit():
+            found.append((relation.get("rel", ""), int(target)))
+    parent = (item.get("fields") or {}).get("System.Parent")
+    if parent and (PARENT_LINK, int(parent)) not in found:
+        found.append((PARENT_LINK, int(parent)))
+    return found
+
+
+def wiql_literal(value) -> str:
+    """Quote a value for a WIQL string comparison (' doubled)"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class WorkItemStore:
+    """Work item snapshot in SQLite, keyed by ID and indexed by parent and state"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("WORK_ITEM_STORE_PATH") or "work_items.db"
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.db.close()
+
+    def upsert(self, items: list, project: str = "demo") -> int:
+        """Insert or refresh items; rows with a newer stored revision are kept"""
+        written = 0
+        with self.db:
+            for item in items:
+                fields = item.get("fields") or {}
+                parent = fields.get("System.Parent")
+                cursor = self.db.execute(
+                    """INSERT INTO work_items (id, project, rev, type, state, title, parent_id, changed_date, data)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(id) DO UPDATE SET
+                           project = excluded.project, rev = excluded.rev, type = excluded.type,
+                           state = excluded.state, title = excluded.title, parent_id = excluded.parent_id,
+                           changed_date = excluded.changed_date, data = excluded.data
+                       WHERE excluded.rev > work_items.rev""",
+                    (int(item["id"]), project, int(item.get("rev") or 0), fields.get("System.WorkItemType"),
+                     fields.get("System.State"), fields.get("System.Title"),
+                     int(parent) if parent else None, fields.get("System.ChangedDate"), json.dumps(item))
+                )
+                if cursor.rowcount:
+                    written += 1
+                    self.db.execute("DELETE FROM relations WHERE source_id = ?", (int(item["id"]),))
+                    self.db.executemany(
+                        "INSERT OR IGNORE INTO relations (source_id, target_id, rel) VALUES (?, ?, ?)",
+                        [(int(item["id"]), target, rel) for rel, target in item_relations(item)]
+                    )
+        return written
+
+    def get(self, work_item_id) -> dict:
+        """Stored work item, or None"""
+        row = self.db.execute("SELECT data FROM work_items WHERE id = ?", (int(work_item_id),)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row["data"])
+
+    def revision(self, work_item_id):
+        """Stored revision number, or None"""
+        row = self.db.execute("SELECT rev FROM work_items WHERE id = ?", (int(work_item_id),)).fetchone()
+        return row["rev"] if row else None
+
+    def children(self, parent_id) -> list:
+        """Direct children of a work item"""
+        rows = self.db.execute("SELECT data FROM work_items WHERE parent_id = ? ORDER BY id", (int(parent_id),))
+        return [json.loads(row["data"]) for row in rows]
+
+    def query(self, project: str = "demo", work_item_types: list = None, states: list = None,
+              limit: int = None) -> list:
+        """Stored items of a project filtered by type and state"""
+        sql = "SELECT data FROM work_items WHERE project = ?"
+        params = [project]
+        if work_item_types:
+            sql += f" AND type IN ({','.join('?' * len(work_item_types))})"
+            params += list(work_item_types)
+        if states:
+            sql += f" AND state IN ({','.join('?' * len(states))})"
+            params += list(states)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [json.loads(row["data"]) for row in self.db.execute(sql, params)]
+
+    def count(self, project: str = None) -> int:
+        if project is None:
+            return self.db.execute("SELECT COUNT(*) FROM work_items").fetchone()[0]
+        return self.db.execute("SELECT COUNT(*) FROM work_items WHERE project = ?", (project,)).fetchone()[0]
+
+    def watermark(self, project: str = "demo"):
+        """Latest changed date seen by a completed sync, or None"""
+        row = self.db.execute("SELECT watermark FROM sync_state WHERE project = ?", (project,)).fetchone()
+        return row["watermark"] if row else None
+
+    def _set_watermark(self, project: str, watermark):
+        now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        with self.db:
+            self.db.execute(
+                """INSERT INTO sync_state (project, watermark, last_sync) VALUES (?, ?, ?)
+                   ON CONFLICT(project) DO UPDATE SET watermark = excluded.watermark, last_sync = excluded.last_sync""",
+                (project, watermark, now)
+            )
+
+    async def sync(self, client: McpToolClient, project: str = "demo", concurrency: int = 4) -> dict:
+        """
+        Bring the snapshot up to date through the MCP tools
+
+        With a WIQL tool only items changed since the watermark are listed.
+        Without one, the paged search listing is walked; search hits are
+        not full work items, so every hit is fetched unless it carries a
+        revision no newer than the stored one. Items are fetched in batches
+        of up to 200 and only newer revisions are written.
+        Returns counts of items checked, fetched and written.
+        """
+        start = time.perf_counter()
+        calls_before = client.total_calls
+        watermark = self.watermark(project)
+        wiql_tool = client.find("wiql")
+        batch_tool = client.find("get", "workitems", "batch")
+        stats = {"checked": 0, "fetched": 0, "written": 0}
+
+        if wiql_tool:
+            # ">=" because WIQL compares dates at day precision by default; the
+            # revision check in upsert() drops the items we already have
+            since = watermark or "1900-01-01T00:00:00Z"
+            wiql = (f"SELECT [System.Id] FROM WorkItems WHERE [System.TeamProject] = {wiql_literal(project)} "
+                    f"AND [System.ChangedDate] >= {wiql_literal(since)} ORDER BY [System.ChangedDate]")
+            result = await client.call_json(wiql_tool, project=project, wiql=wiql)
+            ids = [ref["id"] for ref in (result or {}).get("workItems", [])]
+            stats["checked"] = len(ids)
+        else:
+            from workItemPaging import iter_work_items, work_item_id
+            ids = []
+            async for hit in iter_work_items(client, project, page_size=1000):
+                stats["checked"] += 1
+                hit_id = int(work_item_id(hit))
+                fields = hit.get("fields") or {}
+                hit_rev = hit.get("rev") or fields.get("system.rev") or fields.get("System.Rev")
+                stored = self.revision(hit_id)
+                if stored is None or hit_rev is None or int(hit_rev) > stored:
+                    ids.append(hit_id)
+
+        if batch_tool:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def fetch(chunk):
+                async with semaphore:
+                    return await client.call_json(batch_tool, project=project, ids=chunk)
+
+            chunks = [ids[i:i + MAX_BATCH_SIZE] for i in range(0, len(ids), MAX_BATCH_SIZE)]
+            for items in await asyncio.gather(*(fetch(chunk) for chunk in chunks)):
+                stats["fetched"] += len(items or [])
+                stats["written"] += self.upsert(items or [], project)
+        elif ids:
+            # No batch tool: single fetches, run concurrently by the batcher
+            batcher = WorkItemBatcher(client)
+            results = await asyncio.gather(*(batcher.get(i, project) for i in ids), return_exceptions=True)
+            items = [item for item in results if not isinstance(item, Exception)]
+            stats["fetched"] = len(items)
+            stats["written"] = self.upsert(items, project)
+
+        row = self.db.execute("SELECT MAX(changed_date) FROM work_items WHERE project = ?", (project,)).fetchone()
+        self._set_watermark(project, row[0] or watermark)
+        stats["calls"] = client.total_calls - calls_before
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    def report(self) -> str:
+        """One-line summary for console output"""
+        return f"{self.count():,} work item(s) stored, {self.hits} local hit(s), {self.misses} miss(es)"
+
+
+def open_work_item_store():
+    """WorkItemStore at WORK_ITEM_STORE_PATH, or None when the snapshot is disabled"""
+    path = os.getenv("WORK_ITEM_STORE_PATH")
+    return WorkItemStore(path) if path else None
+
+
+def sync_report(stats: dict) -> str:
+    """One-line summary of a sync() result"""
+    return (f"{stats['checked']} changed item(s) checked, {stats['written']} written, "
+            f"{stats['calls']} MCP call(s) in {stats['seconds']:.2f}s")
+
+
+async def main():
+    """Full sync, incremental sync after a few edits, then local lookups"""
+    print("\n" + "=" * 70)
+    print("  Work Item Snapshot Store Demo")
+    print("=" * 70)
+
+    os.environ.setdefault("ADO_MCP_SERVER", "fake")
+    os.environ.setdefault("FAKE_MCP_WORK_ITEMS", "5000")
+    project = os.getenv("AZURE_DEVOPS_PROJECT", "demo")
+    # Scratch file, never the configured snapshot
+    path = os.path.join(tempfile.mkdtemp(), "work_items_demo.db")
+
+    store = WorkItemStore(path)
+    plugin, kernel = await connect_ado_plugin()
+    try:
+        client = McpToolClient.from_kernel(kernel)
+
+        stats = await store.sync(client, project)
+        print(f"\n📥 Initial sync: {sync_report(stats)}")
+
+        stats = await store.sync(client, project)
+        print(f"🔁 No changes:   {sync_report(stats)}")
+
+        touch = client.find("fake", "touch")
+        if touch:
+            await client.call_json(touch, ids=[13, 42, 420])
+            stats = await store.sync(client, project)
+            print(f"✏️  3 edited:     {sync_report(stats)}")
+
+        start = time.perf_counter()
+        for work_item_id in range(1, 1001):
+            store.get(work_item_id)
+        per_lookup = (time.perf_counter() - start) / 1000 * 1e6
+        print(f"⚡ Local lookup: {per_lookup:.0f}µs per work item")
+        print(f"🌳 Children of #1: {len(store.children(1))}, "
+              f"active bugs: {len(store.query(project, ['Bug'], ['Active']))}")
+        print(f"🗄️  {store.report()}")
+    finally:
+        store.close()
+        await plugin.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())